@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Perimetro, Asistencia, Incidencia, RedAutorizada
+from .models import Perimetro, Asistencia, Incidencia, RedAutorizada, ResumenDiario, TrabajoReporte
+from .revalidacion import revalidar_perimetro
 
 
 @admin.register(RedAutorizada)
@@ -15,6 +16,16 @@ class PerimetroAdmin(admin.ModelAdmin):
     list_display = ['id', 'nombre', 'latitud', 'longitud', 'radio_metros', 'activo']
     list_filter = ['activo']
     list_editable = ['activo', 'radio_metros']
+    actions = ['revalidar_asistencias']
+
+    @admin.action(description='Revalidar asistencias de los perímetros seleccionados')
+    def revalidar_asistencias(self, request, queryset):
+        for perimetro in queryset:
+            r = revalidar_perimetro(perimetro)
+            self.message_user(
+                request,
+                f'{perimetro.nombre}: {r["actualizados"]} de {r["revisados"]} registros actualizados.',
+            )
 
 
 @admin.register(Asistencia)
@@ -30,3 +41,18 @@ class IncidenciaAdmin(admin.ModelAdmin):
     list_display = ['id', 'usuario', 'tipo', 'fecha', 'created_at']
     list_filter = ['tipo', 'fecha']
     search_fields = ['usuario__nombre', 'descripcion']
+
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'fecha', 'estado', 'minutos_retardo', 'minutos_salida_temprana']
+    list_filter = ['estado', 'fecha', 'tiene_retardo', 'tiene_falta']
+    search_fields = ['usuario__nombre']
+    readonly_fields = ['entrada', 'salida']
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'estado', 'solicitado_por', 'created_at', 'terminado_en']
+    list_filter = ['tipo', 'estado']
+    readonly_fields = ['huella', 'archivo', 'error', 'iniciado_en', 'terminado_en']
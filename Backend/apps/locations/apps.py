@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class LocationsConfig(AppConfig):
     name = 'apps.locations'
+
+    def ready(self):
+        from django.core import checks
+        from common import cache_compartida
+        from . import resumen, signals  # noqa: F401
+        checks.register(cache_compartida.revisar, checks.Tags.caches)
+        checks.register(resumen.revisar, checks.Tags.database)
@@ -0,0 +1,242 @@
+"""
+Archivo frío de asistencias: meses viejos exportados a CSV comprimido.
+
+`manage.py archivar_asistencias` exporta cada mes a
+ASISTENCIA_ARCHIVO_DIR/asistencia_AAAA_MM.csv.gz (con los nombres de
+usuario, perímetro y red, para leerlo sin la base de datos), con un índice
+de los usuarios que tienen filas en el mes (asistencia_AAAA_MM.usuarios), y
+lo quita de la tabla: en PostgreSQL desprende y borra la partición del mes (ver
+particiones.py); en otros motores borra las filas del rango. El resumen
+diario del mes se conserva, sin las referencias a entrada y salida.
+
+Los archivos no se modifican después. buscar() y entre() los leen (el
+historial los usa para los meses archivados del rango, con o sin
+paginación): un mes a la vez, del más reciente al más antiguo, saltando
+los meses cuyo índice no tiene al usuario; entre() deja de leer al juntar
+`limite` filas (un mes sin índice se lee siempre).
+`manage.py consultar_archivo_asistencias` es la herramienta de consulta de
+solo lectura.
+"""
+import csv
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from common import marcas
+
+from . import particiones
+from .models import Asistencia, ResumenDiario
+
+COLUMNAS = [
+    'id', 'usuario', 'usuario_nombre', 'perimetro', 'perimetro_nombre', 'tipo',
+    'latitud_real', 'longitud_real', 'ssid_conectado', 'bssid_conectado', 'wifi_valido',
+    'red_autorizada', 'red_nombre', 'fecha_hora', 'fecha_local', 'valido',
+    'distancia_metros', 'id_provisional',
+]
+PATRON_ARCHIVO = re.compile(r'^asistencia_(\d{4})_(\d{2})\.csv\.gz$')
+TAMANO_BLOQUE = 5000
+
+_FECHA_HORA = serializers.DateTimeField()
+
+
+def directorio():
+    return Path(settings.ASISTENCIA_ARCHIVO_DIR)
+
+
+def ruta(primero):
+    return directorio() / f'asistencia_{primero:%Y_%m}.csv.gz'
+
+
+def ruta_indice(primero):
+    return directorio() / f'asistencia_{primero:%Y_%m}.usuarios'
+
+
+def meses_archivados(desde=None, hasta=None):
+    """Meses (primer día) con archivo, en orden; solo los que tocan [desde, hasta] si se indica."""
+    if not directorio().is_dir():
+        return []
+    meses = sorted(
+        date(int(m[1]), int(m[2]), 1)
+        for m in map(PATRON_ARCHIVO.match, os.listdir(directorio())) if m
+    )
+    return [
+        m for m in meses
+        if (desde is None or particiones.siguiente_mes(m) > desde) and (hasta is None or m <= hasta)
+    ]
+
+
+# ──────────────────────────────────────────────
+# ARCHIVAR
+# ──────────────────────────────────────────────
+
+def _exportar(primero, destino):
+    filas = Asistencia.objects.filter(
+        fecha_local__gte=primero, fecha_local__lt=particiones.siguiente_mes(primero),
+    ).order_by('fecha_hora', 'id').values_list(
+        'id', 'usuario', F('usuario__nombre'), 'perimetro', F('perimetro__nombre'), 'tipo',
+        'latitud_real', 'longitud_real', 'ssid_conectado', 'bssid_conectado', 'wifi_valido',
+        'red_autorizada', F('red_autorizada__nombre'), 'fecha_hora', 'fecha_local', 'valido',
+        'distancia_metros', 'id_provisional',
+    )
+    total = 0
+    pares = set()
+    with gzip.open(destino, 'wt', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(COLUMNAS)
+        for fila in filas.iterator(chunk_size=TAMANO_BLOQUE):
+            fila = list(fila)
+            fila[13] = fila[13].isoformat()
+            escritor.writerow(['' if valor is None else valor for valor in fila])
+            pares.add((fila[1], fila[14]))
+            total += 1
+    return total, pares
+
+
+def archivar(primero):
+    """
+    Exporta las asistencias del mes de `primero` y las quita de la tabla.
+    Retorna cuántas archivó. Falla si el mes ya tiene archivo.
+    """
+    primero = particiones.mes(primero)
+    destino = ruta(primero)
+    if destino.exists():
+        raise FileExistsError(f'{destino} ya existe')
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + '.tmp')
+    indice = ruta_indice(primero)
+    indice_temporal = indice.with_name(indice.name + '.tmp')
+    fin = particiones.siguiente_mes(primero)
+    try:
+        with transaction.atomic():
+            total, pares = _exportar(primero, temporal)
+            indice_temporal.write_text(json.dumps(sorted({usuario_id for usuario_id, _ in pares})))
+            ResumenDiario.objects.filter(fecha__gte=primero, fecha__lt=fin).update(entrada=None, salida=None)
+            particiones.desprender(primero)
+            # Sin particiones, o filas del mes que cayeron en la partición DEFAULT
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(particiones.TABLA)} '
+                    'WHERE fecha_local >= %s AND fecha_local < %s',
+                    [primero, fin],
+                )
+            marcas.avanzar(*marcas.dias(pares))
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        indice_temporal.unlink(missing_ok=True)
+        raise
+    # El índice primero: un mes existe cuando existe su .csv.gz
+    os.replace(indice_temporal, indice)
+    os.replace(temporal, destino)
+    return total
+
+
+# ──────────────────────────────────────────────
+# CONSULTAR
+# ──────────────────────────────────────────────
+
+def _leer(primero):
+    with gzip.open(ruta(primero), 'rt', newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def _como_serializada(fila, fecha_hora):
+    """Fila del archivo con el formato de AsistenciaSerializer."""
+    return {
+        'id': int(fila['id']),
+        'usuario': int(fila['usuario']),
+        'usuario_nombre': fila['usuario_nombre'],
+        'perimetro': int(fila['perimetro']),
+        'perimetro_nombre': fila['perimetro_nombre'],
+        'tipo': fila['tipo'],
+        'tipo_display': Asistencia.Tipo(fila['tipo']).label,
+        'latitud_real': fila['latitud_real'],
+        'longitud_real': fila['longitud_real'],
+        'ssid_conectado': fila['ssid_conectado'],
+        'bssid_conectado': fila['bssid_conectado'],
+        'wifi_valido': fila['wifi_valido'] == 'True',
+        'red_autorizada': int(fila['red_autorizada']) if fila['red_autorizada'] else None,
+        'red_nombre': fila['red_nombre'],
+        'fecha_hora': _FECHA_HORA.to_representation(fecha_hora),
+        'valido': fila['valido'] == 'True',
+        'distancia_metros': float(fila['distancia_metros']),
+        'id_provisional': fila['id_provisional'] or None,
+    }
+
+
+def _fecha(valor):
+    return valor and date.fromisoformat(str(valor))
+
+
+def _tiene(primero, usuario_id):
+    """Si el mes puede tener filas del usuario, según su índice (sin índice, sí)."""
+    try:
+        return usuario_id in json.loads(ruta_indice(primero).read_text())
+    except FileNotFoundError:
+        return True
+
+
+def _encontradas(usuario_id, desde, hasta):
+    """
+    (fecha_hora, id, fila) de las archivadas, de la más reciente a la más
+    antigua. Generador: lee cada mes solo cuando se piden sus filas.
+    """
+    for primero in reversed(meses_archivados(desde, hasta)):
+        if usuario_id is not None and not _tiene(primero, usuario_id):
+            continue
+        del_mes = []
+        for fila in _leer(primero):
+            if usuario_id is not None and int(fila['usuario']) != usuario_id:
+                continue
+            fecha = date.fromisoformat(fila['fecha_local'])
+            if (desde and fecha < desde) or (hasta and fecha > hasta):
+                continue
+            fecha_hora = datetime.fromisoformat(fila['fecha_hora'])
+            del_mes.append((fecha_hora, int(fila['id']), fila))
+        del_mes.sort(key=lambda e: e[:2], reverse=True)
+        yield from del_mes
+
+
+def buscar(usuario_id=None, desde=None, hasta=None):
+    """
+    Asistencias archivadas (formato de AsistenciaSerializer), de la más
+    reciente a la más antigua. `desde`/`hasta` son fechas locales inclusivas.
+    """
+    return [
+        _como_serializada(fila, fecha_hora)
+        for fecha_hora, _, fila in _encontradas(usuario_id, _fecha(desde), _fecha(hasta))
+    ]
+
+
+def entre(usuario_id=None, desde=None, hasta=None, menor_que=None, mayor_que=None, limite=None):
+    """
+    Para la paginación por llave (PaginacionPorLlave.completar): tuplas
+    (fecha_hora, id, asistencia serializada) de las archivadas con llave
+    (fecha_hora, id) entre mayor_que y menor_que, exclusivo, hasta `limite`.
+    Solo se leen los meses que pueden tener alguna, y solo hasta juntar
+    `limite`.
+    """
+    desde, hasta = _fecha(desde), _fecha(hasta)
+    if menor_que:
+        hasta = min(f for f in (hasta, timezone.localdate(menor_que[0])) if f)
+    if mayor_que:
+        desde = max(f for f in (desde, timezone.localdate(mayor_que[0])) if f)
+    if desde and hasta and desde > hasta:
+        return []
+    encontradas = (
+        e for e in _encontradas(usuario_id, desde, hasta)
+        if (menor_que is None or e[:2] < tuple(menor_que)) and (mayor_que is None or e[:2] > tuple(mayor_que))
+    )
+    return [
+        (fecha_hora, id_, _como_serializada(fila, fecha_hora))
+        for fecha_hora, id_, fila in islice(encontradas, limite)
+    ]
@@ -0,0 +1,168 @@
+"""
+Difusión de cambios del panel de supervisión (Server-Sent Events).
+
+Cada marcado confirmado (registro, auto-salida, lotes offline, escritura
+diferida) y cada incidencia nueva se publican una vez como mensaje SSE ya
+formateado; el hub lo reparte a las conexiones abiertas de /api/asistencia/panel/eventos/.
+Una conexión sin cambios solo espera en su cola: 50 pestañas abiertas no
+cuestan nada mientras nadie registra.
+
+El backend se elige con ASISTENCIA_DIFUSION_BACKEND. HubLocal reparte
+dentro del proceso, así que solo ve los marcados escritos por el mismo
+proceso ASGI; con varios workers (o vistas WSGI aparte) hace falta un
+backend compartido con la misma interfaz: publicar(mensaje),
+suscribir() y tiene_suscriptores().
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Asistencia, ResumenDiario
+
+# Mensajes que puede acumular una conexión lenta antes de pedirle resincronizar
+COLA_MAX = 1000
+RESINCRONIZAR = 'resincronizar'
+
+
+def mensaje_sse(evento, datos):
+    """Un evento SSE: `event:` + una línea `data:` con el JSON."""
+    return f'event: {evento}\ndata: {json.dumps(datos, cls=JSONEncoder, ensure_ascii=False)}\n\n'
+
+
+class HubLocal:
+    """
+    Hub en memoria del proceso. publicar() puede llamarse desde cualquier
+    hilo (vistas síncronas, on_commit); cada suscriptor recibe el mensaje en
+    su event loop con call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._suscriptores = set()
+        self._candado = threading.Lock()
+
+    def tiene_suscriptores(self):
+        return bool(self._suscriptores)
+
+    def publicar(self, mensaje):
+        with self._candado:
+            suscriptores = list(self._suscriptores)
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(self._entregar, cola, mensaje)
+            except RuntimeError:
+                # El loop ya cerró; la suscripción se retira al salir del with
+                pass
+
+    @staticmethod
+    def _entregar(cola, mensaje):
+        try:
+            cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Se perdieron cambios: la conexión debe volver a pedir el panel
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(RESINCRONIZAR)
+
+    def suscribir(self):
+        """`async with hub.suscribir() as cola`: mensajes para la conexión actual."""
+        return _Suscripcion(self)
+
+    def _agregar(self, suscripcion):
+        with self._candado:
+            self._suscriptores.add(suscripcion)
+
+    def _retirar(self, suscripcion):
+        with self._candado:
+            self._suscriptores.discard(suscripcion)
+
+
+class _Suscripcion:
+    # Clase y no asynccontextmanager: al cerrarse el stream (desconexión o fin
+    # del loop) la salida no depende de finalizar otro generador async
+    def __init__(self, hub):
+        self.hub = hub
+
+    async def __aenter__(self):
+        self.clave = (asyncio.get_running_loop(), asyncio.Queue(maxsize=COLA_MAX))
+        self.hub._agregar(self.clave)
+        return self.clave[1]
+
+    async def __aexit__(self, *exc):
+        self.hub._retirar(self.clave)
+
+
+_hub = None
+_candado = threading.Lock()
+
+
+def obtener_hub():
+    global _hub
+    if _hub is None:
+        with _candado:
+            if _hub is None:
+                _hub = import_string(settings.ASISTENCIA_DIFUSION_BACKEND)()
+    return _hub
+
+
+# ──────────────────────────────────────────────
+# PUBLICAR
+# ──────────────────────────────────────────────
+
+def _estado_tras(asistencia):
+    if asistencia.tipo == Asistencia.Tipo.ENTRADA:
+        # Las reglas del día solo aceptan una entrada si aún no hay una válida
+        return ResumenDiario.Estado.EN_TURNO if asistencia.valido else ResumenDiario.Estado.FUERA_DE_PERIMETRO
+    return ResumenDiario.Estado.TURNO_COMPLETADO
+
+
+def _mensaje_marcado(asistencia, datos):
+    return mensaje_sse('marcado', {
+        'fecha': asistencia.fecha_local,
+        'maestro': asistencia.usuario_id,
+        'tipo': asistencia.tipo,
+        'estado': _estado_tras(asistencia),
+        'asistencia': datos,
+    })
+
+
+def _mensaje_incidencia(incidencia, datos):
+    return mensaje_sse('incidencia', {
+        'fecha': incidencia.fecha,
+        'maestro': incidencia.usuario_id,
+        'incidencia': datos,
+    })
+
+
+def publicar_marcado(asistencia, datos):
+    """
+    Diferencia del panel para el maestro de `asistencia` (ya confirmada).
+    `datos` es la asistencia serializada con AsistenciaSerializer.
+    """
+    hub = obtener_hub()
+    if hub.tiene_suscriptores():
+        hub.publicar(_mensaje_marcado(asistencia, datos))
+
+
+def publicar_incidencia(incidencia):
+    hub = obtener_hub()
+    if hub.tiene_suscriptores():
+        # Import local: serializers → registro → escritura_diferida → este módulo
+        from .serializers import IncidenciaSerializer
+        hub.publicar(_mensaje_incidencia(incidencia, IncidenciaSerializer(incidencia).data))
+
+
+def publicar_lote(asistencias, incidencias):
+    """Marcados e incidencias de un registro por lotes, en orden cronológico."""
+    hub = obtener_hub()
+    if not hub.tiene_suscriptores():
+        return
+    from .serializers import AsistenciaSerializer, IncidenciaSerializer
+    asistencias = sorted(asistencias, key=lambda a: a.fecha_hora)
+    for asistencia, datos in zip(asistencias, AsistenciaSerializer(asistencias, many=True).data):
+        hub.publicar(_mensaje_marcado(asistencia, datos))
+    for incidencia, datos in zip(incidencias, IncidenciaSerializer(incidencias, many=True).data):
+        hub.publicar(_mensaje_incidencia(incidencia, datos))
@@ -0,0 +1,320 @@
+"""
+Escritura diferida (write-behind) de registros de asistencia.
+
+Con ASISTENCIA_ESCRITURA_DIFERIDA activo, registrar_asistencia() no inserta
+en la base de datos: agrega el registro ya validado a un buffer SQLite local
+en modo WAL y responde con un id_provisional. Un hilo por proceso (el
+vaciador) toma lotes del buffer cada ASISTENCIA_BUFFER_INTERVALO_MS y los
+inserta con bulk_create en una sola transacción, así el pico de la entrada
+cuesta un commit por lote y no uno por registro.
+
+Recuperación: un lote se "reclama" antes de escribirlo y se borra del
+buffer después del commit. Si el proceso muere a mitad, el reclamo expira
+(TIMEOUT_RECLAMO_S) y otro vaciador lo toma; las filas que ya llegaron a la
+base de datos se reconocen por Asistencia.id_provisional (único) y no se
+duplican. El vaciador de un proceso se inicia con el primer encolar(), o al
+cargar el servidor (config/wsgi.py y config/asgi.py llaman a
+iniciar_con_servidor()), así lo pendiente se vacía aunque no llegue ningún
+registro nuevo. migrate, shell o las pruebas no inician ninguno;
+`manage.py vaciar_buffer_asistencias` vacía el buffer a demanda.
+
+Durabilidad: synchronous=NORMAL en WAL sobrevive a la caída del proceso;
+ante un corte de energía pueden perderse las últimas escrituras del buffer.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from common import marcas
+
+from . import difusion, estado_hoy, resumen
+from .models import Asistencia, Incidencia
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+# Un lote reclamado por un proceso que murió se vuelve a tomar tras este tiempo
+TIMEOUT_RECLAMO_S = 30
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pendientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_provisional TEXT NOT NULL UNIQUE,
+    usuario_id INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    valido INTEGER NOT NULL,
+    datos TEXT NOT NULL,
+    reclamado_por TEXT,
+    reclamado_en REAL
+);
+CREATE INDEX IF NOT EXISTS pendientes_usuario_fecha ON pendientes (usuario_id, fecha);
+"""
+
+
+class BufferAsistencias:
+    """Cola durable en un archivo SQLite (una conexión por hilo y proceso)."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def _conexion(self):
+        # Tras un fork (gunicorn --preload) no se reutiliza la conexión del padre
+        pid, conn = getattr(self._local, 'conexion', (None, None))
+        if pid != os.getpid():
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(ESQUEMA)
+            self._local.conexion = (os.getpid(), conn)
+        return conn
+
+    def agregar(self, id_provisional, usuario_id, fecha, tipo, valido, datos):
+        """Guarda un registro; queda en disco al retornar."""
+        self._conexion().execute(
+            'INSERT INTO pendientes (id_provisional, usuario_id, fecha, tipo, valido, datos) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (id_provisional, usuario_id, fecha.isoformat(), tipo, int(valido), json.dumps(datos)),
+        )
+
+    def tipos_pendientes(self, usuario_id, fecha):
+        """Tipos (entrada/salida) válidos del día que aún no llegan a la base de datos."""
+        filas = self._conexion().execute(
+            'SELECT DISTINCT tipo FROM pendientes WHERE usuario_id = ? AND fecha = ? AND valido = 1',
+            (usuario_id, fecha.isoformat()),
+        )
+        return {tipo for (tipo,) in filas}
+
+    def reclamar(self, limite=TAMANO_LOTE):
+        """Marca hasta `limite` registros libres (o con reclamo vencido) como propios."""
+        conn = self._conexion()
+        ahora = time.time()
+        dueno = f'{os.getpid()}:{threading.get_ident()}'
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            filas = conn.execute(
+                'SELECT id, id_provisional, datos FROM pendientes '
+                'WHERE reclamado_por IS NULL OR reclamado_en < ? ORDER BY id LIMIT ?',
+                (ahora - TIMEOUT_RECLAMO_S, limite),
+            ).fetchall()
+            conn.executemany(
+                'UPDATE pendientes SET reclamado_por = ?, reclamado_en = ? WHERE id = ?',
+                [(dueno, ahora, fila[0]) for fila in filas],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return filas
+
+    def confirmar(self, ids):
+        """Borra del buffer los registros que ya están en la base de datos."""
+        self._conexion().executemany('DELETE FROM pendientes WHERE id = ?', [(i,) for i in ids])
+
+    def liberar(self, ids):
+        """Devuelve registros reclamados a la cola (falló la escritura)."""
+        self._conexion().executemany(
+            'UPDATE pendientes SET reclamado_por = NULL, reclamado_en = NULL WHERE id = ?',
+            [(i,) for i in ids],
+        )
+
+    def cantidad(self):
+        return self._conexion().execute('SELECT COUNT(*) FROM pendientes').fetchone()[0]
+
+
+# ──────────────────────────────────────────────
+# ENCOLAR
+# ──────────────────────────────────────────────
+
+_buffer = None
+_vaciador = None
+_candado = threading.Lock()
+
+
+def obtener_buffer():
+    global _buffer
+    if _buffer is None or _buffer.ruta != settings.ASISTENCIA_BUFFER_RUTA:
+        _buffer = BufferAsistencias(settings.ASISTENCIA_BUFFER_RUTA)
+    return _buffer
+
+
+def tipos_pendientes(usuario_id, fecha):
+    return obtener_buffer().tipos_pendientes(usuario_id, fecha)
+
+
+def encolar(asistencia, incidencia=None):
+    """
+    Agrega al buffer una asistencia (y su incidencia automática) sin guardar.
+    Asigna asistencia.id_provisional y deja el estado del día en cache.
+    """
+    # Aún sin guardar: save() no la ha llenado
+    fecha = asistencia.fecha_local = timezone.localdate(asistencia.fecha_hora)
+    datos = {
+        'usuario_id': asistencia.usuario_id,
+        'perimetro_id': asistencia.perimetro_id,
+        'red_autorizada_id': asistencia.red_autorizada_id,
+        'tipo': asistencia.tipo,
+        'latitud_real': str(asistencia.latitud_real),
+        'longitud_real': str(asistencia.longitud_real),
+        'ssid_conectado': asistencia.ssid_conectado,
+        'bssid_conectado': asistencia.bssid_conectado,
+        'wifi_valido': asistencia.wifi_valido,
+        'fecha_hora': asistencia.fecha_hora.isoformat(),
+        'valido': asistencia.valido,
+        'distancia_metros': asistencia.distancia_metros,
+        'incidencia': None,
+    }
+    if incidencia is not None:
+        datos['incidencia'] = {
+            'tipo': incidencia.tipo,
+            'fecha': incidencia.fecha.isoformat(),
+            'descripcion': incidencia.descripcion,
+        }
+    asistencia.id_provisional = uuid.uuid4().hex
+
+    # El estado del día se escribe antes de encolar: así la invalidación del
+    # vaciador, que puede correr apenas se agrega, siempre llega después.
+    # Import local: serializers → registro → este módulo
+    from .serializers import AsistenciaSerializer
+    serializada = AsistenciaSerializer(asistencia).data
+    estado_hoy.registrar_marcado(asistencia, serializada)
+    try:
+        obtener_buffer().agregar(
+            asistencia.id_provisional, asistencia.usuario_id, fecha,
+            asistencia.tipo, asistencia.valido, datos,
+        )
+    except Exception:
+        estado_hoy.invalidar(asistencia.usuario_id, fecha)
+        raise
+    asegurar_vaciador()
+    # bulk_create no envía señales: el panel en vivo se entera aquí
+    difusion.publicar_marcado(asistencia, serializada)
+    if incidencia is not None:
+        difusion.publicar_incidencia(incidencia)
+    return asistencia
+
+
+# ──────────────────────────────────────────────
+# VACIADO
+# ──────────────────────────────────────────────
+
+def _asistencia_desde(id_provisional, datos):
+    campos = {k: v for k, v in datos.items() if k != 'incidencia'}
+    campos['fecha_hora'] = datetime.fromisoformat(campos['fecha_hora'])
+    return Asistencia(id_provisional=id_provisional, **campos)
+
+
+def vaciar_lote(buffer=None, limite=TAMANO_LOTE):
+    """
+    Inserta en la base de datos un lote del buffer en una transacción.
+    Retorna cuántos registros se tomaron del buffer.
+    """
+    buffer = buffer or obtener_buffer()
+    filas = buffer.reclamar(limite)
+    if not filas:
+        return 0
+    ids = [fila[0] for fila in filas]
+    registros = {id_provisional: json.loads(datos) for _, id_provisional, datos in filas}
+
+    try:
+        with transaction.atomic():
+            # Los que llegaron antes de una caída (reclamo vencido) no se repiten
+            ya_guardados = set(
+                Asistencia.objects.filter(id_provisional__in=list(registros))
+                .values_list('id_provisional', flat=True)
+            )
+            asistencias, incidencias = [], []
+            for id_provisional, datos in registros.items():
+                if id_provisional in ya_guardados:
+                    continue
+                asistencias.append(_asistencia_desde(id_provisional, datos))
+                if datos['incidencia']:
+                    incidencias.append(Incidencia(
+                        usuario_id=datos['usuario_id'],
+                        tipo=datos['incidencia']['tipo'],
+                        fecha=date.fromisoformat(datos['incidencia']['fecha']),
+                        descripcion=datos['incidencia']['descripcion'],
+                    ))
+            Asistencia.objects.bulk_create(asistencias)
+            Incidencia.objects.bulk_create(incidencias)
+            pares = {(a.usuario_id, a.fecha_local) for a in asistencias}
+            resumen.recalcular(pares)
+            marcas.avanzar(*marcas.dias(pares))
+    except Exception:
+        buffer.liberar(ids)
+        raise
+
+    buffer.confirmar(ids)
+    # bulk_create no envía señales; la próxima consulta de estado-hoy lee los ids reales
+    estado_hoy.invalidar_varios(
+        (datos['usuario_id'], timezone.localdate(datetime.fromisoformat(datos['fecha_hora'])))
+        for datos in registros.values()
+    )
+    return len(filas)
+
+
+def vaciar_todo(buffer=None):
+    """Vacía el buffer completo (recuperación tras una caída, o al detener)."""
+    total = 0
+    while procesados := vaciar_lote(buffer):
+        total += procesados
+    return total
+
+
+class Vaciador(threading.Thread):
+    """Hilo que vacía el buffer cada `intervalo` segundos (o sin pausa si hay atraso)."""
+
+    def __init__(self, intervalo):
+        super().__init__(name='vaciador-asistencias', daemon=True)
+        self.intervalo = intervalo
+
+    def run(self):
+        while True:
+            try:
+                procesados = vaciar_lote()
+            except Exception:
+                logger.exception('No se pudo vaciar el buffer de asistencias')
+                connections.close_all()
+                procesados = 0
+            if procesados < TAMANO_LOTE:
+                time.sleep(self.intervalo)
+
+
+def asegurar_vaciador():
+    """
+    Inicia el vaciador de este proceso si aún no corre; se llama al cargar el
+    servidor y en cada encolar (tras un fork el hilo del padre no pasa al hijo). Con
+    ASISTENCIA_BUFFER_INTERVALO_MS = 0 no hay hilo: el buffer lo vacía un
+    proceso aparte (manage.py vaciar_buffer_asistencias --continuo).
+    """
+    global _vaciador
+    if not settings.ASISTENCIA_BUFFER_INTERVALO_MS:
+        return
+    if _vaciador is not None and _vaciador.is_alive() and _vaciador.pid == os.getpid():
+        return
+    with _candado:
+        if _vaciador is None or not _vaciador.is_alive() or _vaciador.pid != os.getpid():
+            _vaciador = Vaciador(settings.ASISTENCIA_BUFFER_INTERVALO_MS / 1000)
+            _vaciador.pid = os.getpid()
+            _vaciador.start()
+
+
+def iniciar_con_servidor():
+    """
+    Para los puntos de entrada del servidor (WSGI/ASGI): con escritura
+    diferida, lo que quedó en el buffer tras una caída se vacía sin esperar
+    un registro nuevo. Bajo runserver se carga en el proceso hijo del
+    autoreloader, no en el que vigila los archivos.
+    """
+    if settings.ASISTENCIA_ESCRITURA_DIFERIDA:
+        asegurar_vaciador()
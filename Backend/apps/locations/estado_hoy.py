@@ -0,0 +1,109 @@
+"""
+Estado de asistencia del día por usuario, en la cache de Django.
+
+La app consulta /api/asistencia/estado-hoy/ cada vez que abre una
+pantalla. Aquí se guarda, por usuario y fecha local, la entrada y la
+salida válidas del día (id, fecha_hora y sus datos serializados) para
+responder sin consultar Asistencia. El registro escribe directo en la
+entrada de cache y las ediciones o borrados la invalidan. Cada entrada
+expira a la medianoche local (TIME_ZONE, America/Mexico_City). Sin cache
+compartida (common/cache_compartida.py) no se guarda nada: otro worker
+vería su copia vieja del día.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from common import cache_compartida
+
+from .models import Asistencia
+
+PREFIJO = 'asistencia:estado-hoy'
+
+
+def clave(usuario_id, fecha):
+    return f'{PREFIJO}:{usuario_id}:{fecha.isoformat()}'
+
+
+def segundos_hasta_medianoche(ahora=None):
+    """Segundos que faltan para la medianoche local siguiente (mínimo 1)."""
+    ahora = timezone.localtime(ahora)
+    manana = datetime.combine(ahora.date() + timedelta(days=1), time.min)
+    medianoche = timezone.make_aware(manana, ahora.tzinfo)
+    return max(1, int((medianoche - ahora).total_seconds()))
+
+
+def vacio():
+    return {
+        'entrada_id': None, 'entrada_fecha_hora': None, 'entrada': None,
+        'salida_id': None, 'salida_fecha_hora': None, 'salida': None,
+    }
+
+
+def obtener(usuario_id, fecha):
+    """Estado guardado del día o None si no está en cache."""
+    if not cache_compartida.compartida():
+        return None
+    return cache.get(clave(usuario_id, fecha))
+
+
+async def aobtener(usuario_id, fecha):
+    if not cache_compartida.compartida():
+        return None
+    return await cache.aget(clave(usuario_id, fecha))
+
+
+def guardar(usuario_id, fecha, estado):
+    """Guarda el estado del día; solo se cachea el día actual."""
+    ahora = timezone.localtime()
+    if fecha != ahora.date() or not cache_compartida.compartida():
+        return
+    cache.set(clave(usuario_id, fecha), estado, segundos_hasta_medianoche(ahora))
+
+
+async def aguardar(usuario_id, fecha, estado):
+    ahora = timezone.localtime()
+    if fecha != ahora.date() or not cache_compartida.compartida():
+        return
+    await cache.aset(clave(usuario_id, fecha), estado, segundos_hasta_medianoche(ahora))
+
+
+def anotar(estado, asistencia, datos):
+    """
+    Pone la asistencia (y sus datos serializados) en su lugar del estado.
+    Con escritura diferida aún no tiene id: se usa su id_provisional.
+    """
+    campo = 'entrada' if asistencia.tipo == Asistencia.Tipo.ENTRADA else 'salida'
+    estado[f'{campo}_id'] = asistencia.id or asistencia.id_provisional
+    estado[f'{campo}_fecha_hora'] = asistencia.fecha_hora
+    estado[campo] = datos
+    return estado
+
+
+def registrar_marcado(asistencia, datos):
+    """
+    Write-through tras un registro confirmado. Si el día aún no está en
+    cache solo se crea para una entrada: una salida exige conocer la
+    entrada, y eso se carga en la próxima consulta de estado-hoy.
+    """
+    if not asistencia.valido:
+        return
+    fecha = asistencia.fecha_local
+    estado = obtener(asistencia.usuario_id, fecha)
+    if estado is None:
+        if asistencia.tipo != Asistencia.Tipo.ENTRADA:
+            return
+        estado = vacio()
+    guardar(asistencia.usuario_id, fecha, anotar(estado, asistencia, datos))
+
+
+def invalidar(usuario_id, fecha):
+    cache.delete(clave(usuario_id, fecha))
+
+
+def invalidar_varios(pares):
+    """Invalida varios (usuario_id, fecha) de una vez."""
+    claves = [clave(usuario_id, fecha) for usuario_id, fecha in set(pares)]
+    if claves:
+        cache.delete_many(claves)
@@ -0,0 +1,133 @@
+"""
+Horario semanal compilado por usuario, en la cache de Django.
+
+Cada usuario tiene una tupla de 7 posiciones (lunes=0 … domingo=6) con su
+horario del día en minutos desde la medianoche y las tolerancias ya
+aplicadas. Clasificar un marcado (a tiempo, retardo, salida temprana) es
+entonces aritmética de enteros, sin consultar Horario ni construir
+datetimes. Las señales de Horario invalidan la entrada del usuario. Sin
+cache compartida (common/cache_compartida.py) se compila en cada consulta:
+otro worker no vería la invalidación.
+"""
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+
+from apps.users.models import Horario
+from common import cache_compartida
+
+from .models import Asistencia, Incidencia
+
+# Minutos de tolerancia para considerar retardo (ej: 15 min después de hora_entrada)
+TOLERANCIA_RETARDO_MIN = 10
+# Minutos antes de hora_salida para considerar salida temprana
+TOLERANCIA_SALIDA_TEMPRANA_MIN = 15
+
+PREFIJO = 'asistencia:horario-semanal'
+TTL_SEGUNDOS = 24 * 3600
+
+# Todo en minutos desde la medianoche
+HorarioDia = namedtuple('HorarioDia', ['entrada', 'salida', 'limite_retardo', 'limite_salida_temprana'])
+
+
+def a_minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def a_segundos(hora):
+    return hora.hour * 3600 + hora.minute * 60 + hora.second
+
+
+def formato(minutos):
+    """Minutos desde la medianoche como HH:MM."""
+    return f'{minutos // 60:02d}:{minutos % 60:02d}'
+
+
+def compilar(filas):
+    """(dia_semana, hora_entrada, hora_salida) → tupla de 7 HorarioDia o None."""
+    semana = [None] * 7
+    for dia, hora_entrada, hora_salida in filas:
+        entrada, salida = a_minutos(hora_entrada), a_minutos(hora_salida)
+        semana[dia] = HorarioDia(
+            entrada=entrada,
+            salida=salida,
+            limite_retardo=entrada + TOLERANCIA_RETARDO_MIN,
+            limite_salida_temprana=salida - TOLERANCIA_SALIDA_TEMPRANA_MIN,
+        )
+    return tuple(semana)
+
+
+def evaluar_horario(tipo, horario, hora_actual):
+    """
+    Compara la hora de marcado contra el horario compilado del día.
+    Retorna el tipo de incidencia a generar (retardo / salida temprana) o None.
+    """
+    segundos = a_segundos(hora_actual)
+    if tipo == Asistencia.Tipo.ENTRADA:
+        if segundos > horario.limite_retardo * 60:
+            return Incidencia.Tipo.RETARDO
+    elif segundos < horario.limite_salida_temprana * 60:
+        return Incidencia.Tipo.SALIDA_TEMPRANA
+    return None
+
+
+def minutos_tarde(horario, hora_actual):
+    return (a_segundos(hora_actual) - horario.entrada * 60) // 60
+
+
+def minutos_antes(horario, hora_actual):
+    return (horario.salida * 60 - a_segundos(hora_actual)) // 60
+
+
+def _filas(usuario_id):
+    return Horario.objects.filter(usuario_id=usuario_id).values_list('dia_semana', 'hora_entrada', 'hora_salida')
+
+
+def clave(usuario_id):
+    return f'{PREFIJO}:{usuario_id}'
+
+
+def horario_semanal(usuario_id):
+    if not cache_compartida.compartida():
+        return compilar(_filas(usuario_id))
+    semana = cache.get(clave(usuario_id))
+    if semana is None:
+        semana = compilar(_filas(usuario_id))
+        cache.set(clave(usuario_id), semana, TTL_SEGUNDOS)
+    return semana
+
+
+async def ahorario_semanal(usuario_id):
+    if not cache_compartida.compartida():
+        return compilar([fila async for fila in _filas(usuario_id)])
+    semana = await cache.aget(clave(usuario_id))
+    if semana is None:
+        semana = compilar([fila async for fila in _filas(usuario_id)])
+        await cache.aset(clave(usuario_id), semana, TTL_SEGUNDOS)
+    return semana
+
+
+def horarios_semanales(usuario_ids):
+    """
+    Horario semanal compilado de varios usuarios en una consulta, sin pasar
+    por la cache (reconstrucciones y recálculos por lotes).
+    """
+    filas = defaultdict(list)
+    consulta = Horario.objects.filter(usuario_id__in=usuario_ids).values_list(
+        'usuario_id', 'dia_semana', 'hora_entrada', 'hora_salida',
+    )
+    for usuario_id, *fila in consulta:
+        filas[usuario_id].append(fila)
+    return {usuario_id: compilar(filas[usuario_id]) for usuario_id in usuario_ids}
+
+
+def horario_del_dia(usuario_id, fecha):
+    return horario_semanal(usuario_id)[fecha.weekday()]
+
+
+async def ahorario_del_dia(usuario_id, fecha):
+    return (await ahorario_semanal(usuario_id))[fecha.weekday()]
+
+
+def invalidar(usuario_id):
+    cache.delete(clave(usuario_id))
@@ -0,0 +1,259 @@
+"""
+Índices en memoria para el registro de asistencia.
+
+Las redes autorizadas y los perímetros casi nunca cambian, pero se
+consultan en cada registro. Cada proceso mantiene una copia local de
+cada índice y la reconstruye cuando cambia el sello de versión
+compartido en la caché de Django, así todos los workers convergen
+después de una edición. Si la caché es local al proceso, el sello de
+otro worker no se ve: el índice se reconstruye en cada verificación
+(ver common/cache_compartida.py).
+"""
+import threading
+import time
+from collections import defaultdict
+from math import radians, sin, cos, sqrt, atan2, floor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common import cache_compartida
+
+from .models import RedAutorizada, Perimetro
+
+RADIO_TIERRA_M = 6371000
+METROS_POR_GRADO = 111320
+
+
+def normalizar_bssid(bssid):
+    """Normaliza un BSSID a mayúsculas y sin espacios."""
+    return (bssid or '').strip().upper()
+
+
+def distancia_haversine(lat1, lng1, lat2, lng2):
+    """Distancia en metros entre dos puntos (misma fórmula que Perimetro.esta_dentro)."""
+    dlat = radians(lat2 - lat1)
+    dlng = radians(lng2 - lng1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng / 2) ** 2
+    return RADIO_TIERRA_M * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+class IndiceEnMemoria:
+    """
+    Base para índices locales al proceso con sello de versión.
+
+    invalidar() publica una versión nueva en la caché compartida.
+    Cada proceso compara su versión local como máximo una vez cada
+    `intervalo_verificacion` segundos y reconstruye si cambió.
+    """
+    clave_version = None
+    intervalo_verificacion = 2  # segundos
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = None
+        self._version = None
+        self._verificado_en = 0.0
+
+    def _construir(self):
+        raise NotImplementedError
+
+    def _version_compartida(self):
+        if not cache_compartida.compartida():
+            # Versión que nunca coincide: el índice dura intervalo_verificacion segundos
+            return object()
+        version = cache.get(self.clave_version)
+        if version is None:
+            cache.add(self.clave_version, time.time_ns(), timeout=None)
+            version = cache.get(self.clave_version)
+        return version
+
+    def datos(self):
+        """Devuelve los datos del índice, reconstruyéndolos si están obsoletos."""
+        ahora = time.monotonic()
+        datos = self._datos
+        if datos is not None and ahora - self._verificado_en < self.intervalo_verificacion:
+            return datos
+
+        version = self._version_compartida()
+        with self._lock:
+            if self._datos is None or version != self._version:
+                self._datos = self._construir()
+                self._version = version
+            self._verificado_en = ahora
+            return self._datos
+
+    def invalidar(self):
+        """Marca el índice como obsoleto en este y en los demás procesos."""
+        cache.set(self.clave_version, time.time_ns(), timeout=None)
+        with self._lock:
+            self._datos = None
+
+
+class IndiceRedes(IndiceEnMemoria):
+    """
+    Redes Wi-Fi autorizadas activas, indexadas por BSSID normalizado y por SSID.
+    Ante duplicados se conserva la red con menor id.
+    """
+    clave_version = 'indice_redes_version'
+
+    def _construir(self):
+        por_bssid = {}
+        por_ssid = {}
+        for red in RedAutorizada.objects.filter(activo=True).order_by('id'):
+            por_bssid.setdefault(normalizar_bssid(red.bssid), red)
+            por_ssid.setdefault(red.ssid, red)
+        return por_bssid, por_ssid
+
+    def buscar(self, ssid, bssid):
+        """
+        Busca la red autorizada por BSSID (más confiable, el SSID puede
+        clonarse) y, si no existe, por SSID. Retorna la red o None.
+        """
+        if not settings.ASISTENCIA_INDICES_EN_MEMORIA:
+            return self._buscar_en_bd(ssid, bssid)
+
+        por_bssid, por_ssid = self.datos()
+        red = None
+        if bssid:
+            red = por_bssid.get(normalizar_bssid(bssid))
+        if red is None and ssid:
+            red = por_ssid.get(ssid)
+        return red
+
+    def _buscar_en_bd(self, ssid, bssid):
+        """Búsqueda directa en la base de datos (sin índice)."""
+        red = None
+        if bssid:
+            red = RedAutorizada.objects.filter(bssid=bssid, activo=True).first()
+        if red is None and ssid:
+            red = RedAutorizada.objects.filter(ssid=ssid, activo=True).first()
+        return red
+
+
+class IndicePerimetros(IndiceEnMemoria):
+    """
+    Perímetros activos en una cuadrícula uniforme de lat/lng.
+
+    Cada perímetro se registra en todas las celdas que toca su caja
+    envolvente, así una búsqueda solo evalúa los candidatos de la celda
+    del punto y descarta por caja antes de calcular Haversine. Fuera de
+    todos los perímetros, el más cercano se busca por anillos de celdas
+    alrededor del punto.
+    """
+    clave_version = 'indice_perimetros_version'
+    tamano_celda = 0.01  # grados (~1.1 km)
+
+    def _celda(self, grados):
+        return int(floor(grados / self.tamano_celda))
+
+    @staticmethod
+    def _anillo(i, j, r):
+        """Celdas a distancia r (en celdas) de (i, j): 8r celdas, o la propia con r = 0."""
+        if r == 0:
+            yield i, j
+            return
+        for d in range(-r, r + 1):
+            yield i + d, j - r
+            yield i + d, j + r
+        for d in range(-r + 1, r):
+            yield i - r, j + d
+            yield i + r, j + d
+
+    def _construir(self):
+        celdas = defaultdict(list)
+        todos = []
+        for perimetro in Perimetro.objects.filter(activo=True).order_by('id'):
+            lat = float(perimetro.latitud)
+            lng = float(perimetro.longitud)
+            dlat = perimetro.radio_metros / METROS_POR_GRADO
+            dlng = perimetro.radio_metros / (METROS_POR_GRADO * max(cos(radians(lat)), 1e-6))
+            caja = (lat - dlat, lat + dlat, lng - dlng, lng + dlng)
+            candidato = (perimetro, lat, lng, caja)
+            todos.append(candidato)
+            for i in range(self._celda(caja[0]), self._celda(caja[1]) + 1):
+                for j in range(self._celda(caja[2]), self._celda(caja[3]) + 1):
+                    celdas[(i, j)].append(candidato)
+        return dict(celdas), todos
+
+    def localizar(self, lat, lng):
+        """
+        Resuelve el perímetro de un punto.
+        Retorna (perimetro, dentro, distancia_metros) con el perímetro
+        contenedor más cercano. Si ningún perímetro contiene el punto,
+        retorna el más cercano (por centro) para registrar la distancia.
+        Retorna None si no hay perímetros activos.
+        """
+        lat = float(lat)
+        lng = float(lng)
+        if not settings.ASISTENCIA_INDICES_EN_MEMORIA:
+            return self._localizar_en_bd(lat, lng)
+
+        celdas, todos = self.datos()
+        if not todos:
+            return None
+
+        i, j = self._celda(lat), self._celda(lng)
+        mejor = None
+        for perimetro, plat, plng, caja in celdas.get((i, j), ()):
+            lat_min, lat_max, lng_min, lng_max = caja
+            if not (lat_min <= lat <= lat_max and lng_min <= lng <= lng_max):
+                continue
+            distancia = distancia_haversine(plat, plng, lat, lng)
+            if distancia <= perimetro.radio_metros and (mejor is None or distancia < mejor[1]):
+                mejor = (perimetro, distancia)
+
+        if mejor:
+            return mejor[0], True, round(mejor[1], 2)
+
+        perimetro, distancia = self._mas_cercano(celdas, todos, lat, lng, i, j)
+        return perimetro, False, round(distancia, 2)
+
+    def _mas_cercano(self, celdas, todos, lat, lng, i, j):
+        """
+        Perímetro con el centro más cercano al punto, por anillos de celdas.
+        Un perímetro que aparece por primera vez en el anillo r tiene el
+        centro al menos a r - 1 celdas, así que la búsqueda se detiene en
+        cuanto ese mínimo supera la mejor distancia. Si los anillos ya
+        recorrieron más celdas de las que tiene el índice (punto lejos de
+        todo), cuesta menos medir los perímetros que faltan.
+        """
+        # La celda es más angosta en longitud: esa es la cota segura
+        metros_celda = self.tamano_celda * METROS_POR_GRADO * max(cos(radians(lat)), 1e-6)
+        vistos = set()
+        mejor = None
+
+        def medir(candidatos):
+            nonlocal mejor
+            for perimetro, plat, plng, _ in candidatos:
+                if perimetro.pk in vistos:
+                    continue
+                vistos.add(perimetro.pk)
+                distancia = distancia_haversine(plat, plng, lat, lng)
+                if mejor is None or distancia < mejor[1]:
+                    mejor = (perimetro, distancia)
+
+        recorridas = 0
+        r = 0
+        while mejor is None or (r - 1) * metros_celda < mejor[1]:
+            if recorridas >= len(celdas):
+                medir(todos)
+                break
+            for celda in self._anillo(i, j, r):
+                medir(celdas.get(celda, ()))
+            recorridas += max(8 * r, 1)
+            r += 1
+        return mejor
+
+    def _localizar_en_bd(self, lat, lng):
+        """Búsqueda directa en la base de datos (sin índice)."""
+        mejor = None
+        for perimetro in Perimetro.objects.filter(activo=True).order_by('id'):
+            dentro, distancia = perimetro.esta_dentro(lat, lng)
+            if mejor is None or (dentro, -distancia) > (mejor[1], -mejor[2]):
+                mejor = (perimetro, dentro, distancia)
+        return mejor
+
+
+indice_redes = IndiceRedes()
+indice_perimetros = IndicePerimetros()
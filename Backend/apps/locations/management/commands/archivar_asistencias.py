@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.locations import archivo, particiones
+from apps.locations.models import Asistencia
+
+
+def _mes(valor):
+    return date.fromisoformat(f'{valor}-01')
+
+
+class Command(BaseCommand):
+    help = (
+        'Archiva los meses de asistencias anteriores a --antes-de (o a los últimos '
+        '--conservar meses): los exporta a ASISTENCIA_ARCHIVO_DIR como CSV comprimido '
+        'y los quita de la tabla (en PostgreSQL, desprendiendo su partición).'
+    )
+
+    def add_arguments(self, parser):
+        grupo = parser.add_mutually_exclusive_group()
+        grupo.add_argument('--antes-de', type=_mes, help='Primer mes que se conserva (AAAA-MM)')
+        grupo.add_argument('--conservar', type=int, default=24, help='Meses que se conservan, incluido el actual')
+        parser.add_argument('--dry-run', action='store_true', help='Solo lista los meses y sus registros')
+
+    def handle(self, *args, **options):
+        actual = particiones.mes(timezone.localdate())
+        limite = options['antes_de'] or self._restar_meses(actual, options['conservar'] - 1)
+        # El mes actual y el anterior aún reciben registros offline
+        if limite > self._restar_meses(actual, 1):
+            raise CommandError('Solo se pueden archivar meses anteriores al mes pasado.')
+
+        meses = sorted(
+            {particiones.mes(d) for d in Asistencia.objects.filter(fecha_local__lt=limite).dates('fecha_local', 'month')}
+            | {m for m in particiones.existentes() if m < limite}
+        )
+        if not meses:
+            self.stdout.write('No hay meses por archivar.')
+            return
+
+        for primero in meses:
+            if options['dry_run']:
+                total = Asistencia.objects.filter(
+                    fecha_local__gte=primero, fecha_local__lt=particiones.siguiente_mes(primero),
+                ).count()
+                self.stdout.write(f'[dry-run] {primero:%Y-%m}: {total} asistencias')
+                continue
+            try:
+                total = archivo.archivar(primero)
+            except FileExistsError as e:
+                raise CommandError(f'{primero:%Y-%m} ya está archivado ({e}).')
+            self.stdout.write(f'{primero:%Y-%m}: {total} asistencias → {archivo.ruta(primero)}')
+
+    @staticmethod
+    def _restar_meses(primero, meses):
+        indice = primero.year * 12 + primero.month - 1 - meses
+        return date(indice // 12, indice % 12 + 1, 1)
@@ -0,0 +1,27 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.locations import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Consulta de solo lectura del archivo de asistencias (ASISTENCIA_ARCHIVO_DIR). '
+        'Imprime una asistencia por línea en JSON, de la más reciente a la más antigua.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, help='Id del usuario')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primera fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Última fecha (AAAA-MM-DD)')
+        parser.add_argument('--meses', action='store_true', help='Solo lista los meses archivados')
+
+    def handle(self, *args, **options):
+        if options['meses']:
+            for primero in archivo.meses_archivados():
+                self.stdout.write(f'{primero:%Y-%m}  {archivo.ruta(primero)}')
+            return
+        for asistencia in archivo.buscar(options['usuario'], options['desde'], options['hasta']):
+            self.stdout.write(json.dumps(asistencia, ensure_ascii=False))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.locations import particiones
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea por adelantado las particiones mensuales de asistencias (PostgreSQL) '
+        'desde el mes actual. Programarlo mensualmente (cron) para no depender de '
+        'la partición DEFAULT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=3, help='Meses a cubrir, incluido el actual')
+
+    def handle(self, *args, **options):
+        if not particiones.disponible():
+            self.stdout.write(f'La tabla de asistencias no está particionada ({connection.vendor}): nada que hacer.')
+            return
+        creadas = particiones.crear(timezone.localdate(), options['meses'])
+        for nombre, movidas in creadas:
+            self.stdout.write(f'Creada {nombre}' + (f' ({movidas} filas movidas de DEFAULT)' if movidas else ''))
+        self.stdout.write(self.style.SUCCESS(f'{len(creadas)} particiones nuevas'))
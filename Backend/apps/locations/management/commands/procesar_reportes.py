@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.trabajos import limpiar, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera los reportes PDF pendientes (recuperación tras una caída, o trabajador '
+        'dedicado con --continuo) y borra los que no se han usado con --limpiar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Seguir procesando hasta Ctrl+C')
+        parser.add_argument('--intervalo', type=float, default=2, help='Segundos entre revisiones con --continuo')
+        parser.add_argument('--limpiar', type=int, metavar='DIAS', help='Borrar los PDF sin usar en DIAS días')
+
+    def handle(self, *args, **options):
+        if options['limpiar'] is not None:
+            self.stdout.write(f'{limpiar(options["limpiar"])} archivos borrados')
+
+        if not options['continuo']:
+            self.stdout.write(f'{procesar_pendientes()} reportes generados')
+            return
+
+        total = 0
+        try:
+            while True:
+                procesados = procesar_pendientes()
+                total += procesados
+                if not procesados:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write(f'{total} reportes generados')
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.locations.resumen import rango_registrado, reconstruir_por_bloques
+from common import marcas
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el resumen diario (ResumenDiario) a partir de las asistencias e '
+        'incidencias, por bloques de días. Por defecto, todo el historial. Al desplegar '
+        'sobre una base con historial, se corre una vez después de migrate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primera fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Última fecha (por defecto, hoy)')
+        parser.add_argument('--dias', type=int, default=31, help='Días por transacción')
+
+    def handle(self, *args, **options):
+        hasta = options['hasta'] or timezone.localdate()
+        rango = rango_registrado()
+        desde = options['desde'] or (rango and rango[0])
+        if desde is None:
+            self.stdout.write('No hay asistencias ni incidencias registradas.')
+            return
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior o igual a --hasta.')
+
+        total = 0
+        for inicio, fin, creados in reconstruir_por_bloques(desde, hasta, options['dias']):
+            # Panel, ETags y reportes en caché de esos días dejan de valer
+            dias = [inicio + timedelta(days=d) for d in range((fin - inicio).days + 1)]
+            marcas.avanzar(*{marcas.panel(d) for d in dias}, *{marcas.mes(d) for d in dias})
+            total += creados
+            self.stdout.write(f'{inicio} → {fin}: {creados} resúmenes')
+        self.stdout.write(self.style.SUCCESS(f'{total} resúmenes reconstruidos'))
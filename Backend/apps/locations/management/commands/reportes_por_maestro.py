@@ -0,0 +1,48 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from common import por_maestro
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el reporte de asistencia de cada maestro del período en paralelo: '
+        'un ZIP con un PDF por maestro o un PDF unido con un marcador por maestro.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, required=True, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, required=True, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--usuario', type=int, help='Solo este maestro')
+        parser.add_argument('--salida', choices=por_maestro.SALIDAS, default='zip')
+        parser.add_argument(
+            '--procesos', type=int, default=settings.REPORTES_PROCESOS,
+            help='Procesos que generan los PDF (por defecto REPORTES_PROCESOS)',
+        )
+        parser.add_argument('--archivo', help='Ruta del resultado (por defecto reportes_<desde>_<hasta>.<salida>)')
+
+    def handle(self, *args, **options):
+        if options['desde'] > options['hasta']:
+            raise CommandError('--desde debe ser anterior o igual a --hasta.')
+        if options['procesos'] < 1:
+            raise CommandError('--procesos debe ser al menos 1.')
+        parametros = {
+            'fecha_inicio': options['desde'].isoformat(),
+            'fecha_fin': options['hasta'].isoformat(),
+            'usuario': options['usuario'],
+        }
+        ruta = options['archivo'] or f'reportes_{options["desde"]}_{options["hasta"]}.{options["salida"]}'
+
+        inicio = time.perf_counter()
+        with open(ruta, 'wb') as destino:
+            maestros, paginas = por_maestro.generar(
+                parametros, destino, options['salida'], options['procesos'],
+            )
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{maestros} maestros, {paginas} páginas en {segundos:.1f} s '
+            f'({paginas / segundos:.1f} páginas/s) → {ruta}'
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.locations.models import Perimetro
+from apps.locations.revalidacion import revalidar_perimetro, TAMANO_BLOQUE
+
+
+class Command(BaseCommand):
+    help = 'Recalcula valido y distancia_metros de las asistencias de uno o todos los perímetros.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('perimetro_id', nargs='?', type=int, help='Id del perímetro (por defecto, todos)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo reporta cuántos registros cambiarían')
+        parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE)
+
+    def handle(self, *args, **options):
+        perimetros = Perimetro.objects.order_by('id')
+        if options['perimetro_id']:
+            perimetros = perimetros.filter(id=options['perimetro_id'])
+            if not perimetros.exists():
+                raise CommandError(f'No existe el perímetro {options["perimetro_id"]}.')
+
+        for perimetro in perimetros:
+            r = revalidar_perimetro(
+                perimetro,
+                tamano_bloque=options['tamano_bloque'],
+                dry_run=options['dry_run'],
+            )
+            prefijo = '[dry-run] ' if r['dry_run'] else ''
+            self.stdout.write(
+                f'{prefijo}{perimetro.nombre}: {r["revisados"]} revisados, '
+                f'{r["actualizados"]} con cambios, '
+                f'{r["a_valido"]} pasan a válidos, {r["a_invalido"]} pasan a inválidos'
+            )
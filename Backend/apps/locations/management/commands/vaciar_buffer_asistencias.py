@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.locations.escritura_diferida import obtener_buffer, vaciar_lote, vaciar_todo
+
+
+class Command(BaseCommand):
+    help = (
+        'Inserta en la base de datos los registros pendientes del buffer de escritura '
+        'diferida (recuperación tras una caída, o vaciador dedicado con --continuo).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Seguir vaciando hasta Ctrl+C')
+
+    def handle(self, *args, **options):
+        buffer = obtener_buffer()
+        self.stdout.write(f'{buffer.ruta}: {buffer.cantidad()} registros pendientes')
+
+        if not options['continuo']:
+            self.stdout.write(f'{vaciar_todo(buffer)} registros insertados')
+            return
+
+        intervalo = (settings.ASISTENCIA_BUFFER_INTERVALO_MS or 250) / 1000
+        total = 0
+        try:
+            while True:
+                procesados = vaciar_lote(buffer)
+                total += procesados
+                if not procesados:
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write(f'{total} registros insertados')
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0004_asistencia_bssid_conectado_asistencia_ssid_conectado_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asistencia',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Hora del marcado (del dispositivo en registros offline)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_asistencia_fecha_hora_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='id_provisional',
+            field=models.CharField(blank=True, editable=False, help_text='Id devuelto al registrar con escritura diferida (buffer local)', max_length=32, null=True, unique=True),
+        ),
+    ]
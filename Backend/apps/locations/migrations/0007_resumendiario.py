@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0006_asistencia_id_provisional'),
+        ('users', '0003_alter_horario_options_alter_rol_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('minutos_retardo', models.PositiveIntegerField(default=0)),
+                ('minutos_salida_temprana', models.PositiveIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('sin_registro', 'Sin registro'), ('fuera_de_perimetro', 'Fuera de perímetro'), ('en_turno', 'En turno'), ('turno_completado', 'Turno completado')], default='sin_registro', max_length=20)),
+                ('tiene_falta', models.BooleanField(default=False)),
+                ('tiene_retardo', models.BooleanField(default=False)),
+                ('tiene_justificacion', models.BooleanField(default=False)),
+                ('tiene_salida_temprana', models.BooleanField(default=False)),
+                ('entrada', models.ForeignKey(blank=True, help_text='Primera entrada válida del día (o la entrada inválida si no hay válida)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='locations.asistencia')),
+                ('salida', models.ForeignKey(blank=True, help_text='Última salida del día', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='locations.asistencia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='users.usuario')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-fecha'],
+                'unique_together': {('usuario', 'fecha')},
+            },
+        ),
+    ]
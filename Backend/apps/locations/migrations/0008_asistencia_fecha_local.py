@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TAMANO_LOTE = 5000
+
+
+def llenar_fecha_local(apps, schema_editor):
+    Asistencia = apps.get_model('locations', 'Asistencia')
+    if schema_editor.connection.vendor == 'postgresql':
+        # Una sola sentencia, sin traer las filas a Python
+        schema_editor.execute(
+            'UPDATE locations_asistencia SET fecha_local = (fecha_hora AT TIME ZONE %s)::date',
+            [settings.TIME_ZONE],
+        )
+        return
+    pendientes = Asistencia.objects.filter(fecha_local__isnull=True).only('id', 'fecha_hora').order_by('id')
+    lote = []
+    for asistencia in pendientes.iterator(chunk_size=TAMANO_LOTE):
+        asistencia.fecha_local = timezone.localdate(asistencia.fecha_hora)
+        lote.append(asistencia)
+        if len(lote) == TAMANO_LOTE:
+            Asistencia.objects.bulk_update(lote, ['fecha_local'])
+            lote = []
+    Asistencia.objects.bulk_update(lote, ['fecha_local'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0007_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='fecha_local',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_fecha_local, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='fecha_local',
+            field=models.DateField(editable=False, help_text='Fecha de fecha_hora en la zona horaria local; se filtra por día sin convertir cada fila'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['usuario', 'fecha_local', 'tipo', 'valido'], name='asistencia_usuario_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha_local', 'usuario'], name='asistencia_dia_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='asistencia_fecha_hora_id_idx'),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:20
+
+from datetime import date
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLA = 'locations_asistencia'
+ANTERIOR = 'locations_asistencia_sin_particionar'
+MESES_ADELANTE = 3
+
+
+def _siguiente_mes(primero):
+    return date(primero.year + primero.month // 12, primero.month % 12 + 1, 1)
+
+
+def _limite(primero):
+    return f'{primero:%Y-%m-%d} 00:00:00 {settings.TIME_ZONE}'
+
+
+def particionar(apps, schema_editor):
+    """
+    Solo PostgreSQL: recrea locations_asistencia particionada por mes local
+    de fecha_hora (ver apps/locations/particiones.py), copia las filas y
+    vuelve a crear índices, llaves foráneas y la secuencia del id con DDL
+    explícito para el estado del modelo en 0008 (modelos históricos).
+    La llave primaria pasa a ser (id, fecha_hora) y la unicidad de
+    id_provisional, (id_provisional, fecha_hora): en una tabla particionada
+    toda restricción única debe incluir la llave de partición.
+    Al revertir la tabla queda particionada; sigue siendo compatible.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Asistencia = apps.get_model('locations', 'Asistencia')
+    q = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {ANTERIOR}')
+        # Columnas, defaults y NOT NULL; ni índices ni restricciones
+        cursor.execute(
+            f'CREATE TABLE {TABLA} (LIKE {ANTERIOR} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (fecha_hora)'
+        )
+        # El default del id depende de la secuencia de la tabla anterior
+        cursor.execute(f'ALTER TABLE {TABLA} ALTER COLUMN id DROP DEFAULT')
+
+        cursor.execute(f'SELECT min(fecha_local) FROM {ANTERIOR}')
+        hoy = timezone.localdate()
+        primera = cursor.fetchone()[0] or hoy
+        primero, ultimo = date(primera.year, primera.month, 1), date(hoy.year, hoy.month, 1)
+        for _ in range(MESES_ADELANTE - 1):
+            ultimo = _siguiente_mes(ultimo)
+        while primero <= ultimo:
+            cursor.execute(
+                f'CREATE TABLE {TABLA}_p{primero:%Y_%m} PARTITION OF {TABLA} FOR VALUES FROM (%s) TO (%s)',
+                [_limite(primero), _limite(_siguiente_mes(primero))],
+            )
+            primero = _siguiente_mes(primero)
+        cursor.execute(f'CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {TABLA} SELECT * FROM {ANTERIOR}')
+        # Con la tabla anterior se van sus índices y restricciones: los nombres quedan libres
+        cursor.execute(f'DROP TABLE {ANTERIOR}')
+
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, fecha_hora)')
+        cursor.execute(
+            f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_id_provisional_key UNIQUE (id_provisional, fecha_hora)'
+        )
+        cursor.execute(
+            f'CREATE INDEX {TABLA}_id_provisional_like ON {TABLA} (id_provisional varchar_pattern_ops)'
+        )
+        for nombre in ('usuario', 'perimetro', 'red_autorizada'):
+            campo = Asistencia._meta.get_field(nombre)
+            destino = campo.related_model._meta
+            cursor.execute(
+                f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_{campo.column}_fk '
+                f'FOREIGN KEY ({q(campo.column)}) REFERENCES {q(destino.db_table)} ({q(destino.pk.column)}) '
+                'DEFERRABLE INITIALLY DEFERRED'
+            )
+            cursor.execute(f'CREATE INDEX {TABLA}_{campo.column}_idx ON {TABLA} ({q(campo.column)})')
+    # asistencia_usuario_dia_idx, asistencia_dia_usuario_idx y asistencia_fecha_hora_id_idx (0008)
+    for indice in Asistencia._meta.indexes:
+        schema_editor.execute(indice.create_sql(Asistencia, schema_editor))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'CREATE SEQUENCE {TABLA}_id_seq OWNED BY {TABLA}.id')
+        cursor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{TABLA}_id_seq')")
+        cursor.execute(f"SELECT setval('{TABLA}_id_seq', coalesce(max(id), 0) + 1, false) FROM {TABLA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0008_asistencia_fecha_local'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumendiario',
+            name='entrada',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Primera entrada válida del día (o la entrada inválida si no hay válida)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='locations.asistencia'),
+        ),
+        migrations.AlterField(
+            model_name='resumendiario',
+            name='salida',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Última salida del día', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='locations.asistencia'),
+        ),
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:05
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0009_particionar_asistencia'),
+        ('users', '0003_alter_horario_options_alter_rol_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('asistencia', 'Asistencia'), ('incidencias', 'Incidencias')], max_length=20)),
+                ('parametros', models.JSONField(default=dict, help_text='Filtros: fecha_inicio, fecha_fin y usuario')),
+                ('huella', models.CharField(help_text='Hash de los filtros y de las marcas de cambio del período', max_length=32)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, help_text='PDF generado, dentro de MEDIA_ROOT', upload_to='reportes/')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_reporte', to='users.usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['estado', 'created_at'], name='trabajo_reporte_estado_idx'), models.Index(fields=['huella'], name='trabajo_reporte_huella_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0010_trabajoreporte'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='archivo',
+            field=models.FileField(blank=True, help_text='Archivo generado, dentro de MEDIA_ROOT', upload_to='reportes/'),
+        ),
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='parametros',
+            field=models.JSONField(default=dict, help_text='Filtros: fecha_inicio, fecha_fin y usuario (y salida en por_maestro)'),
+        ),
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='tipo',
+            field=models.CharField(choices=[('asistencia', 'Asistencia'), ('incidencias', 'Incidencias'), ('por_maestro', 'Asistencia por maestro')], max_length=20),
+        ),
+    ]
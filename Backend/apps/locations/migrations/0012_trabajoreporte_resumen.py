@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0011_trabajoreporte_por_maestro'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='tipo',
+            field=models.CharField(choices=[('asistencia', 'Asistencia'), ('incidencias', 'Incidencias'), ('por_maestro', 'Asistencia por maestro'), ('resumen', 'Resumen por maestro')], max_length=20),
+        ),
+    ]
@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from math import radians, sin, cos, sqrt, atan2
 from apps.users.models import Usuario
 
@@ -57,6 +60,16 @@ class Perimetro(models.Model):
         return distancia <= self.radio_metros, round(distancia, 2)
 
 
+class AsistenciaQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no llama a save(): fecha_local se llena aquí
+        objs = list(objs)
+        for asistencia in objs:
+            asistencia.fecha_local = timezone.localdate(asistencia.fecha_hora)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Asistencia(models.Model):
     """Registro de entrada o salida de un maestro."""
 
@@ -76,14 +89,39 @@ class Asistencia(models.Model):
     ssid_conectado = models.CharField(max_length=100, blank=True, default='', help_text='SSID del dispositivo al registrar')
     bssid_conectado = models.CharField(max_length=17, blank=True, default='', help_text='BSSID del dispositivo al registrar')
     wifi_valido = models.BooleanField(default=False, help_text='Si la red Wi-Fi coincide con una autorizada')
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    fecha_hora = models.DateTimeField(default=timezone.now, help_text='Hora del marcado (del dispositivo en registros offline)')
+    fecha_local = models.DateField(
+        editable=False,
+        help_text='Fecha de fecha_hora en la zona horaria local; se filtra por día sin convertir cada fila',
+    )
     valido = models.BooleanField(default=False)
     distancia_metros = models.FloatField(default=0, help_text='Distancia al centro del perímetro en metros')
+    id_provisional = models.CharField(
+        max_length=32, null=True, blank=True, unique=True, editable=False,
+        help_text='Id devuelto al registrar con escritura diferida (buffer local)',
+    )
+
+    objects = AsistenciaQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Asistencia'
         verbose_name_plural = 'Asistencias'
         ordering = ['-fecha_hora']
+        indexes = [
+            # Estado del día de un maestro (registro, estado-hoy, historial)
+            models.Index(fields=['usuario', 'fecha_local', 'tipo', 'valido'], name='asistencia_usuario_dia_idx'),
+            # Panel, resumen diario y reportes por fecha
+            models.Index(fields=['fecha_local', 'usuario'], name='asistencia_dia_usuario_idx'),
+            # Listado paginado por llave (fecha_hora, id)
+            models.Index(fields=['-fecha_hora', '-id'], name='asistencia_fecha_hora_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.fecha_local = timezone.localdate(self.fecha_hora)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fecha_hora' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'fecha_local'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         estado = "VÁLIDO" if self.valido else "INVÁLIDO"
@@ -112,3 +150,94 @@ class Incidencia(models.Model):
 
     def __str__(self):
         return f"{self.usuario.nombre} - {self.get_tipo_display()} - {self.fecha}"
+
+
+class ResumenDiario(models.Model):
+    """
+    Resumen de asistencia de un maestro en un día (ver resumen.py).
+    Se actualiza al registrar; el panel y los reportes leen de aquí.
+    """
+
+    class Estado(models.TextChoices):
+        SIN_REGISTRO = 'sin_registro', 'Sin registro'
+        FUERA_DE_PERIMETRO = 'fuera_de_perimetro', 'Fuera de perímetro'
+        EN_TURNO = 'en_turno', 'En turno'
+        TURNO_COMPLETADO = 'turno_completado', 'Turno completado'
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    fecha = models.DateField()
+    # Sin constraint en la base de datos: en PostgreSQL la tabla de asistencias
+    # está particionada (ver particiones.py) y su id no es único por sí solo
+    entrada = models.ForeignKey(
+        Asistencia, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False,
+        help_text='Primera entrada válida del día (o la entrada inválida si no hay válida)',
+    )
+    salida = models.ForeignKey(
+        Asistencia, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False,
+        help_text='Última salida del día',
+    )
+    minutos_retardo = models.PositiveIntegerField(default=0)
+    minutos_salida_temprana = models.PositiveIntegerField(default=0)
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.SIN_REGISTRO)
+    tiene_falta = models.BooleanField(default=False)
+    tiene_retardo = models.BooleanField(default=False)
+    tiene_justificacion = models.BooleanField(default=False)
+    tiene_salida_temprana = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Resumen Diario'
+        verbose_name_plural = 'Resúmenes Diarios'
+        ordering = ['-fecha']
+        unique_together = ['usuario', 'fecha']
+
+    def __str__(self):
+        return f"{self.usuario.nombre} - {self.fecha} - {self.get_estado_display()}"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte generado en segundo plano (ver common/trabajos.py): un PDF, o
+    para `por_maestro` un ZIP o PDF con un reporte por maestro.
+    Varios trabajos pueden apuntar al mismo archivo: se guarda por huella y
+    una solicitud igual sobre datos sin cambios lo reutiliza.
+    """
+
+    class Tipo(models.TextChoices):
+        ASISTENCIA = 'asistencia', 'Asistencia'
+        INCIDENCIAS = 'incidencias', 'Incidencias'
+        POR_MAESTRO = 'por_maestro', 'Asistencia por maestro'
+        RESUMEN = 'resumen', 'Resumen por maestro'
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        EN_PROCESO = 'en_proceso', 'En proceso'
+        LISTO = 'listo', 'Listo'
+        ERROR = 'error', 'Error'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tipo = models.CharField(max_length=20, choices=Tipo.choices)
+    parametros = models.JSONField(default=dict, help_text='Filtros: fecha_inicio, fecha_fin y usuario (y salida en por_maestro)')
+    huella = models.CharField(max_length=32, help_text='Hash de los filtros y de las marcas de cambio del período')
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+    archivo = models.FileField(upload_to='reportes/', blank=True, help_text='Archivo generado, dentro de MEDIA_ROOT')
+    error = models.TextField(blank=True, default='')
+    solicitado_por = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos_reporte',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        ordering = ['-created_at']
+        indexes = [
+            # Cola: pendientes por orden de llegada y en proceso vencidos
+            models.Index(fields=['estado', 'created_at'], name='trabajo_reporte_estado_idx'),
+            # Solicitudes iguales en curso
+            models.Index(fields=['huella'], name='trabajo_reporte_huella_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.parametros} - {self.get_estado_display()}"
@@ -0,0 +1,179 @@
+"""
+Consulta del panel de supervisión: filtros, paginación por llave y filas.
+
+Los maestros activos se leen unidos (LEFT JOIN) a su resumen del día, así
+que el estado, la entrada y el perímetro de la entrada se filtran en la
+base de datos. El orden es (nombre, id) y las páginas se piden con un
+cursor opaco con la última llave vista, sin OFFSET.
+
+Cada página cuesta tres consultas: maestros + resumen, asistencias de
+entrada/salida de la página e incidencias de la página.
+"""
+import base64
+import json
+from collections import defaultdict
+
+from django.db.models import F, FilteredRelation, Q, Value
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.users.models import Rol, Usuario
+
+from .models import Asistencia, Incidencia, ResumenDiario
+from .serializers import AsistenciaSerializer, IncidenciaSerializer
+
+LIMITE_MAX = 500
+# Maestros por consulta en la respuesta en streaming
+TAMANO_BLOQUE = 500
+ESTADOS = set(ResumenDiario.Estado.values)
+
+
+# ──────────────────────────────────────────────
+# FILTROS Y CURSOR
+# ──────────────────────────────────────────────
+
+def leer_filtros(params):
+    """Valida ?estado=a,b&nombre=prefijo&perimetro=id; lanza ValidationError."""
+    filtros = {}
+    if params.get('estado'):
+        estados = set(params['estado'].split(','))
+        if estados - ESTADOS:
+            raise ValidationError({'estado': f'Valores permitidos: {", ".join(sorted(ESTADOS))}.'})
+        filtros['estados'] = estados
+    if params.get('nombre', '').strip():
+        filtros['nombre'] = params['nombre'].strip()
+    if params.get('perimetro'):
+        try:
+            filtros['perimetro'] = int(params['perimetro'])
+        except ValueError:
+            raise ValidationError({'perimetro': 'Debe ser el id de un perímetro.'})
+    return filtros
+
+
+def leer_limite(params):
+    """?limite=N (1..LIMITE_MAX) o None para todos."""
+    if not params.get('limite'):
+        return None
+    try:
+        limite = int(params['limite'])
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= LIMITE_MAX:
+        raise ValidationError({'limite': f'Debe estar entre 1 y {LIMITE_MAX}.'})
+    return limite
+
+
+def codificar_cursor(fila):
+    llave = json.dumps([fila['nombre'], fila['id']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(llave.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Cursor → (nombre, id) del último maestro de la página anterior."""
+    try:
+        nombre, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(nombre, str) and isinstance(id_, int):
+            return nombre, id_
+    except (ValueError, TypeError):
+        pass
+    raise ValidationError({'cursor': 'Cursor inválido.'})
+
+
+def maestros(fecha, estados=None, nombre=None, perimetro=None):
+    """
+    Maestros activos con su resumen del día (valores, sin instancias),
+    ordenados por (nombre, id).
+    """
+    qs = Usuario.objects.filter(
+        rol__nombre=Rol.Nombre.MAESTRO,
+        activo=True,
+    ).annotate(
+        resumen=FilteredRelation('resumenes_diarios', condition=Q(resumenes_diarios__fecha=fecha)),
+        estado=Coalesce(F('resumen__estado'), Value(ResumenDiario.Estado.SIN_REGISTRO)),
+        entrada_id=F('resumen__entrada_id'),
+        salida_id=F('resumen__salida_id'),
+    )
+    if estados:
+        qs = qs.filter(estado__in=estados)
+    if nombre:
+        qs = qs.filter(nombre__istartswith=nombre)
+    if perimetro:
+        # Por alias, para reutilizar el JOIN del resumen del día
+        qs = qs.alias(perimetro_entrada=F('resumen__entrada__perimetro_id')).filter(perimetro_entrada=perimetro)
+    return qs.order_by('nombre', 'id').values('id', 'nombre', 'correo', 'estado', 'entrada_id', 'salida_id')
+
+
+def despues_de(qs, nombre, id_):
+    """Maestros que van después de la llave (nombre, id) en el orden del panel."""
+    return qs.filter(Q(nombre__gt=nombre) | Q(nombre=nombre, id__gt=id_))
+
+
+# ──────────────────────────────────────────────
+# FILAS
+# ──────────────────────────────────────────────
+
+def filas(fecha, pagina):
+    """
+    Filas del panel para una página de maestros (resultado de maestros()).
+    Dos consultas: entradas/salidas de la página e incidencias de la página.
+    """
+    if not pagina:
+        return []
+    nombres = {m['id']: m['nombre'] for m in pagina}
+    ids_marcados = [m[campo] for m in pagina for campo in ('entrada_id', 'salida_id') if m[campo]]
+
+    marcados = list(
+        Asistencia.objects.filter(id__in=ids_marcados).select_related('perimetro', 'red_autorizada')
+    ) if ids_marcados else []
+    incidencias_dia = list(Incidencia.objects.filter(fecha=fecha, usuario_id__in=nombres))
+    # El serializer solo necesita el nombre del usuario: no se vuelve a consultar
+    for registro in (*marcados, *incidencias_dia):
+        registro.usuario = Usuario(id=registro.usuario_id, nombre=nombres[registro.usuario_id])
+
+    # Un serializer por lista: los campos se construyen una vez, no por maestro
+    marcados_data = dict(zip(
+        (a.id for a in marcados), AsistenciaSerializer(marcados, many=True).data,
+    ))
+    incidencias = defaultdict(list)
+    for datos in IncidenciaSerializer(incidencias_dia, many=True).data:
+        incidencias[datos['usuario']].append(datos)
+
+    return [
+        {
+            'maestro': {
+                'id': m['id'],
+                'nombre': m['nombre'],
+                'correo': m['correo'],
+            },
+            'entrada': marcados_data.get(m['entrada_id']),
+            'salida': marcados_data.get(m['salida_id']),
+            'incidencias': incidencias[m['id']],
+            'estado': m['estado'],
+        }
+        for m in pagina
+    ]
+
+
+def bloques(fecha, qs, tamano=TAMANO_BLOQUE):
+    """Recorre `qs` por llave en bloques de `tamano` maestros; genera listas de filas."""
+    pagina = list(qs[:tamano])
+    while pagina:
+        yield filas(fecha, pagina)
+        if len(pagina) < tamano:
+            return
+        pagina = list(despues_de(qs, pagina[-1]['nombre'], pagina[-1]['id'])[:tamano])
+
+
+def json_en_streaming(fecha, qs):
+    """
+    El JSON del panel completo por partes: un bloque de maestros a la vez,
+    sin tener todas las filas en memoria. total_maestros va al final.
+    """
+    yield f'{{"fecha":{json.dumps(fecha)},"maestros":['
+    total = 0
+    for bloque in bloques(fecha, qs):
+        separador = ',' if total else ''
+        total += len(bloque)
+        yield separador + ','.join(json.dumps(fila, cls=JSONEncoder, ensure_ascii=False) for fila in bloque)
+    yield f'],"total_maestros":{total}}}'
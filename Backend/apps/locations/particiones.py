@@ -0,0 +1,135 @@
+"""
+Particiones mensuales de Asistencia en PostgreSQL.
+
+La migración 0009 convierte locations_asistencia en una tabla particionada
+por rango de fecha_hora, con una partición por mes local
+(locations_asistencia_p2026_03 = marzo de 2026 en TIME_ZONE) y una
+partición DEFAULT para lo que llegue fuera de las creadas. Vacuum, índices
+y respaldos trabajan por mes, y un mes viejo se archiva desprendiendo su
+partición (ver archivo.py) en lugar de borrar fila por fila.
+
+`manage.py crear_particiones_asistencia` crea por adelantado las de los
+próximos meses; si DEFAULT ya recibió filas de un mes, las pasa a la
+partición nueva en la misma transacción. En otros motores (SQLite en pruebas y desarrollo) la tabla
+no está particionada y todo aquí es un no-op.
+"""
+import re
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Asistencia
+
+TABLA = Asistencia._meta.db_table
+DEFAULT = f'{TABLA}_default'
+# Filas de la partición DEFAULT dentro del rango de un mes
+RANGO = 'fecha_hora >= %s::timestamptz AND fecha_hora < %s::timestamptz'
+PATRON_NOMBRE = re.compile(rf'^{TABLA}_p(\d{{4}})_(\d{{2}})$')
+
+
+def mes(fecha):
+    """Primer día del mes de `fecha`."""
+    return date(fecha.year, fecha.month, 1)
+
+
+def siguiente_mes(primero):
+    return date(primero.year + primero.month // 12, primero.month % 12 + 1, 1)
+
+
+def nombre(primero):
+    return f'{TABLA}_p{primero:%Y_%m}'
+
+
+def limites(primero):
+    """[inicio, fin) del mes en hora local, como texto timestamptz con la zona de TIME_ZONE."""
+    return tuple(
+        f'{datetime.combine(d, datetime.min.time()):%Y-%m-%d %H:%M:%S} {settings.TIME_ZONE}'
+        for d in (primero, siguiente_mes(primero))
+    )
+
+
+def disponible():
+    """True si la tabla de asistencias está particionada (solo PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLA])
+        return cursor.fetchone() is not None
+
+
+def existentes():
+    """Meses (primer día) que ya tienen partición propia, en orden."""
+    if not disponible():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLA],
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+    return sorted(
+        date(int(m[1]), int(m[2]), 1)
+        for m in map(PATRON_NOMBRE.match, nombres) if m
+    )
+
+
+def _crear(cursor, primero):
+    """
+    Crea la partición del mes. PostgreSQL la rechaza si DEFAULT tiene filas
+    de su rango: se copian a una tabla temporal, se borran de DEFAULT, se
+    crea la partición y se vuelven a insertar (ya caen en ella). Retorna
+    cuántas filas pasaron de DEFAULT. Debe correr en una transacción.
+    """
+    tabla, default = connection.ops.quote_name(TABLA), connection.ops.quote_name(DEFAULT)
+    movidas = connection.ops.quote_name(f'{nombre(primero)}_movidas')
+    rango = list(limites(primero))
+    cursor.execute(f'SELECT count(*) FROM {default} WHERE {RANGO}', rango)
+    total = cursor.fetchone()[0]
+    if total:
+        cursor.execute(f'CREATE TEMPORARY TABLE {movidas} AS SELECT * FROM {default} WHERE {RANGO}', rango)
+        cursor.execute(f'DELETE FROM {default} WHERE {RANGO}', rango)
+    cursor.execute(
+        f'CREATE TABLE {connection.ops.quote_name(nombre(primero))} '
+        f'PARTITION OF {tabla} FOR VALUES FROM (%s) TO (%s)',
+        rango,
+    )
+    if total:
+        cursor.execute(f'INSERT INTO {tabla} SELECT * FROM {movidas}')
+        cursor.execute(f'DROP TABLE {movidas}')
+    return total
+
+
+def crear(desde, meses):
+    """
+    Crea las particiones que falten para `meses` meses a partir del de
+    `desde`, cada una en su transacción. Retorna pares (nombre, filas que
+    pasaron de DEFAULT) de las creadas ([] si la tabla no está particionada).
+    """
+    if not disponible():
+        return []
+    ya = set(existentes())
+    creadas = []
+    primero = mes(desde)
+    with connection.cursor() as cursor:
+        for _ in range(meses):
+            if primero not in ya:
+                with transaction.atomic():
+                    creadas.append((nombre(primero), _crear(cursor, primero)))
+            primero = siguiente_mes(primero)
+    return creadas
+
+
+def desprender(primero):
+    """
+    Quita de la tabla la partición del mes y la borra. Retorna False si el
+    mes no tiene partición propia (o la tabla no está particionada).
+    """
+    if primero not in existentes():
+        return False
+    particion = connection.ops.quote_name(nombre(primero))
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {connection.ops.quote_name(TABLA)} DETACH PARTITION {particion}')
+        cursor.execute(f'DROP TABLE {particion}')
+    return True
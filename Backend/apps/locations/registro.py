@@ -0,0 +1,444 @@
+"""
+Registro de asistencia (entrada/salida) con presupuesto acotado de consultas.
+
+El estado del día del usuario (entrada/salida válidas e incidencias
+automáticas ya creadas) se obtiene en una sola consulta; el horario
+compilado, el perímetro y la red salen de cache o de los índices en
+memoria, y la inserción de la asistencia, la incidencia y la
+actualización del resumen diario van juntas en una transacción.
+
+registrar_lote() aplica las mismas reglas a los registros capturados sin
+conexión en el dispositivo, con un número constante de consultas por lote.
+"""
+from collections import namedtuple, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from apps.users.models import Usuario
+from common import marcas
+
+from . import difusion, escritura_diferida, estado_hoy, resumen
+from .horarios import (
+    formato, evaluar_horario, minutos_tarde, minutos_antes,
+    horario_del_dia, ahorario_del_dia, horario_semanal,
+)
+from .indices import indice_redes, indice_perimetros, normalizar_bssid
+from .models import Asistencia, Incidencia
+
+# Horas después de la entrada para auto-registrar salida
+AUTO_SALIDA_HORAS = 10
+# Máximo de registros por lote y antigüedad máxima de un registro offline
+LOTE_MAX_REGISTROS = 50
+LOTE_ANTIGUEDAD_MAX_HORAS = 72
+# Margen para relojes de dispositivo adelantados
+LOTE_TOLERANCIA_FUTURO_MIN = 5
+
+EstadoDia = namedtuple('EstadoDia', [
+    'entrada_id', 'salida_id', 'horario',
+    'tiene_retardo', 'tiene_salida_temprana',
+])
+
+
+def consulta_estado_dia(usuario_id, fecha):
+    """Queryset de una fila con todo el estado del día del usuario."""
+    validas_hoy = Asistencia.objects.filter(
+        usuario=OuterRef('pk'),
+        fecha_local=fecha,
+        valido=True,
+    ).order_by('fecha_hora')
+    incidencias_hoy = Incidencia.objects.filter(usuario=OuterRef('pk'), fecha=fecha)
+
+    return Usuario.objects.filter(pk=usuario_id).annotate(
+        entrada_id=Subquery(validas_hoy.filter(tipo=Asistencia.Tipo.ENTRADA).values('id')[:1]),
+        salida_id=Subquery(validas_hoy.filter(tipo=Asistencia.Tipo.SALIDA).values('id')[:1]),
+        tiene_retardo=Exists(incidencias_hoy.filter(tipo=Incidencia.Tipo.RETARDO)),
+        tiene_salida_temprana=Exists(incidencias_hoy.filter(tipo=Incidencia.Tipo.SALIDA_TEMPRANA)),
+    ).values('entrada_id', 'salida_id', 'tiene_retardo', 'tiene_salida_temprana')
+
+
+def _estado_desde_fila(fila, horario):
+    return EstadoDia(
+        entrada_id=fila['entrada_id'],
+        salida_id=fila['salida_id'],
+        horario=horario,
+        tiene_retardo=fila['tiene_retardo'],
+        tiene_salida_temprana=fila['tiene_salida_temprana'],
+    )
+
+
+def _con_pendientes(usuario_id, fecha, estado):
+    """
+    Con escritura diferida, un registro válido puede estar aún en el buffer
+    local: cuenta como entrada/salida del día para las reglas.
+    """
+    if not settings.ASISTENCIA_ESCRITURA_DIFERIDA:
+        return estado
+    pendientes = escritura_diferida.tipos_pendientes(usuario_id, fecha)
+    if Asistencia.Tipo.ENTRADA in pendientes and not estado.entrada_id:
+        estado = estado._replace(entrada_id='pendiente')
+    if Asistencia.Tipo.SALIDA in pendientes and not estado.salida_id:
+        estado = estado._replace(salida_id='pendiente')
+    return estado
+
+
+def obtener_estado_dia(usuario, fecha):
+    """Estado del día del usuario en una sola consulta (el horario sale de la cache)."""
+    horario = horario_del_dia(usuario.id, fecha)
+    estado = _estado_desde_fila(consulta_estado_dia(usuario.id, fecha).get(), horario)
+    return _con_pendientes(usuario.id, fecha, estado)
+
+
+async def aobtener_estado_dia(usuario, fecha):
+    """Versión async de obtener_estado_dia (vistas ASGI)."""
+    horario = await ahorario_del_dia(usuario.id, fecha)
+    estado = _estado_desde_fila(await consulta_estado_dia(usuario.id, fecha).aget(), horario)
+    return _con_pendientes(usuario.id, fecha, estado)
+
+
+# ──────────────────────────────────────────────
+# REGLAS
+# ──────────────────────────────────────────────
+
+def error_reglas_dia(tipo, tiene_entrada, tiene_salida):
+    """Máximo una entrada y una salida por día; salida solo después de entrada."""
+    ya_existe = tiene_entrada if tipo == Asistencia.Tipo.ENTRADA else tiene_salida
+    if ya_existe:
+        tipo_display = 'entrada' if tipo == Asistencia.Tipo.ENTRADA else 'salida'
+        return (
+            f'Ya registraste tu {tipo_display} el día de hoy. '
+            f'Solo se permite una {tipo_display} por día.'
+        )
+    if tipo == Asistencia.Tipo.SALIDA and not tiene_entrada:
+        return 'Debes registrar tu entrada antes de marcar la salida.'
+    return None
+
+
+def error_wifi(ssid, bssid, red_autorizada):
+    """Rechaza el registro si no hay una red Wi-Fi autorizada."""
+    if red_autorizada is not None:
+        return None
+    if not ssid and not bssid:
+        return (
+            'No se detectó conexión Wi-Fi. '
+            'Debes estar conectado a la red institucional para registrar asistencia.'
+        )
+    return (
+        f'La red Wi-Fi "{ssid}" no está autorizada. '
+        'Debes estar conectado a una red institucional autorizada.'
+    )
+
+
+# ──────────────────────────────────────────────
+# HORARIO
+# ──────────────────────────────────────────────
+
+def _descripcion_incidencia(tipo, horario, hora_actual):
+    if tipo == Incidencia.Tipo.RETARDO:
+        return (
+            f'Retardo automático. Hora de entrada programada: '
+            f'{formato(horario.entrada)}, '
+            f'hora registrada: {hora_actual.strftime("%H:%M")} '
+            f'({minutos_tarde(horario, hora_actual)} min tarde).'
+        )
+    return (
+        f'Salida temprana automática. Hora de salida programada: '
+        f'{formato(horario.salida)}, '
+        f'hora registrada: {hora_actual.strftime("%H:%M")} '
+        f'({minutos_antes(horario, hora_actual)} min antes).'
+    )
+
+
+# ──────────────────────────────────────────────
+# REGISTRO
+# ──────────────────────────────────────────────
+
+def registrar_asistencia(usuario, datos):
+    """
+    Inserta la asistencia y, si aplica, la incidencia de horario en una
+    sola transacción. `datos` es el validated_data de
+    RegistrarAsistenciaSerializer (incluye perímetro, red y estado del día).
+    Con ASISTENCIA_ESCRITURA_DIFERIDA la asistencia va al buffer local y se
+    retorna sin id, con su id_provisional (ver escritura_diferida.py).
+    Retorna (asistencia, incidencia, hora_actual).
+    """
+    estado = datos['estado_dia']
+    ahora = timezone.localtime()
+    hora_actual = ahora.time()
+    asistencia = Asistencia(
+        usuario=usuario,
+        perimetro=datos['perimetro'],
+        red_autorizada=datos.get('red_autorizada'),
+        tipo=datos['tipo'],
+        latitud_real=datos['latitud'],
+        longitud_real=datos['longitud'],
+        ssid_conectado=datos.get('ssid', ''),
+        bssid_conectado=datos.get('bssid', ''),
+        wifi_valido=datos.get('wifi_valido', False),
+        fecha_hora=ahora,
+        valido=datos['dentro'],
+        distancia_metros=datos['distancia'],
+    )
+    tipo_incidencia = None
+    if asistencia.valido and estado.horario:
+        tipo_incidencia = evaluar_horario(asistencia.tipo, estado.horario, hora_actual)
+
+    if settings.ASISTENCIA_ESCRITURA_DIFERIDA:
+        incidencia = nueva = None
+        if tipo_incidencia:
+            incidencia = nueva = _incidencia_del_dia(usuario, tipo_incidencia, estado, hora_actual, ahora.date())
+            if incidencia.pk:
+                nueva = None
+        escritura_diferida.encolar(asistencia, nueva)
+        return asistencia, incidencia, hora_actual
+
+    with transaction.atomic():
+        # El resumen del día se actualiza aquí con un upsert, no en las señales
+        asistencia._resumen_al_dia = True
+        asistencia.save(force_insert=True)
+        incidencia = None
+        if tipo_incidencia:
+            incidencia = _incidencia_del_dia(usuario, tipo_incidencia, estado, hora_actual, ahora.date())
+            if not incidencia.pk:
+                incidencia._resumen_al_dia = True
+                incidencia.save(force_insert=True)
+        resumen.anotar_marcado(asistencia, estado, tipo_incidencia)
+
+    return asistencia, incidencia, hora_actual
+
+
+def _incidencia_del_dia(usuario, tipo, estado, hora_actual, fecha):
+    """
+    Incidencia automática del día, sin guardar si es nueva. El estado del
+    día ya dice si existe, así que solo se consulta en ese caso (poco frecuente).
+    """
+    ya_existe = estado.tiene_retardo if tipo == Incidencia.Tipo.RETARDO else estado.tiene_salida_temprana
+    if ya_existe:
+        existente = Incidencia.objects.filter(usuario=usuario, tipo=tipo, fecha=fecha).first()
+        if existente:
+            return existente
+    return Incidencia(
+        usuario=usuario,
+        tipo=tipo,
+        fecha=fecha,
+        descripcion=_descripcion_incidencia(tipo, estado.horario, hora_actual),
+    )
+
+
+def registrar_auto_salida(usuario, entrada_id, fecha, horas_transcurridas):
+    """
+    Salida automática cuando la entrada lleva más de AUTO_SALIDA_HORAS sin
+    salida, con su incidencia de salida temprana. Retorna la salida creada.
+    """
+    entrada = Asistencia.objects.select_related('perimetro').get(pk=entrada_id)
+    salida = Asistencia.objects.create(
+        usuario=usuario,
+        perimetro=entrada.perimetro,
+        tipo=Asistencia.Tipo.SALIDA,
+        latitud_real=entrada.latitud_real,
+        longitud_real=entrada.longitud_real,
+        valido=True,
+        distancia_metros=entrada.distancia_metros,
+    )
+    # Crear incidencia de salida automática
+    Incidencia.objects.get_or_create(
+        usuario=usuario,
+        tipo=Incidencia.Tipo.SALIDA_TEMPRANA,
+        fecha=fecha,
+        defaults={
+            'descripcion': (
+                f'Salida automática registrada por el sistema. '
+                f'Pasaron {int(horas_transcurridas)} horas desde la entrada '
+                f'sin registrar salida manualmente.'
+            ),
+        },
+    )
+    return salida
+
+
+def describir_registro(asistencia, horario, tipo_incidencia, hora_actual):
+    """
+    Mensaje y estado_horario para la respuesta del registro.
+    Retorna un dict que se agrega a los datos serializados de la asistencia.
+    """
+    if not asistencia.valido:
+        return {
+            'mensaje': (
+                f'Estás fuera del perímetro. '
+                f'Distancia: {asistencia.distancia_metros}m '
+                f'(máximo permitido: {asistencia.perimetro.radio_metros}m). '
+                f'Se registró como INVÁLIDA.'
+            ),
+            'estado_horario': 'fuera_de_perimetro',
+        }
+
+    if not horario:
+        return {
+            'mensaje': 'Asistencia registrada. No tienes horario asignado para hoy.',
+            'estado_horario': 'sin_horario',
+        }
+
+    if tipo_incidencia == Incidencia.Tipo.RETARDO:
+        return {
+            'mensaje': (
+                f'⚠️ Retardo registrado. Llegaste {minutos_tarde(horario, hora_actual)} minutos tarde. '
+                f'Tu hora de entrada es {formato(horario.entrada)} '
+                f'y marcaste a las {hora_actual.strftime("%H:%M")}.'
+            ),
+            'estado_horario': 'retardo',
+        }
+    if tipo_incidencia == Incidencia.Tipo.SALIDA_TEMPRANA:
+        return {
+            'mensaje': (
+                f'⚠️ Salida temprana registrada. Saliste {minutos_antes(horario, hora_actual)} minutos antes. '
+                f'Tu hora de salida es {formato(horario.salida)} '
+                f'y marcaste a las {hora_actual.strftime("%H:%M")}.'
+            ),
+            'estado_horario': 'salida_temprana',
+        }
+
+    if asistencia.tipo == Asistencia.Tipo.ENTRADA:
+        mensaje = (
+            f'✅ Entrada registrada a tiempo. '
+            f'Hora de entrada: {formato(horario.entrada)}, '
+            f'marcaste a las {hora_actual.strftime("%H:%M")}.'
+        )
+    else:
+        mensaje = (
+            f'✅ Salida registrada correctamente. '
+            f'Hora de salida: {formato(horario.salida)}, '
+            f'marcaste a las {hora_actual.strftime("%H:%M")}.'
+        )
+    return {'mensaje': mensaje, 'estado_horario': 'a_tiempo'}
+
+
+# ──────────────────────────────────────────────
+# REGISTRO POR LOTES (COLA OFFLINE)
+# ──────────────────────────────────────────────
+
+def registrar_lote(usuario, registros):
+    """
+    Registra un lote de marcados capturados sin conexión.
+
+    `registros` es una lista de dicts ya validados por campo (tipo, latitud,
+    longitud, ssid, bssid, fecha_hora). Se aplican las mismas reglas que al
+    registro individual, en orden cronológico, sobre un estado en memoria
+    cargado con dos consultas (el horario sale de la cache); luego todo se
+    inserta con bulk_create.
+    Retorna una lista de resultados en el mismo orden de `registros`.
+    """
+    ahora = timezone.now()
+    minimo = ahora - timedelta(hours=LOTE_ANTIGUEDAD_MAX_HORAS)
+    maximo = ahora + timedelta(minutes=LOTE_TOLERANCIA_FUTURO_MIN)
+    fechas = {timezone.localdate(r['fecha_hora']) for r in registros}
+
+    # ── Estado en memoria: 2 consultas para todo el lote ──
+    marcados = defaultdict(set)  # fecha → {tipos válidos ya registrados}
+    existentes = Asistencia.objects.filter(
+        usuario=usuario, valido=True, fecha_local__in=fechas,
+    ).values_list('tipo', 'fecha_local')
+    for tipo, fecha in existentes:
+        marcados[fecha].add(tipo)
+
+    horarios = horario_semanal(usuario.id)
+    incidencias_existentes = set(
+        Incidencia.objects.filter(
+            usuario=usuario,
+            fecha__in=fechas,
+            tipo__in=[Incidencia.Tipo.RETARDO, Incidencia.Tipo.SALIDA_TEMPRANA],
+        ).values_list('fecha', 'tipo')
+    )
+
+    resultados = [None] * len(registros)
+    nuevas_asistencias = []
+    nuevas_incidencias = []
+    pendientes = []  # (índice, asistencia, tipo_incidencia, horario, hora_actual)
+
+    orden = sorted(range(len(registros)), key=lambda i: registros[i]['fecha_hora'])
+    for i in orden:
+        datos = registros[i]
+        fecha_hora = datos['fecha_hora']
+        local = timezone.localtime(fecha_hora)
+        fecha = local.date()
+        tipo = datos['tipo']
+        ssid = datos.get('ssid', '').strip()
+        bssid = normalizar_bssid(datos.get('bssid', ''))
+
+        error = None
+        ubicacion = None
+        red = None
+        if fecha_hora < minimo:
+            error = f'El registro tiene más de {LOTE_ANTIGUEDAD_MAX_HORAS} horas y ya no puede enviarse.'
+        elif fecha_hora > maximo:
+            error = 'La hora del registro está en el futuro. Revisa el reloj del dispositivo.'
+        else:
+            ubicacion = indice_perimetros.localizar(datos['latitud'], datos['longitud'])
+            if not ubicacion:
+                error = 'No hay un perímetro activo configurado.'
+        if not error:
+            error = error_reglas_dia(
+                tipo,
+                Asistencia.Tipo.ENTRADA in marcados[fecha],
+                Asistencia.Tipo.SALIDA in marcados[fecha],
+            )
+        if not error:
+            red = indice_redes.buscar(ssid, bssid)
+            error = error_wifi(ssid, bssid, red)
+        if error:
+            resultados[i] = {'indice': i, 'registrado': False, 'errores': [error]}
+            continue
+
+        perimetro, dentro, distancia = ubicacion
+        asistencia = Asistencia(
+            usuario=usuario,
+            perimetro=perimetro,
+            red_autorizada=red,
+            tipo=tipo,
+            latitud_real=datos['latitud'],
+            longitud_real=datos['longitud'],
+            ssid_conectado=ssid,
+            bssid_conectado=bssid,
+            wifi_valido=True,
+            fecha_hora=fecha_hora,
+            valido=dentro,
+            distancia_metros=distancia,
+        )
+        nuevas_asistencias.append(asistencia)
+
+        horario = horarios[fecha.weekday()]
+        tipo_incidencia = None
+        if dentro:
+            marcados[fecha].add(tipo)
+            if horario:
+                tipo_incidencia = evaluar_horario(tipo, horario, local.time())
+                if tipo_incidencia and (fecha, tipo_incidencia) not in incidencias_existentes:
+                    incidencias_existentes.add((fecha, tipo_incidencia))
+                    nuevas_incidencias.append(Incidencia(
+                        usuario=usuario,
+                        tipo=tipo_incidencia,
+                        fecha=fecha,
+                        descripcion=_descripcion_incidencia(tipo_incidencia, horario, local.time()),
+                    ))
+        pendientes.append((i, asistencia, tipo_incidencia, horario, local.time()))
+
+    with transaction.atomic():
+        if nuevas_asistencias:
+            Asistencia.objects.bulk_create(nuevas_asistencias)
+        if nuevas_incidencias:
+            Incidencia.objects.bulk_create(nuevas_incidencias)
+        # bulk_create no envía señales: el resumen y el estado del día en cache se actualizan aquí
+        resumen.recalcular((usuario.id, a.fecha_local) for a in nuevas_asistencias)
+        pares = [(usuario.id, a.fecha_local) for a in nuevas_asistencias if a.valido]
+        transaction.on_commit(lambda: estado_hoy.invalidar_varios(pares))
+        transaction.on_commit(lambda: difusion.publicar_lote(nuevas_asistencias, nuevas_incidencias))
+        marcas.avanzar(*marcas.dias((usuario.id, a.fecha_local) for a in nuevas_asistencias))
+
+    for i, asistencia, tipo_incidencia, horario, hora_actual in pendientes:
+        resultado = {'indice': i, 'registrado': True, 'id': asistencia.id}
+        resultado.update(describir_registro(asistencia, horario, tipo_incidencia, hora_actual))
+        resultados[i] = resultado
+
+    return resultados
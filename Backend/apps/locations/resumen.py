@@ -0,0 +1,375 @@
+"""
+Resumen diario por maestro (ResumenDiario): primera entrada válida, última
+salida, minutos de retardo y de salida temprana, estado e incidencias.
+
+El registro individual lo actualiza dentro de su transacción con un solo
+upsert (anotar_marcado). El registro por lotes, el vaciado del buffer, la
+revalidación de perímetros y las ediciones (señales) lo recalculan desde
+las filas del día (recalcular). `manage.py reconstruir_resumen_diario`
+lo reconstruye para un rango de fechas; al desplegar sobre una base con
+historial anterior a la tabla es un paso obligatorio después de migrate
+(el chequeo locations.W002 lo recuerda). Mientras tanto la tabla vacía
+solo deja sin filas el panel, los totales y los reportes. totales() agrega un rango en SQL
+para el historial, totales_reporte() para el pie del reporte PDF y
+totales_por_maestro() para el resumen del período (una fila por maestro).
+
+Los minutos de retardo y de salida temprana se calculan con el horario
+vigente del maestro; solo cuentan si pasan la tolerancia.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.core import checks
+from django.db import transaction
+from django.db.models import Avg, Count, FilteredRelation, FloatField, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, ExtractHour, ExtractIsoWeekDay, ExtractMinute, Round
+from django.utils import timezone
+
+from apps.users.models import Horario, Rol, Usuario
+
+from .horarios import evaluar_horario, minutos_tarde, minutos_antes, horarios_semanales
+from .models import Asistencia, Incidencia, ResumenDiario
+
+Estado = ResumenDiario.Estado
+
+CAMPOS = [
+    'entrada', 'salida', 'minutos_retardo', 'minutos_salida_temprana', 'estado',
+    'tiene_falta', 'tiene_retardo', 'tiene_justificacion', 'tiene_salida_temprana',
+]
+FLAGS = {
+    Incidencia.Tipo.FALTA: 'tiene_falta',
+    Incidencia.Tipo.RETARDO: 'tiene_retardo',
+    Incidencia.Tipo.JUSTIFICACION: 'tiene_justificacion',
+    Incidencia.Tipo.SALIDA_TEMPRANA: 'tiene_salida_temprana',
+}
+TAMANO_LOTE = 1000
+
+
+def estado_del_dia(entrada, salida):
+    """Estado del maestro en el panel de supervisión según su entrada y salida."""
+    if not entrada:
+        return Estado.SIN_REGISTRO
+    if not entrada.valido:
+        return Estado.FUERA_DE_PERIMETRO
+    if not salida:
+        return Estado.EN_TURNO
+    return Estado.TURNO_COMPLETADO
+
+
+def _minutos(asistencia, horario, tipo_incidencia, calcular_minutos):
+    if not (asistencia and asistencia.valido and horario):
+        return 0
+    hora = timezone.localtime(asistencia.fecha_hora).time()
+    if evaluar_horario(asistencia.tipo, horario, hora) != tipo_incidencia:
+        return 0
+    return calcular_minutos(horario, hora)
+
+
+def minutos_retardo(entrada, horario):
+    return _minutos(entrada, horario, Incidencia.Tipo.RETARDO, minutos_tarde)
+
+
+def minutos_salida_temprana(salida, horario):
+    return _minutos(salida, horario, Incidencia.Tipo.SALIDA_TEMPRANA, minutos_antes)
+
+
+def calcular(resumen, asistencias, tipos_incidencia, horario):
+    """
+    Llena `resumen` desde las asistencias del día (ordenadas por fecha_hora),
+    los tipos de sus incidencias y el horario compilado del día.
+    """
+    entradas = [a for a in asistencias if a.tipo == Asistencia.Tipo.ENTRADA]
+    salidas = [a for a in asistencias if a.tipo == Asistencia.Tipo.SALIDA]
+    entrada = next((a for a in entradas if a.valido), entradas[0] if entradas else None)
+    salida = salidas[-1] if salidas else None
+
+    resumen.entrada = entrada
+    resumen.salida = salida
+    resumen.estado = estado_del_dia(entrada, salida)
+    resumen.minutos_retardo = minutos_retardo(entrada, horario)
+    resumen.minutos_salida_temprana = minutos_salida_temprana(salida, horario)
+    for tipo, campo in FLAGS.items():
+        setattr(resumen, campo, tipo in tipos_incidencia)
+    return resumen
+
+
+def guardar(resumenes, campos=CAMPOS):
+    """Inserta o actualiza (por usuario y fecha) en una sola consulta por lote."""
+    ResumenDiario.objects.bulk_create(
+        resumenes, batch_size=TAMANO_LOTE,
+        update_conflicts=True, unique_fields=['usuario', 'fecha'], update_fields=campos,
+    )
+
+
+# ──────────────────────────────────────────────
+# ACTUALIZACIÓN INCREMENTAL
+# ──────────────────────────────────────────────
+
+def anotar_marcado(asistencia, estado, tipo_incidencia):
+    """
+    Aplica al resumen un marcado recién guardado por registrar_asistencia.
+    Un upsert: si el resumen no existe se crea con lo que EstadoDia ya sabe
+    del día; si existe, solo se actualizan los campos que cambia el marcado.
+    """
+    resumen = ResumenDiario(
+        usuario_id=asistencia.usuario_id,
+        fecha=asistencia.fecha_local,
+        tiene_retardo=estado.tiene_retardo,
+        tiene_salida_temprana=estado.tiene_salida_temprana,
+    )
+    if asistencia.tipo == Asistencia.Tipo.ENTRADA:
+        # Las reglas del día solo aceptan una entrada si aún no hay una válida
+        resumen.entrada = asistencia
+        resumen.estado = estado_del_dia(asistencia, None)
+        resumen.minutos_retardo = minutos_retardo(asistencia, estado.horario)
+        campos = ['entrada', 'estado', 'minutos_retardo']
+    else:
+        # ... y una salida solo después de una entrada válida
+        resumen.entrada_id = estado.entrada_id
+        resumen.salida = asistencia
+        resumen.estado = Estado.TURNO_COMPLETADO
+        resumen.minutos_salida_temprana = minutos_salida_temprana(asistencia, estado.horario)
+        campos = ['salida', 'estado', 'minutos_salida_temprana']
+
+    if tipo_incidencia:
+        setattr(resumen, FLAGS[tipo_incidencia], True)
+        campos.append(FLAGS[tipo_incidencia])
+    guardar([resumen], campos)
+
+
+# ──────────────────────────────────────────────
+# RECÁLCULO Y RECONSTRUCCIÓN
+# ──────────────────────────────────────────────
+
+def _agrupar(asistencias, incidencias, pares=None):
+    """(usuario_id, fecha) → ([asistencias], {tipos de incidencia}); solo `pares` si se indica."""
+    dias = defaultdict(lambda: ([], set()))
+    for asistencia in asistencias:
+        par = (asistencia.usuario_id, asistencia.fecha_local)
+        if pares is None or par in pares:
+            dias[par][0].append(asistencia)
+    for usuario_id, fecha, tipo in incidencias:
+        if pares is None or (usuario_id, fecha) in pares:
+            dias[usuario_id, fecha][1].add(tipo)
+    return dias
+
+
+def _resumenes(dias):
+    semanas = horarios_semanales({usuario_id for usuario_id, _ in dias})
+    return [
+        calcular(
+            ResumenDiario(usuario_id=usuario_id, fecha=fecha),
+            asistencias, tipos, semanas[usuario_id][fecha.weekday()],
+        )
+        for (usuario_id, fecha), (asistencias, tipos) in dias.items()
+    ]
+
+
+def _asistencias():
+    return Asistencia.objects.only('id', 'usuario', 'tipo', 'valido', 'fecha_hora', 'fecha_local').order_by('fecha_hora')
+
+
+def recalcular(pares):
+    """
+    Recalcula desde la base de datos el resumen de los pares (usuario_id, fecha);
+    borra el de los días que quedaron sin asistencias ni incidencias.
+    Número constante de consultas sin importar cuántos pares.
+    """
+    pares = set(pares)
+    if not pares:
+        return
+    usuarios = {usuario_id for usuario_id, _ in pares}
+    fechas = {fecha for _, fecha in pares}
+    dias = _agrupar(
+        _asistencias().filter(usuario_id__in=usuarios, fecha_local__in=fechas),
+        Incidencia.objects.filter(usuario_id__in=usuarios, fecha__in=fechas)
+        .values_list('usuario_id', 'fecha', 'tipo'),
+        pares,
+    )
+    with transaction.atomic(savepoint=False):
+        guardar(_resumenes(dias))
+        vacios = pares - dias.keys()
+        if vacios:
+            ResumenDiario.objects.filter(
+                reduce(or_, (Q(usuario_id=usuario_id, fecha=fecha) for usuario_id, fecha in vacios))
+            ).delete()
+
+
+def reconstruir(desde, hasta):
+    """
+    Borra y vuelve a calcular los resúmenes de [desde, hasta] a partir de
+    todas las asistencias e incidencias del rango. Retorna cuántos creó.
+    """
+    dias = _agrupar(
+        _asistencias().filter(fecha_local__range=(desde, hasta)),
+        Incidencia.objects.filter(fecha__range=(desde, hasta)).values_list('usuario_id', 'fecha', 'tipo'),
+    )
+    resumenes = _resumenes(dias)
+    with transaction.atomic():
+        ResumenDiario.objects.filter(fecha__range=(desde, hasta)).delete()
+        ResumenDiario.objects.bulk_create(resumenes, batch_size=TAMANO_LOTE)
+    return len(resumenes)
+
+
+def reconstruir_por_bloques(desde, hasta, dias=31):
+    """
+    reconstruir() de [desde, hasta] en bloques de `dias` días, cada uno en
+    su transacción. Genera (inicio, fin, creados) por bloque.
+    """
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=dias - 1), hasta)
+        yield inicio, fin, reconstruir(inicio, fin)
+        inicio = fin + timedelta(days=1)
+
+
+def rango_registrado():
+    """(primera, última) fecha con asistencias o incidencias; None si no hay ninguna."""
+    asistencias = Asistencia.objects.aggregate(primera=Min('fecha_local'), ultima=Max('fecha_local'))
+    incidencias = Incidencia.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+    primeras = [f for f in (asistencias['primera'], incidencias['primera']) if f]
+    if not primeras:
+        return None
+    return min(primeras), max(f for f in (asistencias['ultima'], incidencias['ultima']) if f)
+
+
+def revisar(app_configs=None, databases=None, **kwargs):
+    """
+    Chequeo de sistema (con acceso a la base de datos; corre con migrate y
+    `check --database`): avisa si hay asistencias pero ResumenDiario está
+    vacío, es decir, falta reconstruir el historial tras desplegar.
+    """
+    if not databases:
+        return []
+    if ResumenDiario.objects.exists() or not Asistencia.objects.exists():
+        return []
+    return [checks.Warning(
+        'Hay asistencias registradas pero el resumen diario está vacío.',
+        hint=(
+            'Ejecuta `manage.py reconstruir_resumen_diario` para llenarlo con el historial; hasta entonces '
+            'el panel, los totales y los reportes no muestran esos días.'
+        ),
+        id='locations.W002',
+    )]
+
+
+# ──────────────────────────────────────────────
+# TOTALES
+# ──────────────────────────────────────────────
+
+def _minutos_del_dia(campo):
+    return ExtractHour(campo) * 60 + ExtractMinute(campo)
+
+
+def totales(usuario_id, desde=None, hasta=None):
+    """
+    Totales de un maestro en [desde, hasta] en una sola consulta: días
+    trabajados (con entrada válida), retardos, salidas tempranas y minutos
+    promedio de llegada respecto a la hora de entrada de su horario
+    (negativo = antes). Los meses archivados siguen contando: el resumen
+    diario no se archiva.
+    """
+    resumenes = ResumenDiario.objects.filter(usuario_id=usuario_id)
+    if desde:
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        resumenes = resumenes.filter(fecha__lte=hasta)
+    hora_entrada = Horario.objects.filter(
+        usuario=OuterRef('usuario'),
+        dia_semana=ExtractIsoWeekDay(OuterRef('fecha')) - 1,
+    ).values_list(_minutos_del_dia('hora_entrada'))[:1]
+    trabajado = Q(estado__in=[Estado.EN_TURNO, Estado.TURNO_COMPLETADO])
+
+    datos = resumenes.annotate(
+        llegada=_minutos_del_dia('entrada__fecha_hora') - Subquery(hora_entrada),
+    ).aggregate(
+        dias_trabajados=Count('id', filter=trabajado),
+        retardos=Count('id', filter=Q(tiene_retardo=True)),
+        salidas_tempranas=Count('id', filter=Q(tiene_salida_temprana=True)),
+        llegada_promedio_minutos=Avg('llegada', filter=trabajado),
+    )
+    if datos['llegada_promedio_minutos'] is not None:
+        datos['llegada_promedio_minutos'] = round(datos['llegada_promedio_minutos'], 1)
+    return datos
+
+
+def totales_reporte(resumenes):
+    """
+    Totales del pie del reporte de asistencia sobre un queryset de
+    ResumenDiario ya filtrado, en una sola consulta: días registrados, días
+    con retardo y sus minutos, y días fuera de perímetro.
+    """
+    return resumenes.order_by().aggregate(
+        dias=Count('id'),
+        retardos=Count('id', filter=Q(minutos_retardo__gt=0)),
+        minutos_retardo=Coalesce(Sum('minutos_retardo'), 0),
+        fuera_de_perimetro=Count('id', filter=Q(estado=Estado.FUERA_DE_PERIMETRO)),
+    )
+
+
+# Columnas de totales_por_maestro(), en el orden de los reportes
+CAMPOS_TOTALES = (
+    'id', 'nombre', 'correo', 'dias_presentes', 'retardos', 'minutos_retardo',
+    'salidas_tempranas', 'minutos_salida_temprana', 'faltas', 'justificaciones',
+    'fuera_de_perimetro', 'registros_invalidos', 'horas_trabajadas',
+)
+
+
+def maestros_del_periodo(desde=None, hasta=None):
+    """Maestros activos y cualquier usuario con días registrados en [desde, hasta]."""
+    con_dias = ResumenDiario.objects.all()
+    if desde:
+        con_dias = con_dias.filter(fecha__gte=desde)
+    if hasta:
+        con_dias = con_dias.filter(fecha__lte=hasta)
+    return Usuario.objects.filter(
+        Q(activo=True, rol__nombre=Rol.Nombre.MAESTRO) | Q(id__in=con_dias.values('usuario_id')),
+    )
+
+
+def totales_por_maestro(desde=None, hasta=None, usuario_id=None):
+    """
+    Totales de cada maestro en [desde, hasta] en una sola consulta agrupada,
+    una fila por maestro (CAMPOS_TOTALES) ordenada por nombre: días
+    presentes, retardos y salidas tempranas con sus minutos, faltas,
+    justificaciones, días fuera de perímetro, registros inválidos y horas
+    trabajadas (entre la entrada y la salida de los turnos completos).
+
+    Los días salen de ResumenDiario, que ya une asistencias e incidencias:
+    el período va en el JOIN (FilteredRelation) y el costo crece con los
+    maestros y los días, no con los registros. Los registros inválidos se
+    cuentan en Asistencia con una subconsulta por maestro (índice por
+    usuario y día); los meses archivados ya no los tienen.
+    """
+    maestros = Usuario.objects.filter(id=usuario_id) if usuario_id else maestros_del_periodo(desde, hasta)
+    periodo = Q()
+    invalidos = Asistencia.objects.filter(usuario=OuterRef('pk'), valido=False)
+    if desde:
+        periodo &= Q(resumenes_diarios__fecha__gte=desde)
+        invalidos = invalidos.filter(fecha_local__gte=desde)
+    if hasta:
+        periodo &= Q(resumenes_diarios__fecha__lte=hasta)
+        invalidos = invalidos.filter(fecha_local__lte=hasta)
+    invalidos = invalidos.order_by().values('usuario').annotate(total=Count('id')).values('total')
+
+    completo = Q(dias__estado=Estado.TURNO_COMPLETADO)
+    return maestros.annotate(
+        dias=FilteredRelation('resumenes_diarios', condition=periodo),
+    ).annotate(
+        dias_presentes=Count('dias', filter=Q(dias__estado__in=[Estado.EN_TURNO, Estado.TURNO_COMPLETADO])),
+        retardos=Count('dias', filter=Q(dias__tiene_retardo=True)),
+        minutos_retardo=Coalesce(Sum('dias__minutos_retardo'), 0),
+        salidas_tempranas=Count('dias', filter=Q(dias__tiene_salida_temprana=True)),
+        minutos_salida_temprana=Coalesce(Sum('dias__minutos_salida_temprana'), 0),
+        faltas=Count('dias', filter=Q(dias__tiene_falta=True)),
+        justificaciones=Count('dias', filter=Q(dias__tiene_justificacion=True)),
+        fuera_de_perimetro=Count('dias', filter=Q(dias__estado=Estado.FUERA_DE_PERIMETRO)),
+        registros_invalidos=Coalesce(Subquery(invalidos), 0),
+        minutos_trabajados=Coalesce(Sum(
+            _minutos_del_dia('dias__salida__fecha_hora') - _minutos_del_dia('dias__entrada__fecha_hora'),
+            filter=completo,
+        ), 0),
+        horas_trabajadas=Round(Cast('minutos_trabajados', FloatField()) / 60, 2),
+    ).order_by('nombre', 'id').values(*CAMPOS_TOTALES)
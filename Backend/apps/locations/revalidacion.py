@@ -0,0 +1,192 @@
+"""
+Revalidación masiva de asistencias cuando cambia un perímetro.
+
+Al mover el centro o cambiar el radio de un Perimetro, los valores
+guardados de Asistencia.valido y distancia_metros quedan obsoletos.
+Aquí se recalculan con Haversine vectorizado en NumPy, recorriendo los
+registros por bloques de id para no cargar la tabla completa en memoria.
+
+Al editar un perímetro (PATCH/PUT) la revalidación no corre dentro del
+request: encolar() la manda, al confirmarse la transacción, a un hilo del
+proceso. Si el proceso muere antes de terminarla, se repite con
+POST /api/asistencia/perimetros/{id}/revalidar/ o
+`manage.py revalidar_perimetro`.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from common import marcas
+
+from . import estado_hoy, resumen
+from .indices import RADIO_TIERRA_M
+from .models import Asistencia, Perimetro
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 5000
+# bulk_update genera un CASE por fila; lotes chicos mantienen barato cada UPDATE
+TAMANO_LOTE_UPDATE = 250
+
+_pool = None
+_pool_pid = None
+_candado = threading.Lock()
+
+
+def distancias_haversine(lat0, lng0, lats, lngs):
+    """Distancias en metros desde (lat0, lng0) hacia arreglos de latitudes y longitudes."""
+    lat0 = np.radians(lat0)
+    lats = np.radians(lats)
+    dlat = lats - lat0
+    dlng = np.radians(lngs - lng0)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat0) * np.cos(lats) * np.sin(dlng / 2) ** 2
+    return RADIO_TIERRA_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _guardar_cambios(ids, validos, distancias):
+    """
+    Escribe los nuevos valores de un bloque.
+    En PostgreSQL usa un solo UPDATE ... FROM unnest() por bloque; construir
+    los CASE de bulk_update en Python cuesta más que el cálculo completo.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            tabla = connection.ops.quote_name(Asistencia._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {tabla} AS a '
+                    'SET valido = v.valido, distancia_metros = v.distancia '
+                    'FROM unnest(%s::bigint[], %s::boolean[], %s::double precision[]) '
+                    'AS v(id, valido, distancia) '
+                    'WHERE a.id = v.id',
+                    [ids, validos, distancias],
+                )
+        else:
+            objetos = [
+                Asistencia(id=id_, valido=valido, distancia_metros=distancia)
+                for id_, valido, distancia in zip(ids, validos, distancias)
+            ]
+            Asistencia.objects.bulk_update(
+                objetos, ['valido', 'distancia_metros'], batch_size=TAMANO_LOTE_UPDATE,
+            )
+
+
+def revalidar_perimetro(perimetro, tamano_bloque=TAMANO_BLOQUE, dry_run=False):
+    """
+    Recalcula valido y distancia_metros de todas las asistencias del perímetro.
+    Con dry_run=True solo cuenta los cambios, sin escribir.
+    Retorna un dict con los totales de la revalidación.
+    """
+    lat0 = float(perimetro.latitud)
+    lng0 = float(perimetro.longitud)
+    radio = perimetro.radio_metros
+
+    resultado = {
+        'perimetro': perimetro.id,
+        'dry_run': dry_run,
+        'revisados': 0,
+        'actualizados': 0,
+        'a_valido': 0,
+        'a_invalido': 0,
+    }
+
+    hoy = timezone.localdate()
+    ultimo_id = 0
+    while True:
+        filas = list(
+            Asistencia.objects.filter(perimetro=perimetro, id__gt=ultimo_id)
+            .order_by('id')
+            .values_list('id', 'latitud_real', 'longitud_real', 'valido', 'distancia_metros',
+                         'usuario_id', 'fecha_local')
+            [:tamano_bloque]
+        )
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+
+        ids, lats, lngs, validos, distancias, usuarios, fechas = zip(*filas)
+        lats = np.array(lats, dtype=float)
+        lngs = np.array(lngs, dtype=float)
+        validos = np.array(validos, dtype=bool)
+        distancias = np.array(distancias, dtype=float)
+
+        nuevas = distancias_haversine(lat0, lng0, lats, lngs)
+        nuevos_validos = nuevas <= radio
+        nuevas = np.round(nuevas, 2)
+
+        cambia_validez = nuevos_validos != validos
+        cambia = cambia_validez | (np.abs(nuevas - distancias) >= 0.005)
+
+        resultado['revisados'] += len(filas)
+        resultado['actualizados'] += int(cambia.sum())
+        resultado['a_valido'] += int((cambia_validez & nuevos_validos).sum())
+        resultado['a_invalido'] += int((cambia_validez & ~nuevos_validos).sum())
+
+        if dry_run or not cambia.any():
+            continue
+
+        with transaction.atomic():
+            _guardar_cambios(
+                np.array(ids)[cambia].tolist(),
+                nuevos_validos[cambia].tolist(),
+                nuevas[cambia].tolist(),
+            )
+            # Cambiar la validez puede cambiar la entrada y el estado del resumen
+            resumen.recalcular(
+                (usuarios[i], fechas[i])
+                for i in np.flatnonzero(cambia_validez)
+            )
+            # La distancia también se muestra en el historial y el panel
+            marcas.avanzar(*marcas.dias(
+                (usuarios[i], fechas[i]) for i in np.flatnonzero(cambia)
+            ))
+        # El UPDATE masivo no envía señales: invalidar el estado del día
+        # (solo hoy está en cache) de los usuarios con registros modificados
+        estado_hoy.invalidar_varios(
+            (usuarios[i], fechas[i])
+            for i in np.flatnonzero(cambia)
+            if fechas[i] >= hoy
+        )
+
+    return resultado
+
+
+# ──────────────────────────────────────────────
+# EN SEGUNDO PLANO
+# ──────────────────────────────────────────────
+
+def _ejecutar(perimetro_id):
+    try:
+        # La geometría se lee aquí: una edición posterior ya está confirmada
+        perimetro = Perimetro.objects.filter(id=perimetro_id).first()
+        if perimetro is not None:
+            revalidar_perimetro(perimetro)
+    except Exception:
+        logger.exception('No se pudo revalidar el perímetro %s', perimetro_id)
+    finally:
+        # Los hilos del pool no pasan por el ciclo de request
+        connections.close_all()
+
+
+def encolar(perimetro_id):
+    """
+    Revalida el perímetro en el hilo de este proceso cuando se confirme la
+    transacción actual. Un solo hilo: dos ediciones seguidas se revalidan
+    en orden y la última deja los valores de la geometría vigente.
+    """
+    transaction.on_commit(lambda: _enviar(perimetro_id))
+
+
+def _enviar(perimetro_id):
+    global _pool, _pool_pid
+    with _candado:
+        # Tras un fork (gunicorn --preload) los hilos del padre no existen
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='revalidacion')
+            _pool_pid = os.getpid()
+        _pool.submit(_ejecutar, perimetro_id)
@@ -1,5 +1,10 @@
 from rest_framework import serializers
-from .models import Perimetro, Asistencia, Incidencia, RedAutorizada
+from .models import Perimetro, Asistencia, Incidencia, RedAutorizada, TrabajoReporte
+from .indices import indice_redes, indice_perimetros, normalizar_bssid
+from .registro import (
+    obtener_estado_dia, registrar_asistencia, error_reglas_dia, error_wifi,
+    LOTE_MAX_REGISTROS,
+)
 
 
 class RedAutorizadaSerializer(serializers.ModelSerializer):
@@ -35,16 +40,16 @@ class AsistenciaSerializer(serializers.ModelSerializer):
             'latitud_real', 'longitud_real',
             'ssid_conectado', 'bssid_conectado',
             'wifi_valido', 'red_autorizada', 'red_nombre',
-            'fecha_hora', 'valido', 'distancia_metros',
+            'fecha_hora', 'valido', 'distancia_metros', 'id_provisional',
         ]
-        read_only_fields = ['fecha_hora', 'valido', 'distancia_metros', 'wifi_valido']
+        read_only_fields = ['fecha_hora', 'valido', 'distancia_metros', 'wifi_valido', 'id_provisional']
 
 
 class RegistrarAsistenciaSerializer(serializers.Serializer):
     """
     Serializer para que un maestro registre su entrada/salida.
     Recibe lat/lng y ssid/bssid del dispositivo.
-    Valida contra el perímetro activo Y la red Wi-Fi autorizada.
+    Valida contra el perímetro activo más cercano Y la red Wi-Fi autorizada.
     Solo permite una entrada y una salida por día.
     """
     tipo = serializers.ChoiceField(choices=Asistencia.Tipo.choices)
@@ -56,113 +61,75 @@ class RegistrarAsistenciaSerializer(serializers.Serializer):
     def validate(self, data):
         from django.utils import timezone
 
-        # Buscar perímetro activo
-        perimetro = Perimetro.objects.filter(activo=True).first()
-        if not perimetro:
+        # Resolver el perímetro contenedor más cercano (índice espacial en memoria)
+        ubicacion = indice_perimetros.localizar(data['latitud'], data['longitud'])
+        if not ubicacion:
             raise serializers.ValidationError('No hay un perímetro activo configurado.')
-        data['perimetro'] = perimetro
+        data['perimetro'], data['dentro'], data['distancia'] = ubicacion
 
-        # Validar máximo una entrada y una salida por día
+        # Estado del día (entrada/salida válidas y horario) en una sola consulta
         usuario = self.context['usuario']
         hoy = timezone.localtime().date()
         tipo = data['tipo']
+        estado = obtener_estado_dia(usuario, hoy)
+        data['estado_dia'] = estado
 
-        ya_existe = Asistencia.objects.filter(
-            usuario=usuario,
-            tipo=tipo,
-            fecha_hora__date=hoy,
-            valido=True,
-        ).exists()
-
-        if ya_existe:
-            tipo_display = 'entrada' if tipo == 'entrada' else 'salida'
-            raise serializers.ValidationError(
-                f'Ya registraste tu {tipo_display} el día de hoy. '
-                f'Solo se permite una {tipo_display} por día.'
-            )
-
-        # Si intenta salida sin entrada, rechazar
-        if tipo == 'salida':
-            tiene_entrada = Asistencia.objects.filter(
-                usuario=usuario,
-                tipo='entrada',
-                fecha_hora__date=hoy,
-                valido=True,
-            ).exists()
-            if not tiene_entrada:
-                raise serializers.ValidationError(
-                    'Debes registrar tu entrada antes de marcar la salida.'
-                )
+        # Validar máximo una entrada y una salida por día
+        error = error_reglas_dia(tipo, estado.entrada_id, estado.salida_id)
+        if error:
+            raise serializers.ValidationError(error)
 
         # ── Validar red Wi-Fi ──
         ssid = data.get('ssid', '').strip()
-        bssid = data.get('bssid', '').strip().upper()
+        bssid = normalizar_bssid(data.get('bssid', ''))
         data['ssid'] = ssid
         data['bssid'] = bssid
 
-        wifi_valido = False
-        red_autorizada = None
-
-        if bssid:
-            # Buscar por BSSID (más confiable que SSID ya que el SSID puede clonarse)
-            red_autorizada = RedAutorizada.objects.filter(
-                bssid=bssid,
-                activo=True,
-            ).first()
-            if red_autorizada:
-                wifi_valido = True
-
-        if not wifi_valido and ssid:
-            # Fallback: buscar por SSID solamente
-            red_autorizada = RedAutorizada.objects.filter(
-                ssid=ssid,
-                activo=True,
-            ).first()
-            if red_autorizada:
-                wifi_valido = True
+        # Índice en memoria: busca por BSSID (más confiable que SSID ya que
+        # el SSID puede clonarse) y, como fallback, por SSID
+        red_autorizada = indice_redes.buscar(ssid, bssid)
+        wifi_valido = red_autorizada is not None
 
         data['wifi_valido'] = wifi_valido
         data['red_autorizada'] = red_autorizada
 
         # Si no hay red Wi-Fi válida, rechazar
-        if not wifi_valido:
-            if not ssid and not bssid:
-                raise serializers.ValidationError(
-                    'No se detectó conexión Wi-Fi. '
-                    'Debes estar conectado a la red institucional para registrar asistencia.'
-                )
-            raise serializers.ValidationError(
-                f'La red Wi-Fi "{ssid}" no está autorizada. '
-                'Debes estar conectado a una red institucional autorizada.'
-            )
+        error = error_wifi(ssid, bssid, red_autorizada)
+        if error:
+            raise serializers.ValidationError(error)
 
         return data
 
     def create(self, validated_data):
-        usuario = self.context['usuario']
-        perimetro = validated_data['perimetro']
-        lat = validated_data['latitud']
-        lng = validated_data['longitud']
-
-        # Validar si está dentro del perímetro (Haversine)
-        dentro, distancia = perimetro.esta_dentro(lat, lng)
-
-        asistencia = Asistencia.objects.create(
-            usuario=usuario,
-            perimetro=perimetro,
-            red_autorizada=validated_data.get('red_autorizada'),
-            tipo=validated_data['tipo'],
-            latitud_real=lat,
-            longitud_real=lng,
-            ssid_conectado=validated_data.get('ssid', ''),
-            bssid_conectado=validated_data.get('bssid', ''),
-            wifi_valido=validated_data.get('wifi_valido', False),
-            valido=dentro,
-            distancia_metros=distancia,
-        )
+        asistencia, _, _ = registrar_asistencia(self.context['usuario'], validated_data)
         return asistencia
 
 
+class CamposRegistroSerializer(RegistrarAsistenciaSerializer):
+    """
+    Solo los campos del registro, sin consultar la base de datos.
+    Las reglas de perímetro, Wi-Fi y horario las aplica quien lo usa
+    (registro por lotes y vistas async).
+    """
+
+    def validate(self, data):
+        return data
+
+
+class RegistroOfflineSerializer(CamposRegistroSerializer):
+    """Un marcado capturado sin conexión, con la fecha_hora del dispositivo."""
+    fecha_hora = serializers.DateTimeField()
+
+
+class RegistrarLoteSerializer(serializers.Serializer):
+    """Lote de marcados offline: {"registros": [{tipo, latitud, longitud, ssid, bssid, fecha_hora}, ...]}"""
+    registros = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=LOTE_MAX_REGISTROS,
+    )
+
+
 class IncidenciaSerializer(serializers.ModelSerializer):
     usuario_nombre = serializers.CharField(source='usuario.nombre', read_only=True)
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
@@ -175,3 +142,40 @@ class IncidenciaSerializer(serializers.ModelSerializer):
             'fecha', 'descripcion', 'created_at',
         ]
         read_only_fields = ['created_at']
+
+
+class SolicitudReporteSerializer(serializers.Serializer):
+    """Filtros de un reporte PDF (mismos que los query params de /api/reportes/...)."""
+    tipo = serializers.ChoiceField(choices=TrabajoReporte.Tipo.choices)
+    fecha_inicio = serializers.DateField(required=False, allow_null=True, default=None)
+    fecha_fin = serializers.DateField(required=False, allow_null=True, default=None)
+    usuario = serializers.IntegerField(required=False, allow_null=True, default=None, min_value=1)
+    # Solo para por_maestro: un ZIP con un PDF por maestro o un PDF con marcadores
+    salida = serializers.ChoiceField(choices=['zip', 'pdf'], required=False, default='zip')
+
+    def validate(self, data):
+        if data['fecha_inicio'] and data['fecha_fin'] and data['fecha_inicio'] > data['fecha_fin']:
+            raise serializers.ValidationError('fecha_inicio debe ser anterior o igual a fecha_fin.')
+        return data
+
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoReporte
+        fields = [
+            'id', 'tipo', 'tipo_display', 'parametros', 'estado', 'estado_display',
+            'error', 'descarga', 'created_at', 'terminado_en',
+        ]
+        read_only_fields = fields
+
+    def get_descarga(self, obj):
+        """URL de descarga cuando el archivo está listo."""
+        if obj.estado != TrabajoReporte.Estado.LISTO:
+            return None
+        url = f'/api/reportes/trabajos/{obj.id}/descarga/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,118 @@
+"""
+Señales de los modelos de asistencia.
+Mantienen sincronizados los índices en memoria cuando se editan redes
+o perímetros desde sus ViewSets o desde el admin, y el estado del día
+en cache (estado-hoy) cuando se registra, edita o borra una asistencia,
+el resumen diario cuando cambia una asistencia o incidencia fuera del
+registro (que lo actualiza por su cuenta), y el horario semanal compilado
+cuando cambia un Horario. Los marcados e incidencias nuevos se publican al
+panel en vivo (difusion.py) al confirmarse, y toda escritura avanza las
+marcas de cambio de los GET condicionales (common/marcas.py).
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.users.models import Horario, Usuario
+from common import marcas
+
+from . import difusion, estado_hoy, horarios, resumen
+from .indices import indice_redes, indice_perimetros
+from .models import RedAutorizada, Perimetro, Asistencia, Incidencia
+from .serializers import AsistenciaSerializer
+
+
+@receiver([post_save, post_delete], sender=RedAutorizada)
+def invalidar_indice_redes(sender, **kwargs):
+    # Se invalida de inmediato para este proceso y otra vez al confirmar
+    # la transacción, para que ningún worker reconstruya con datos sin commit.
+    indice_redes.invalidar()
+    transaction.on_commit(indice_redes.invalidar)
+    marcas.avanzar(marcas.REDES)
+
+
+@receiver([post_save, post_delete], sender=Perimetro)
+def invalidar_indice_perimetros(sender, **kwargs):
+    indice_perimetros.invalidar()
+    transaction.on_commit(indice_perimetros.invalidar)
+    marcas.avanzar(marcas.PERIMETROS)
+
+
+@receiver(post_save, sender=Asistencia)
+def actualizar_estado_hoy(sender, instance, created, **kwargs):
+    # Un registro nuevo se escribe en el estado del día al confirmarse
+    # (write-through) y se publica al panel en vivo; una edición lo invalida,
+    # porque puede cambiar su validez, su tipo o su fecha.
+    if created:
+        def al_confirmar():
+            datos = AsistenciaSerializer(instance).data
+            estado_hoy.registrar_marcado(instance, datos)
+            difusion.publicar_marcado(instance, datos)
+        transaction.on_commit(al_confirmar)
+    else:
+        _invalidar_estado_hoy(instance)
+
+
+@receiver(post_delete, sender=Asistencia)
+def invalidar_estado_hoy(sender, instance, **kwargs):
+    _invalidar_estado_hoy(instance)
+
+
+def _invalidar_estado_hoy(asistencia):
+    fecha = asistencia.fecha_local
+    estado_hoy.invalidar(asistencia.usuario_id, fecha)
+    transaction.on_commit(lambda: estado_hoy.invalidar(asistencia.usuario_id, fecha))
+
+
+def _dia(instance):
+    if isinstance(instance, Asistencia):
+        return instance.usuario_id, instance.fecha_local
+    return instance.usuario_id, instance.fecha
+
+
+@receiver(pre_save, sender=Asistencia)
+@receiver(pre_save, sender=Incidencia)
+def recordar_dia_anterior(sender, instance, **kwargs):
+    # Una edición puede mover el registro a otro usuario o fecha: se recalculan ambos días
+    if not instance._state.adding:
+        anterior = sender.objects.filter(pk=instance.pk).first()
+        instance._dia_anterior = _dia(anterior) if anterior else None
+
+
+@receiver([post_save, post_delete], sender=Asistencia)
+@receiver([post_save, post_delete], sender=Incidencia)
+def recalcular_resumen(sender, instance, **kwargs):
+    # registrar_asistencia() marca sus instancias: ya actualizó el resumen
+    if getattr(instance, '_resumen_al_dia', False):
+        return
+    # Al borrar un usuario sus resúmenes se borran en cascada
+    origen = kwargs.get('origin')
+    if getattr(origen, 'model', type(origen)) is Usuario:
+        return
+    resumen.recalcular({_dia(instance), getattr(instance, '_dia_anterior', None)} - {None})
+
+
+@receiver([post_save, post_delete], sender=Asistencia)
+@receiver([post_save, post_delete], sender=Incidencia)
+def avanzar_marcas_del_dia(sender, instance, **kwargs):
+    marcas.avanzar(*marcas.dias({_dia(instance), getattr(instance, '_dia_anterior', None)} - {None}))
+
+
+@receiver(post_save, sender=Incidencia)
+def publicar_incidencia(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: difusion.publicar_incidencia(instance))
+
+
+@receiver([post_save, post_delete], sender=Horario)
+def invalidar_horario_compilado(sender, instance, **kwargs):
+    usuario_id = instance.usuario_id
+    horarios.invalidar(usuario_id)
+    transaction.on_commit(lambda: horarios.invalidar(usuario_id))
+    marcas.avanzar(marcas.horario(usuario_id), marcas.HORARIOS)
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def avanzar_marca_maestros(sender, **kwargs):
+    # El panel muestra nombre y correo de los maestros activos
+    marcas.avanzar(marcas.MAESTROS)
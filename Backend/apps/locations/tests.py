@@ -1,3 +1,1309 @@
-from django.test import TestCase
+import csv
+import json
+import re
+import tempfile
+import time as reloj
+import zipfile
+from io import BytesIO, StringIO
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.forms.models import model_to_dict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from pypdf import PdfReader
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.users.models import Rol, Usuario, Horario
+from common import cache_compartida, marcas, por_maestro, reportes, trabajos
+from common.authentication import generar_tokens
+
+from . import (
+    archivo, difusion, escritura_diferida, estado_hoy, horarios, particiones, resumen, revalidacion, valores,
+)
+from .indices import distancia_haversine, indice_redes, indice_perimetros
+from .models import Perimetro, Asistencia, Incidencia, RedAutorizada, ResumenDiario, TrabajoReporte
+from .registro import consulta_estado_dia, evaluar_horario
+from .serializers import AsistenciaSerializer, IncidenciaSerializer
+
+# Lunes 2 de marzo de 2026, 09:00 hora local: entrada con retardo
+AHORA = timezone.make_aware(datetime(2026, 3, 2, 9, 0))
+
+
+# Las pruebas corren en un solo proceso: la cache locmem cuenta como compartida
+@override_settings(CACHE_UN_SOLO_PROCESO=True)
+class AsistenciaTestBase(TestCase):
+    """Maestro con horario de lunes, un perímetro y una red autorizada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre=Rol.Nombre.MAESTRO)
+        cls.maestro = Usuario.objects.create(nombre='Juan Pérez', correo='maestro@escuela.com', rol=rol)
+        Horario.objects.create(
+            usuario=cls.maestro, dia_semana=0,
+            hora_entrada=time(7, 0), hora_salida=time(14, 30),
+        )
+        Perimetro.objects.create(
+            nombre='Campus Principal', latitud='20.659698', longitud='-103.349609', radio_metros=100,
+        )
+        RedAutorizada.objects.create(nombre='Sala de maestros', ssid='ESCUELA_WIFI', bssid='AA:BB:CC:DD:EE:01')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(self.maestro)["access"]}')
+
+        reloj = mock.patch('django.utils.timezone.now', return_value=AHORA)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+        cache.clear()
+        # Los índices en memoria y el horario compilado se cargan fuera del presupuesto medido
+        for indice in (indice_redes, indice_perimetros):
+            indice.invalidar()
+            indice.datos()
+        horarios.horario_semanal(self.maestro.id)
+
+    def registrar(self, tipo, **extra):
+        return self.client.post('/api/asistencia/registrar/', {
+            'tipo': tipo,
+            'latitud': '20.659700',
+            'longitud': '-103.349600',
+            'ssid': 'ESCUELA_WIFI',
+            'bssid': 'aa:bb:cc:dd:ee:01',
+        }, format='json', **extra)
+
+
+class RegistrarAsistenciaTests(AsistenciaTestBase):
+    """POST /api/asistencia/registrar/ con presupuesto fijo de consultas."""
+
+    def test_entrada_con_retardo_respeta_presupuesto(self):
+        # Autenticación, estado del día y, en la transacción (SAVEPOINT/RELEASE
+        # dentro del TestCase), la asistencia, la incidencia de retardo y el
+        # upsert del resumen diario.
+        with self.assertNumQueries(7):
+            response = self.registrar('entrada')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['estado_horario'], 'retardo')
+        self.assertTrue(response.data['valido'])
+        self.assertEqual(response.data['incidencia']['tipo'], Incidencia.Tipo.RETARDO)
+        self.assertEqual(Incidencia.objects.filter(usuario=self.maestro).count(), 1)
+
+    def test_entrada_duplicada_se_rechaza_sin_escribir(self):
+        self.registrar('entrada')
+
+        with self.assertNumQueries(2):
+            response = self.registrar('entrada')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Asistencia.objects.filter(usuario=self.maestro).count(), 1)
+
+    def test_salida_sin_entrada_se_rechaza(self):
+        response = self.registrar('salida')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class IdempotenciaTests(AsistenciaTestBase):
+    """Idempotency-Key en POST /api/asistencia/registrar/."""
+
+    LLAVE = {'HTTP_IDEMPOTENCY_KEY': '5f0c1a2e-registro-1'}
+
+    def test_reintento_repite_la_respuesta_sin_validar(self):
+        primera = self.registrar('entrada', **self.LLAVE)
+
+        # Solo la autenticación: ni perímetros, redes, horario ni asistencias
+        with self.assertNumQueries(1):
+            reintento = self.registrar('entrada', **self.LLAVE)
+
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(reintento.data['id'], primera.data['id'])
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_misma_llave_con_otro_cuerpo_se_rechaza(self):
+        self.registrar('entrada', **self.LLAVE)
+
+        response = self.registrar('salida', **self.LLAVE)
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_error_no_se_guarda(self):
+        self.assertEqual(self.registrar('salida', **self.LLAVE).status_code, 400)
+        self.registrar('entrada')
+
+        self.assertEqual(self.registrar('salida', **self.LLAVE).status_code, 201)
+
+
+class EscrituraDiferidaTests(AsistenciaTestBase):
+    """Registro con buffer local y vaciado por lotes."""
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(
+            ASISTENCIA_ESCRITURA_DIFERIDA=True,
+            ASISTENCIA_BUFFER_RUTA=str(Path(directorio.name) / 'buffer.sqlite3'),
+            ASISTENCIA_BUFFER_INTERVALO_MS=0,  # sin hilo: se vacía a mano
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_registro_se_difiere_y_el_vaciado_lo_inserta(self):
+        response = self.registrar('entrada')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(response.data['id'])
+        self.assertEqual(response.data['estado_horario'], 'retardo')
+        self.assertFalse(Asistencia.objects.exists())
+
+        # El pendiente cuenta para la regla de una entrada por día
+        self.assertEqual(self.registrar('entrada').status_code, 400)
+
+        self.assertEqual(escritura_diferida.vaciar_todo(), 1)
+        asistencia = Asistencia.objects.get()
+        self.assertEqual(asistencia.id_provisional, response.data['id_provisional'])
+        self.assertEqual(Incidencia.objects.filter(tipo=Incidencia.Tipo.RETARDO).count(), 1)
+
+    def test_recuperacion_no_duplica_lo_ya_insertado(self):
+        self.registrar('entrada')
+
+        # Caída entre el commit y el borrado del buffer
+        with mock.patch.object(escritura_diferida.BufferAsistencias, 'confirmar', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                escritura_diferida.vaciar_lote()
+
+        with mock.patch.object(escritura_diferida, 'TIMEOUT_RECLAMO_S', 0):
+            self.assertEqual(escritura_diferida.vaciar_todo(), 1)
+
+        self.assertEqual(Asistencia.objects.count(), 1)
+        self.assertEqual(escritura_diferida.obtener_buffer().cantidad(), 0)
+
+    def test_vaciador_arranca_con_el_servidor_y_no_con_la_aplicacion(self):
+        with mock.patch.object(escritura_diferida, 'asegurar_vaciador') as asegurar:
+            # migrate, shell o las pruebas no compiten con el vaciador del servidor
+            apps.get_app_config('locations').ready()
+            asegurar.assert_not_called()
+            # Un pendiente de un proceso anterior no espera al próximo registro
+            escritura_diferida.iniciar_con_servidor()
+            with override_settings(ASISTENCIA_ESCRITURA_DIFERIDA=False):
+                escritura_diferida.iniciar_con_servidor()
+        asegurar.assert_called_once_with()
+
+
+class EstadoHoyTests(AsistenciaTestBase):
+    """GET /api/asistencia/estado-hoy/ responde desde cache tras registrar."""
+
+    def estado(self):
+        return self.client.get('/api/asistencia/estado-hoy/')
+
+    def test_registro_escribe_en_cache_y_estado_no_consulta_asistencias(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entrada = self.registrar('entrada')
+
+        # Solo la autenticación del usuario
+        with self.assertNumQueries(1):
+            response = self.estado()
+
+        self.assertTrue(response.data['entrada_registrada'])
+        self.assertFalse(response.data['salida_registrada'])
+        self.assertEqual(response.data['entrada']['id'], entrada.data['id'])
+
+    def test_edicion_invalida_el_estado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            entrada = self.registrar('entrada')
+        self.estado()
+
+        Asistencia.objects.filter(pk=entrada.data['id']).get().delete()
+
+        response = self.estado()
+        self.assertFalse(response.data['entrada_registrada'])
+
+    def test_expira_a_medianoche_local(self):
+        self.assertEqual(estado_hoy.segundos_hasta_medianoche(), 15 * 3600)
+
+
+class HorarioCompiladoTests(AsistenciaTestBase):
+    """Clasificación de marcados con el horario semanal compilado."""
+
+    def test_clasificacion_sin_consultas(self):
+        horario = horarios.horario_del_dia(self.maestro.id, AHORA.date())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(horario, (420, 870, 430, 855))
+            self.assertIsNone(evaluar_horario('entrada', horario, time(7, 10)))
+            self.assertEqual(evaluar_horario('entrada', horario, time(7, 10, 1)), Incidencia.Tipo.RETARDO)
+            self.assertEqual(evaluar_horario('salida', horario, time(14, 14)), Incidencia.Tipo.SALIDA_TEMPRANA)
+            self.assertIsNone(evaluar_horario('salida', horario, time(14, 15)))
+
+    def test_editar_horario_invalida_la_cache(self):
+        Horario.objects.filter(usuario=self.maestro, dia_semana=0).get().delete()
+
+        self.assertIsNone(horarios.horario_del_dia(self.maestro.id, AHORA.date()))
+
+
+class RegistrarLoteTests(AsistenciaTestBase):
+    """POST /api/asistencia/registrar-lote/ con marcados guardados sin conexión."""
+
+    def marcado(self, tipo, hora, **extra):
+        return {
+            'tipo': tipo,
+            'latitud': '20.659700',
+            'longitud': '-103.349600',
+            'ssid': 'ESCUELA_WIFI',
+            'bssid': 'aa:bb:cc:dd:ee:01',
+            'fecha_hora': timezone.make_aware(datetime(2026, 3, 2, *hora)).isoformat(),
+            **extra,
+        }
+
+    def registrar_lote(self, registros):
+        return self.client.post('/api/asistencia/registrar-lote/', {'registros': registros}, format='json')
+
+    def test_lote_respeta_presupuesto_y_orden(self):
+        registros = [
+            self.marcado('salida', (8, 50)),
+            self.marcado('entrada', (7, 20)),
+            self.marcado('entrada', (7, 30)),
+            self.marcado('entrada', (7, 40), latitud='no-es-numero'),
+        ]
+        # Autenticación, dos lecturas de estado (el horario está en cache) y,
+        # en la transacción, un bulk_create de asistencias y otro de incidencias
+        # más el recálculo del resumen diario (tres lecturas y un upsert).
+        with self.assertNumQueries(11):
+            response = self.registrar_lote(registros)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['registrados'], 2)
+        self.assertEqual(response.data['rechazados'], 2)
+        resultados = response.data['resultados']
+        self.assertEqual([r['indice'] for r in resultados], [0, 1, 2, 3])
+        self.assertEqual(resultados[0]['estado_horario'], 'salida_temprana')
+        self.assertEqual(resultados[1]['estado_horario'], 'retardo')
+        self.assertFalse(resultados[2]['registrado'])
+        self.assertIn('latitud', resultados[3]['errores'])
+
+        entrada = Asistencia.objects.get(pk=resultados[1]['id'])
+        self.assertEqual(timezone.localtime(entrada.fecha_hora).time(), time(7, 20))
+        self.assertEqual(Incidencia.objects.filter(usuario=self.maestro).count(), 2)
+
+    def test_registro_demasiado_antiguo_se_rechaza(self):
+        response = self.registrar_lote([self.marcado('entrada', (7, 0)) | {
+            'fecha_hora': timezone.make_aware(datetime(2026, 2, 20, 7, 0)).isoformat(),
+        }])
+
+        self.assertEqual(response.data['rechazados'], 1)
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class ResumenDiarioTests(AsistenciaTestBase):
+    """Resumen diario mantenido al registrar, al editar y con la reconstrucción."""
+
+    def resumen(self):
+        return ResumenDiario.objects.get(usuario=self.maestro, fecha=AHORA.date())
+
+    def test_registro_actualiza_el_resumen(self):
+        self.registrar('entrada')
+        resumen = self.resumen()
+        self.assertEqual(resumen.estado, ResumenDiario.Estado.EN_TURNO)
+        self.assertEqual(resumen.minutos_retardo, 120)
+        self.assertTrue(resumen.tiene_retardo)
+
+        with mock.patch('django.utils.timezone.now', return_value=AHORA.replace(hour=13)):
+            self.registrar('salida')
+        resumen = self.resumen()
+        self.assertEqual(resumen.estado, ResumenDiario.Estado.TURNO_COMPLETADO)
+        self.assertEqual(resumen.minutos_salida_temprana, 90)
+        self.assertEqual((resumen.tiene_retardo, resumen.tiene_salida_temprana), (True, True))
+
+    def test_ediciones_recalculan_y_reconstruir_reproduce(self):
+        self.registrar('entrada')
+        esperado = model_to_dict(self.resumen(), exclude=['id'])
+
+        ResumenDiario.objects.all().delete()
+        call_command('reconstruir_resumen_diario', stdout=StringIO())
+        self.assertEqual(model_to_dict(self.resumen(), exclude=['id']), esperado)
+
+        # Tabla vacía con historial: el chequeo pide reconstruirla
+        ResumenDiario.objects.all().delete()
+        self.assertEqual([a.id for a in resumen.revisar(databases=['default'])], ['locations.W002'])
+        self.assertEqual(resumen.revisar(), [])
+        call_command('reconstruir_resumen_diario', stdout=StringIO())
+        self.assertEqual(resumen.revisar(databases=['default']), [])
+
+        Incidencia.objects.filter(usuario=self.maestro).delete()
+        self.assertFalse(self.resumen().tiene_retardo)
+        Asistencia.objects.filter(usuario=self.maestro).delete()
+        self.assertFalse(ResumenDiario.objects.exists())
+
+
+class IndicesAsistenciaTests(AsistenciaTestBase):
+    """Las consultas por día filtran por fecha_local y usan los índices compuestos."""
+
+    def test_fecha_local_se_llena_al_guardar(self):
+        self.registrar('entrada')
+        asistencia = Asistencia.objects.get()
+        self.assertEqual(asistencia.fecha_local, timezone.localdate(AHORA))
+
+        # Con update_fields también se guarda la fecha_local nueva
+        asistencia.fecha_hora = AHORA + timedelta(days=1)
+        asistencia.save(update_fields=['fecha_hora'])
+        asistencia.refresh_from_db()
+        self.assertEqual(asistencia.fecha_local, timezone.localdate(AHORA) + timedelta(days=1))
+
+    def test_explain_usa_los_indices(self):
+        hoy = timezone.localdate(AHORA)
+        consultas = [
+            ('asistencia_usuario_dia_idx', consulta_estado_dia(self.maestro.id, hoy)),
+            ('asistencia_usuario_dia_idx', Asistencia.objects.filter(usuario=self.maestro, fecha_local__gte=hoy)),
+            ('asistencia_dia_usuario_idx', Asistencia.objects.filter(fecha_local__in=[hoy])),
+        ]
+        if connection.vendor == 'postgresql':
+            # Con tablas de prueba casi vacías el planificador preferiría leerlas completas
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for indice, consulta in consultas:
+            with self.subTest(indice=indice):
+                self.assertIn(indice, consulta.explain())
+
+
+class IndicesEnMemoriaTests(AsistenciaTestBase):
+    """Perímetros por cuadrícula y redes por BSSID/SSID, con el mismo resultado que la base de datos."""
+
+    def localizar(self, lat, lng):
+        return indice_perimetros.localizar(lat, lng)
+
+    def en_bd(self, lat, lng):
+        with override_settings(ASISTENCIA_INDICES_EN_MEMORIA=False):
+            return indice_perimetros.localizar(lat, lng)
+
+    def test_contenedor_mas_cercano(self):
+        anexo = Perimetro.objects.create(nombre='Anexo', latitud='20.660200', longitud='-103.349609', radio_metros=200)
+        campus = Perimetro.objects.get(nombre='Campus Principal')
+
+        # Ambos lo contienen: gana el centro más cercano
+        for (lat, lng), esperado in [(('20.660150', '-103.349609'), anexo), (('20.659650', '-103.349609'), campus)]:
+            with self.subTest(esperado=esperado.nombre):
+                perimetro, dentro, _ = self.localizar(lat, lng)
+                self.assertEqual(perimetro, esperado)
+                self.assertTrue(dentro)
+                self.assertEqual(self.localizar(lat, lng), self.en_bd(lat, lng))
+
+    def test_punto_en_el_borde_de_una_celda(self):
+        # El centro queda en una celda y el punto en la vecina (20.67 es borde de celda)
+        biblioteca = Perimetro.objects.create(
+            nombre='Biblioteca', latitud='20.669990', longitud='-103.349609', radio_metros=50,
+        )
+        for lat in ('20.670000', '20.670100'):
+            with self.subTest(lat=lat):
+                perimetro, dentro, distancia = self.localizar(lat, '-103.349609')
+                self.assertEqual(perimetro, biblioteca)
+                self.assertTrue(dentro)
+                self.assertEqual((perimetro, dentro, distancia), self.en_bd(lat, '-103.349609'))
+
+    def test_fuera_de_todos_el_mas_cercano(self):
+        # La caja del perímetro grande toca la celda del punto, pero el centro más cercano es el del campus
+        Perimetro.objects.create(nombre='Grande', latitud='20.750000', longitud='-103.349609', radio_metros=5000)
+        Perimetro.objects.create(nombre='Monterrey', latitud='25.670000', longitud='-100.310000', radio_metros=100)
+        for lat, lng in [('20.703000', '-103.349609'), ('19.432600', '-99.133200'), ('20.661000', '-103.349600')]:
+            with self.subTest(lat=lat, lng=lng):
+                perimetro, dentro, _ = self.localizar(lat, lng)
+                self.assertFalse(dentro)
+                self.assertEqual(self.localizar(lat, lng), self.en_bd(lat, lng))
+        self.assertEqual(self.localizar('20.703000', '-103.349609')[0].nombre, 'Campus Principal')
+
+    def test_fuera_de_todos_no_mide_los_lejanos(self):
+        Perimetro.objects.create(nombre='Monterrey', latitud='25.670000', longitud='-100.310000', radio_metros=100)
+        with mock.patch('apps.locations.indices.distancia_haversine', wraps=distancia_haversine) as medir:
+            perimetro, dentro, _ = self.localizar('20.661000', '-103.349600')
+        self.assertEqual((perimetro.nombre, dentro), ('Campus Principal', False))
+        self.assertEqual(medir.call_count, 1)
+
+    def test_guardar_perimetro_invalida_el_indice(self):
+        self.assertFalse(self.localizar('20.661000', '-103.349600')[1])
+        campus = Perimetro.objects.get(nombre='Campus Principal')
+        campus.radio_metros = 300
+        campus.save()
+        self.assertTrue(self.localizar('20.661000', '-103.349600')[1])
+
+        campus.activo = False
+        campus.save()
+        self.assertIsNone(self.localizar('20.661000', '-103.349600'))
+
+    def test_red_por_bssid_antes_que_por_ssid(self):
+        sala = RedAutorizada.objects.get(ssid='ESCUELA_WIFI')
+        otra = RedAutorizada.objects.create(nombre='Laboratorio', ssid='LAB_WIFI', bssid='AA:BB:CC:DD:EE:02')
+
+        # El SSID puede clonarse: el BSSID decide
+        self.assertEqual(indice_redes.buscar('LAB_WIFI', ' aa:bb:cc:dd:ee:01 '), sala)
+        self.assertEqual(indice_redes.buscar('ESCUELA_WIFI', 'aa:bb:cc:dd:ee:02'), otra)
+        # BSSID desconocido o ausente: por SSID
+        self.assertEqual(indice_redes.buscar('LAB_WIFI', 'FF:FF:FF:FF:FF:FF'), otra)
+        self.assertEqual(indice_redes.buscar('ESCUELA_WIFI', None), sala)
+        self.assertIsNone(indice_redes.buscar('OTRA', 'FF:FF:FF:FF:FF:FF'))
+
+
+class RevalidacionTests(AsistenciaTestBase):
+    """Recalcular valido y distancia_metros al mover un perímetro."""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('entrada')
+        self.asistencia = Asistencia.objects.get()
+        self.perimetro = Perimetro.objects.get()
+
+    def mover(self):
+        # ~200 m al norte, sin pasar por la vista: la entrada queda fuera
+        Perimetro.objects.filter(id=self.perimetro.id).update(latitud='20.661500')
+        self.perimetro.refresh_from_db()
+
+    def test_distancias_como_esta_dentro(self):
+        lats = np.array([20.659698, 20.659700, 20.660500, 20.661000, 20.650000, 21.0])
+        lngs = np.array([-103.349609, -103.349600, -103.349000, -103.350500, -103.360000, -103.0])
+        distancias = revalidacion.distancias_haversine(
+            float(self.perimetro.latitud), float(self.perimetro.longitud), lats, lngs,
+        )
+        for lat, lng, distancia in zip(lats, lngs, distancias):
+            with self.subTest(lat=lat, lng=lng):
+                dentro, esperada = self.perimetro.esta_dentro(lat, lng)
+                self.assertAlmostEqual(distancia, esperada, places=2)
+                self.assertEqual(distancia <= self.perimetro.radio_metros, dentro)
+
+    def test_dry_run_solo_cuenta(self):
+        self.mover()
+        resultado = revalidacion.revalidar_perimetro(self.perimetro, dry_run=True)
+
+        self.assertEqual(
+            {k: resultado[k] for k in ('revisados', 'actualizados', 'a_valido', 'a_invalido')},
+            {'revisados': 1, 'actualizados': 1, 'a_valido': 0, 'a_invalido': 1},
+        )
+        self.asistencia.refresh_from_db()
+        self.assertTrue(self.asistencia.valido)
+
+    def test_escribe_y_refresca_resumen_y_marcas(self):
+        fecha = self.asistencia.fecha_local
+        antes = model_to_dict(ResumenDiario.objects.get(usuario=self.maestro, fecha=fecha))
+        alcances = sorted(marcas.dias([(self.maestro.id, fecha)]))
+        tokens = marcas.tokens(alcances)
+        self.assertIsNotNone(estado_hoy.obtener(self.maestro.id, fecha))
+
+        self.mover()
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = revalidacion.revalidar_perimetro(self.perimetro, tamano_bloque=1)
+        self.assertEqual((resultado['actualizados'], resultado['a_invalido']), (1, 1))
+
+        self.asistencia.refresh_from_db()
+        self.assertFalse(self.asistencia.valido)
+        self.assertEqual(
+            self.asistencia.distancia_metros,
+            self.perimetro.esta_dentro(self.asistencia.latitud_real, self.asistencia.longitud_real)[1],
+        )
+        # El resumen ya es el que resultaría de recalcularlo desde cero
+        despues = model_to_dict(ResumenDiario.objects.get(usuario=self.maestro, fecha=fecha))
+        self.assertNotEqual(despues, antes)
+        resumen.recalcular([(self.maestro.id, fecha)])
+        self.assertEqual(model_to_dict(ResumenDiario.objects.get(usuario=self.maestro, fecha=fecha)), despues)
+        for alcance, anterior, actual in zip(alcances, tokens, marcas.tokens(alcances)):
+            with self.subTest(alcance=alcance):
+                self.assertNotEqual(actual, anterior)
+        self.assertIsNone(estado_hoy.obtener(self.maestro.id, fecha))
+
+        # Otra pasada no encuentra nada que cambiar
+        self.assertEqual(revalidacion.revalidar_perimetro(self.perimetro)['actualizados'], 0)
+
+    def test_patch_revalida_despues_de_responder(self):
+        admin = Usuario.objects.create(
+            nombre='Admin', correo='admin@escuela.com', rol=Rol.objects.create(nombre=Rol.Nombre.ADMINISTRADOR),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(admin)["access"]}')
+        url = f'/api/asistencia/perimetros/{self.perimetro.id}/'
+
+        with mock.patch.object(revalidacion, '_enviar') as enviar:
+            # Sin cambiar la geometría no hay nada que revalidar
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.patch(url, {'nombre': 'Campus'}, format='json').status_code, 200)
+            enviar.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(url, {'latitud': '20.661500'}, format='json')
+                self.assertEqual(response.status_code, 200)
+                # Dentro del request no se revalida nada
+                enviar.assert_not_called()
+                self.assertTrue(Asistencia.objects.get().valido)
+            enviar.assert_called_once_with(self.perimetro.id)
+
+        # Lo que corre el hilo; close_all cerraría la conexión de la prueba
+        with mock.patch.object(revalidacion.connections, 'close_all'):
+            revalidacion._ejecutar(self.perimetro.id)
+        self.assertFalse(Asistencia.objects.get().valido)
+
+
+@override_settings(CACHE_UN_SOLO_PROCESO=False)
+class CacheLocalTests(AsistenciaTestBase):
+    """Con una cache local al proceso (locmem y varios workers) nada se sirve viejo."""
+
+    def test_chequeo_de_arranque(self):
+        self.assertEqual([aviso.id for aviso in cache_compartida.revisar()], ['locations.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(cache_compartida.revisar(), [])
+
+    def test_indices_se_reconstruyen(self):
+        self.assertIsNotNone(indice_redes.buscar('ESCUELA_WIFI', 'aa:bb:cc:dd:ee:01'))
+        # Otro worker desactiva la red: su invalidar() no llega a este proceso
+        RedAutorizada.objects.update(activo=False)
+        vencido = reloj.monotonic() + indice_redes.intervalo_verificacion
+        with mock.patch('apps.locations.indices.time.monotonic', return_value=vencido):
+            self.assertIsNone(indice_redes.buscar('ESCUELA_WIFI', 'aa:bb:cc:dd:ee:01'))
+
+    def test_sin_etag_ni_cache_de_reportes(self):
+        response = self.client.get('/api/asistencia/redes-activas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+        supervisor = Usuario.objects.create(
+            nombre='Ana Supervisora', correo='supervisor@escuela.com',
+            rol=Rol.objects.create(nombre=Rol.Nombre.SUPERVISOR),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(supervisor)["access"]}')
+        with tempfile.TemporaryDirectory() as directorio, override_settings(MEDIA_ROOT=directorio):
+            for _ in range(2):
+                # Autenticación, totales y filas: se genera cada vez y no se guarda
+                with self.assertNumQueries(3):
+                    response = self.client.get('/api/reportes/asistencia/', {'fecha_inicio': '2026-03-01'})
+                    self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            self.assertFalse(trabajos.ruta(trabajos.DIRECTORIO).exists())
+            self.assertNotEqual(trabajos.huella('asistencia', {}), trabajos.huella('asistencia', {}))
+
+    def test_estado_hoy_sin_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('entrada')
+        # La copia de otro worker, de antes del registro, no se usa
+        cache.set(estado_hoy.clave(self.maestro.id, AHORA.date()), estado_hoy.vacio())
+        response = self.client.get('/api/asistencia/estado-hoy/')
+        self.assertTrue(response.data['entrada_registrada'])
+
+    def test_horario_sin_cache(self):
+        # Otro worker borró el horario: aquí quedó la versión compilada anterior
+        semana = horarios.horario_semanal(self.maestro.id)
+        Horario.objects.filter(usuario=self.maestro).delete()
+        cache.set(horarios.clave(self.maestro.id), semana)
+        self.assertIsNone(horarios.horario_del_dia(self.maestro.id, AHORA.date()))
+
+
+class ValoresTests(AsistenciaTestBase):
+    """La serialización desde .values() produce el mismo JSON que los serializers."""
+
+    def test_mismo_json_que_los_serializers(self):
+        self.registrar('entrada')
+        Asistencia.objects.create(
+            usuario=self.maestro, perimetro=Perimetro.objects.get(), tipo=Asistencia.Tipo.SALIDA,
+            latitud_real='20.7', longitud_real='-103.349609', distancia_metros=1234.5,
+            fecha_hora=AHORA.replace(hour=15, microsecond=123456), id_provisional='abc',
+        )
+        asistencias = Asistencia.objects.order_by('id')
+        incidencias = Incidencia.objects.order_by('id')
+        self.assertEqual(incidencias.count(), 1)
+
+        render = JSONRenderer().render
+        self.assertEqual(
+            render(valores.asistencias(valores.consulta_asistencias(asistencias))),
+            render(AsistenciaSerializer(asistencias, many=True).data),
+        )
+        self.assertEqual(
+            render(valores.incidencias(valores.consulta_incidencias(incidencias))),
+            render(IncidenciaSerializer(incidencias, many=True).data),
+        )
+
+
+class HistorialPaginadoTests(AsistenciaTestBase):
+    """?paginacion=cursor en el historial, con los totales del rango en SQL."""
+
+    def setUp(self):
+        super().setUp()
+        perimetro, red = Perimetro.objects.get(), RedAutorizada.objects.get()
+        marcados = [
+            # Lunes: 20 min tarde y salida temprana; lunes: 10 min antes; martes: sin horario
+            ('2026-02-02 07:20', 'entrada'), ('2026-02-02 14:00', 'salida'),
+            ('2026-02-09 06:50', 'entrada'), ('2026-02-09 14:40', 'salida'),
+            ('2026-02-10 08:00', 'entrada'),
+        ]
+        Asistencia.objects.bulk_create([
+            Asistencia(
+                usuario=self.maestro, perimetro=perimetro, red_autorizada=red, tipo=tipo, valido=True,
+                latitud_real='20.659698', longitud_real='-103.349609',
+                fecha_hora=timezone.make_aware(datetime.fromisoformat(fecha_hora)),
+            )
+            for fecha_hora, tipo in marcados
+        ])
+        lunes = datetime(2026, 2, 2).date()
+        Incidencia.objects.bulk_create([
+            Incidencia(usuario=self.maestro, tipo=Incidencia.Tipo.RETARDO, fecha=lunes),
+            Incidencia(usuario=self.maestro, tipo=Incidencia.Tipo.SALIDA_TEMPRANA, fecha=lunes),
+        ])
+        resumen.recalcular(
+            (self.maestro.id, datetime.fromisoformat(fecha_hora).date()) for fecha_hora, _ in marcados
+        )
+
+    def test_paginas_por_llave_y_resumen_del_rango(self):
+        esperados = list(Asistencia.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        url = '/api/asistencia/historial/?paginacion=cursor&limite=2&fecha_inicio=2026-02-01&fecha_fin=2026-02-28'
+
+        # Autenticación, la página y los totales; sin una consulta por red o perímetro
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['resumen'], {
+            'dias_trabajados': 3,
+            'retardos': 1,
+            'salidas_tempranas': 1,
+            'llegada_promedio_minutos': 5.0,
+        })
+        self.assertEqual(response.data['results'][0]['red_nombre'], 'Sala de maestros')
+
+        vistos = [a['id'] for a in response.data['results']]
+        while response.data['next']:
+            with self.assertNumQueries(2):
+                response = self.client.get(response.data['next'])
+            self.assertNotIn('resumen', response.data)
+            vistos += [a['id'] for a in response.data['results']]
+        self.assertEqual(vistos, esperados)
+
+        # Sin paginación sigue la lista completa
+        self.assertEqual(len(self.client.get('/api/asistencia/historial/').data), 5)
+
+
+class ArchivoTests(AsistenciaTestBase):
+    """Archivo de meses viejos (sin particiones en SQLite: se borran las filas)."""
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(ASISTENCIA_ARCHIVO_DIR=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        perimetro = Perimetro.objects.get()
+        Asistencia.objects.bulk_create([
+            Asistencia(
+                usuario=self.maestro, perimetro=perimetro, tipo=tipo, valido=True,
+                latitud_real='20.659698', longitud_real='-103.349609',
+                fecha_hora=timezone.make_aware(datetime(2026, 1, 5, hora)),
+                red_autorizada=RedAutorizada.objects.get(),
+            )
+            for tipo, hora in ((Asistencia.Tipo.ENTRADA, 7), (Asistencia.Tipo.SALIDA, 15))
+        ])
+        resumen.recalcular([(self.maestro.id, datetime(2026, 1, 5).date())])
+
+    def test_historial_lee_del_archivo_lo_archivado(self):
+        url = '/api/asistencia/historial/?fecha_inicio=2026-01-01&fecha_fin=2026-01-31'
+        antes = self.client.get(url).json()
+
+        salida = StringIO()
+        call_command('archivar_asistencias', '--antes-de', '2026-02', stdout=salida)
+        self.assertIn('2026-01: 2 asistencias', salida.getvalue())
+
+        self.assertFalse(Asistencia.objects.exists())
+        self.assertIsNone(ResumenDiario.objects.get().entrada_id)
+        self.assertEqual(self.client.get(url).json(), antes)
+        with self.assertRaises(FileExistsError):
+            archivo.archivar(datetime(2026, 1, 1).date())
+
+    def recorrer(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [a['id'] for a in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_historial_sin_rango_y_por_llave_incluye_lo_archivado(self):
+        # Un mes más reciente y uno más viejo que siguen en la base de datos
+        perimetro = Perimetro.objects.get()
+        Asistencia.objects.bulk_create([
+            Asistencia(
+                usuario=self.maestro, perimetro=perimetro, tipo=Asistencia.Tipo.ENTRADA, valido=True,
+                latitud_real='20.659698', longitud_real='-103.349609',
+                fecha_hora=timezone.make_aware(fecha_hora),
+            )
+            for fecha_hora in (datetime(2026, 2, 2, 7), datetime(2026, 2, 3, 7), datetime(2025, 12, 1, 7))
+        ])
+        esperados = list(Asistencia.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        completa = self.client.get('/api/asistencia/historial/').json()
+
+        archivo.archivar(datetime(2026, 1, 1).date())
+        self.assertEqual(Asistencia.objects.count(), 3)
+
+        # Sin fecha_inicio también se lee el archivo
+        self.assertEqual(self.client.get('/api/asistencia/historial/').json(), completa)
+        for limite in (1, 2, 5):
+            with self.subTest(limite=limite):
+                self.assertEqual(
+                    self.recorrer(f'/api/asistencia/historial/?paginacion=cursor&limite={limite}'), esperados,
+                )
+        # Con rango, solo lo archivado del rango
+        self.assertEqual(
+            self.recorrer('/api/asistencia/historial/?paginacion=cursor&limite=1&fecha_fin=2026-01-31'),
+            esperados[2:],
+        )
+
+    def test_archivo_se_lee_por_meses_solo_lo_necesario(self):
+        perimetro = Perimetro.objects.get()
+        otro = Usuario.objects.create(nombre='Ana López', correo='ana@escuela.com', rol=self.maestro.rol)
+        Asistencia.objects.bulk_create([
+            Asistencia(
+                usuario=usuario, perimetro=perimetro, tipo=Asistencia.Tipo.ENTRADA, valido=True,
+                latitud_real='20.659698', longitud_real='-103.349609',
+                fecha_hora=timezone.make_aware(fecha_hora),
+            )
+            for usuario, fecha_hora in ((self.maestro, datetime(2025, 12, 1, 7)), (otro, datetime(2025, 11, 3, 7)))
+        ])
+        for mes in (11, 12):
+            archivo.archivar(datetime(2025, mes, 1).date())
+        archivo.archivar(datetime(2026, 1, 1).date())
+        enero, diciembre = datetime(2026, 1, 1).date(), datetime(2025, 12, 1).date()
+
+        # Página de 1: con enero (2 filas) basta, diciembre no se abre
+        with mock.patch.object(archivo, '_leer', wraps=archivo._leer) as leer:
+            response = self.client.get('/api/asistencia/historial/?paginacion=cursor&limite=1')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual([c.args[0] for c in leer.call_args_list], [enero])
+
+        # Todo el historial: noviembre no tiene filas del maestro según su índice
+        with mock.patch.object(archivo, '_leer', wraps=archivo._leer) as leer:
+            self.assertEqual(len(self.client.get('/api/asistencia/historial/').json()), 3)
+        self.assertEqual([c.args[0] for c in leer.call_args_list], [enero, diciembre])
+
+    def test_particiones_son_no_op_fuera_de_postgresql(self):
+        self.assertFalse(particiones.disponible())
+        salida = StringIO()
+        call_command('crear_particiones_asistencia', stdout=salida)
+        self.assertIn('nada que hacer', salida.getvalue())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Solo PostgreSQL particiona la tabla')
+    def test_crear_particion_con_filas_en_default(self):
+        # Un mes sin partición propia: la fila cae en DEFAULT
+        self.assertTrue(particiones.disponible())
+        junio = datetime(2031, 6, 1).date()
+        Asistencia.objects.create(
+            usuario=self.maestro, perimetro=Perimetro.objects.get(), tipo=Asistencia.Tipo.ENTRADA,
+            latitud_real='20.659698', longitud_real='-103.349609',
+            fecha_hora=timezone.make_aware(datetime(2031, 6, 10, 7)),
+        )
+        self.assertEqual(particiones.crear(junio, 1), [(particiones.nombre(junio), 1)])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {particiones.nombre(junio)}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute(f'SELECT count(*) FROM {particiones.DEFAULT}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(Asistencia.objects.filter(fecha_local=datetime(2031, 6, 10).date()).count(), 1)
+
+
+class PanelSupervisionTests(AsistenciaTestBase):
+    """GET /api/asistencia/panel/ con un número fijo de consultas."""
+
+    def setUp(self):
+        super().setUp()
+        supervisor = Usuario.objects.create(
+            nombre='Ana Supervisora', correo='supervisor@escuela.com',
+            rol=Rol.objects.create(nombre=Rol.Nombre.SUPERVISOR),
+        )
+        self.supervisor = APIClient()
+        self.supervisor.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(supervisor)["access"]}')
+
+    def panel(self, **params):
+        return self.supervisor.get('/api/asistencia/panel/', {'fecha': '2026-03-02', **params})
+
+    def test_consultas_no_crecen_con_los_maestros(self):
+        self.registrar('entrada')
+        Usuario.objects.bulk_create([
+            Usuario(nombre=f'Maestro {i}', correo=f'maestro{i}@escuela.com', rol=self.maestro.rol)
+            for i in range(20)
+        ])
+
+        with self.assertNumQueries(4):
+            response = self.panel()
+
+        self.assertEqual(response.data['total_maestros'], 21)
+        fila = next(m for m in response.data['maestros'] if m['maestro']['id'] == self.maestro.id)
+        self.assertEqual(fila['estado'], 'en_turno')
+        self.assertEqual(fila['entrada']['usuario_nombre'], 'Juan Pérez')
+        self.assertEqual([i['tipo'] for i in fila['incidencias']], [Incidencia.Tipo.RETARDO])
+
+    def test_filtros_y_paginacion_por_llave(self):
+        self.registrar('entrada')
+        Usuario.objects.bulk_create([
+            Usuario(nombre=f'Maestro {i}', correo=f'maestro{i}@escuela.com', rol=self.maestro.rol)
+            for i in range(5)
+        ])
+
+        response = self.panel(estado='en_turno')
+        self.assertEqual([m['maestro']['id'] for m in response.data['maestros']], [self.maestro.id])
+
+        vistos, cursor = [], None
+        while True:
+            response = self.panel(nombre='maestro', limite=2, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.data['total_maestros'], 5)
+            vistos += [m['maestro']['nombre'] for m in response.data['maestros']]
+            cursor = response.data['siguiente']
+            if not cursor:
+                break
+        self.assertEqual(vistos, [f'Maestro {i}' for i in range(5)])
+
+        self.assertEqual(self.panel(estado='ausente').status_code, 400)
+        self.assertEqual(self.panel(limite=2, cursor='no-es-cursor').status_code, 400)
+
+    def test_stream_devuelve_el_mismo_json(self):
+        self.registrar('entrada')
+        completo = self.panel().json()
+
+        response = self.panel(stream=1)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), completo)
+
+
+
+class ReportesPDFTests(AsistenciaTestBase):
+    """Reportes PDF: filas por bloques, totales en SQL y trabajos en segundo plano."""
+
+    PERIODO = {'fecha_inicio': '2026-03-01', 'fecha_fin': '2026-03-31'}
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        # Sin pool de hilos: en la prueba los trabajos se procesan a mano
+        ajuste = override_settings(MEDIA_ROOT=directorio.name, REPORTES_TRABAJADORES=0)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('entrada')
+        supervisor = Usuario.objects.create(
+            nombre='Ana Supervisora', correo='supervisor@escuela.com',
+            rol=Rol.objects.create(nombre=Rol.Nombre.SUPERVISOR),
+        )
+        self.supervisor = APIClient()
+        self.supervisor.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(supervisor)["access"]}')
+
+    def test_reporte_sin_cargar_el_rango(self):
+        # Autenticación, totales y el recorrido de las filas
+        with self.assertNumQueries(3):
+            response = self.supervisor.get('/api/reportes/asistencia/', self.PERIODO)
+            contenido = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(contenido))
+        self.assertEqual(
+            resumen.totales_reporte(ResumenDiario.objects.all()),
+            {'dias': 1, 'retardos': 1, 'minutos_retardo': 120, 'fuera_de_perimetro': 0},
+        )
+
+        # Mismo período sin cambios: el PDF guardado, sin consultar los datos
+        with self.assertNumQueries(1):
+            repetido = self.supervisor.get('/api/reportes/asistencia/', self.PERIODO)
+            self.assertEqual(b''.join(repetido.streaming_content), contenido)
+
+    def test_trabajo_en_segundo_plano_y_cache_por_huella(self):
+        solicitud = {'tipo': 'asistencia', **self.PERIODO}
+        response = self.supervisor.post('/api/reportes/trabajos/', solicitud, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data['estado'], TrabajoReporte.Estado.PENDIENTE)
+        url = f'/api/reportes/trabajos/{response.data["id"]}/'
+        self.assertEqual(self.supervisor.get(url + 'descarga/').status_code, 409)
+
+        # Una solicitud igual en curso no crea otro trabajo
+        otra = self.supervisor.post('/api/reportes/trabajos/', solicitud, format='json')
+        self.assertEqual(otra.data['id'], response.data['id'])
+
+        self.assertEqual(trabajos.procesar_pendientes(), 1)
+        estado = self.supervisor.get(url).data
+        self.assertEqual(estado['estado'], TrabajoReporte.Estado.LISTO)
+        descarga = self.supervisor.get(url + 'descarga/')
+        self.assertEqual(descarga.status_code, 200)
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'%PDF'))
+
+        # Sin cambios en el período: listo de inmediato, mismo archivo
+        repetida = self.supervisor.post('/api/reportes/trabajos/', solicitud, format='json')
+        self.assertEqual(repetida.data['estado'], TrabajoReporte.Estado.LISTO)
+        self.assertEqual(
+            TrabajoReporte.objects.get(id=repetida.data['id']).archivo,
+            TrabajoReporte.objects.get(id=response.data['id']).archivo,
+        )
+
+        # Un registro en el período avanza la marca del día: se genera de nuevo
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('salida')
+        nueva = self.supervisor.post('/api/reportes/trabajos/', solicitud, format='json')
+        self.assertEqual(nueva.data['estado'], TrabajoReporte.Estado.PENDIENTE)
+
+    def test_huella_lee_una_marca_por_mes(self):
+        parametros = {'usuario': None, 'fecha_inicio': '2024-01-15', 'fecha_fin': '2026-03-31'}
+        with mock.patch.object(marcas, 'tokens', wraps=marcas.tokens) as leer:
+            antes = trabajos.huella('asistencia', parametros)
+        # Maestros y los 27 meses del período, no 807 días
+        self.assertEqual(len(leer.call_args.args[0]), 1 + 27)
+        self.assertIn(marcas.mes(AHORA.date()), leer.call_args.args[0])
+
+        self.assertEqual(trabajos.huella('asistencia', parametros), antes)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('salida')
+        self.assertNotEqual(trabajos.huella('asistencia', parametros), antes)
+
+    def test_filtros_invalidos(self):
+        response = self.supervisor.get('/api/reportes/asistencia/', {'fecha_inicio': '2026-13-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.supervisor.post('/api/reportes/trabajos/', {
+            'tipo': 'asistencia', 'fecha_inicio': '2026-03-31', 'fecha_fin': '2026-03-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_paginas_de_tamano_fijo(self):
+        fila = {
+            'usuario__nombre': 'Juan Pérez', 'fecha': AHORA.date(),
+            'entrada__fecha_hora': AHORA, 'entrada__valido': True,
+            'salida__fecha_hora': None, 'salida__valido': None,
+            'minutos_retardo': 0, 'minutos_salida_temprana': 0, 'estado': ResumenDiario.Estado.EN_TURNO,
+        }
+        totales = {'dias': 500, 'retardos': 0, 'minutos_retardo': 0, 'fuera_de_perimetro': 0}
+        primera, siguientes = reportes._filas_por_pagina(
+            [reportes.Spacer(1, 100)], reportes._fila_asistencia(1, fila),
+        )
+        self.assertGreater(siguientes, primera)
+
+        archivo = reportes.generar_reporte_asistencia((fila for _ in range(500)), totales)
+        paginas = len(re.findall(rb'/Type /Page\b(?!s)', archivo.read()))
+
+        # Título, tabla repartida por páginas y el pie de totales
+        self.assertGreater(paginas, 500 // siguientes)
+        self.assertLessEqual(paginas, 500 // siguientes + 2)
+
+    def test_bloques_unidos_con_pypdf(self):
+        fila = {
+            'usuario__nombre': 'Juan Pérez', 'fecha': AHORA.date(),
+            'entrada__fecha_hora': AHORA, 'entrada__valido': True,
+            'salida__fecha_hora': None, 'salida__valido': None,
+            'minutos_retardo': 0, 'minutos_salida_temprana': 0, 'estado': ResumenDiario.Estado.EN_TURNO,
+        }
+        totales = {'dias': 400, 'retardos': 0, 'minutos_retardo': 0, 'fuera_de_perimetro': 0}
+
+        def paginas(por_bloque):
+            with mock.patch.object(reportes, 'PAGINAS_POR_BLOQUE', por_bloque):
+                archivo = reportes.generar_reporte_asistencia((dict(fila) for _ in range(400)), totales)
+            with archivo:
+                return [p.extract_text() for p in PdfReader(archivo, strict=True).pages]
+
+        # Bloques de 2 páginas: las mismas páginas, en orden, que un solo bloque
+        unido, entero = paginas(2), paginas(10 ** 6)
+        self.assertGreater(len(unido), 4)
+        self.assertEqual(unido, entero)
+        self.assertIn('Días registrados: 400', unido[-1])
+
+    @override_settings(REPORTES_PROCESOS=1)
+    def test_reporte_por_maestro(self):
+        otra = Usuario.objects.create(nombre='Ana López', correo='ana@escuela.com', rol=self.maestro.rol)
+        response = self.supervisor.post(
+            '/api/reportes/trabajos/', {'tipo': 'por_maestro', **self.PERIODO}, format='json',
+        )
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data['parametros']['salida'], 'zip')
+        self.assertEqual(trabajos.procesar_pendientes(), 1)
+
+        # Un PDF por maestro activo, aunque no tenga días registrados; sin el supervisor
+        descarga = self.supervisor.get(f'/api/reportes/trabajos/{response.data["id"]}/descarga/')
+        self.assertEqual(descarga['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(descarga.streaming_content))) as zip_:
+            self.assertEqual(zip_.namelist(), [f'ana-lopez_{otra.id}.pdf', f'juan-perez_{self.maestro.id}.pdf'])
+            self.assertTrue(zip_.read(f'juan-perez_{self.maestro.id}.pdf').startswith(b'%PDF'))
+
+        # Un solo PDF con un marcador por maestro
+        destino = BytesIO()
+        parametros = {'fecha_inicio': '2026-03-01', 'fecha_fin': '2026-03-31', 'usuario': None}
+        self.assertEqual(por_maestro.generar(parametros, destino, 'pdf'), (2, 2))
+        lector = PdfReader(destino)
+        self.assertEqual([marcador.title for marcador in lector.outline], ['Ana López', 'Juan Pérez'])
+        self.assertEqual(lector.get_destination_page_number(lector.outline[1]), 1)
+
+        # Sin exportación CSV/XLSX para este tipo
+        self.assertEqual(self.supervisor.get('/api/reportes/exportar/por_maestro/').status_code, 404)
+
+    def test_resumen_por_maestro(self):
+        otra = Usuario.objects.create(nombre='Ana López', correo='ana@escuela.com', rol=self.maestro.rol)
+        with self.captureOnCommitCallbacks(execute=True):
+            Incidencia.objects.create(
+                usuario=self.maestro, tipo=Incidencia.Tipo.FALTA, fecha=AHORA.date() + timedelta(days=1),
+            )
+            Asistencia.objects.create(
+                usuario=self.maestro, perimetro=Perimetro.objects.get(), tipo=Asistencia.Tipo.ENTRADA,
+                latitud_real='20.670000', longitud_real='-103.349600', distancia_metros=1144, valido=False,
+                fecha_hora=AHORA + timedelta(hours=1),
+            )
+
+        # Autenticación y la consulta agrupada: una fila por maestro, sin importar los registros
+        with self.assertNumQueries(2):
+            response = self.supervisor.get('/api/reportes/resumen/', self.PERIODO)
+        self.assertEqual(response.status_code, 200)
+        ana, juan = response.data
+        self.assertEqual(ana['id'], otra.id)
+        self.assertEqual(ana['dias_presentes'] + ana['faltas'] + ana['registros_invalidos'], 0)
+        esperado = {'dias_presentes': 1, 'retardos': 1, 'minutos_retardo': 120, 'faltas': 1, 'registros_invalidos': 1}
+        self.assertEqual({campo: juan[campo] for campo in esperado}, esperado)
+
+        pdf = self.supervisor.get('/api/reportes/resumen/pdf/', self.PERIODO)
+        self.assertEqual(pdf['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(pdf.streaming_content).startswith(b'%PDF'))
+        exportado = self.supervisor.get('/api/reportes/exportar/resumen/', self.PERIODO)
+        encabezado, *filas = csv.reader(StringIO(b''.join(exportado.streaming_content).decode('utf-8-sig')))
+        self.assertEqual(encabezado[:3], ['usuario', 'usuario_nombre', 'usuario_correo'])
+        self.assertEqual([fila[1] for fila in filas], ['Ana López', 'Juan Pérez'])
+
+
+class ExportacionTests(AsistenciaTestBase):
+    """GET /api/reportes/exportar/<tipo>/: CSV y XLSX en streaming."""
+
+    def setUp(self):
+        super().setUp()
+        self.registrar('entrada')
+        Incidencia.objects.create(
+            usuario=self.maestro, tipo=Incidencia.Tipo.JUSTIFICACION, fecha=AHORA.date(),
+            descripcion='Cita médica <IMSS> & trámite',
+        )
+        rol = Rol.objects.create(nombre=Rol.Nombre.SUPERVISOR)
+        supervisor = Usuario.objects.create(nombre='Ana Supervisora', correo='supervisor@escuela.com', rol=rol)
+        self.cabeceras = {'Authorization': f'Bearer {generar_tokens(supervisor)["access"]}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.cabeceras['Authorization'])
+
+    def test_csv_en_streaming(self):
+        # Autenticación y el cursor de las filas
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reportes/exportar/asistencia/', {'fecha_inicio': '2026-03-01'})
+            contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="asistencia_2026-03-01.csv"')
+        encabezado, fila = list(csv.reader(StringIO(contenido)))
+        datos = dict(zip(encabezado, fila))
+        self.assertEqual(datos['usuario_nombre'], 'Juan Pérez')
+        self.assertEqual(datos['fecha'], '2026-03-02')
+        self.assertEqual(datos['fecha_hora'], '2026-03-02T09:00:00-06:00')
+        self.assertEqual(datos['red_nombre'], 'Sala de maestros')
+
+        vacio = self.client.get('/api/reportes/exportar/asistencia/', {'fecha_inicio': '2026-04-01'})
+        self.assertEqual(len(list(csv.reader(StringIO(b''.join(vacio.streaming_content).decode('utf-8-sig'))))), 1)
+
+    def test_xlsx_es_un_libro_valido(self):
+        response = self.client.get('/api/reportes/exportar/incidencias/', {'formato': 'xlsx'})
+        libro = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+        self.assertIsNone(libro.testzip())
+        ns = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        filas = [
+            [''.join(t.text or '' for t in c.iter(f'{{{ns["s"]}}}t')) or c.findtext('s:v', '', ns) for c in fila]
+            for fila in hoja.iterfind('s:sheetData/s:row', ns)
+        ]
+        self.assertEqual(len(filas), 3)
+        datos = {fila[5]: dict(zip(filas[0], fila)) for fila in filas[1:]}
+        self.assertEqual(datos['justificacion']['descripcion'], 'Cita médica <IMSS> & trámite')
+        self.assertEqual(datos['retardo']['usuario'], str(self.maestro.id))
+
+    def test_formato_invalido(self):
+        response = self.client.get('/api/reportes/exportar/asistencia/', {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('formato', response.json())
+
+    @override_settings(ROOT_URLCONF='config.urls_asgi')
+    async def test_asgi_con_orm_async(self):
+        response = await self.async_client.get(
+            '/api/reportes/exportar/incidencias/', {'fecha_fin': '2026-03-31'}, headers=self.cabeceras,
+        )
+        self.assertEqual(response.status_code, 200)
+        contenido = b''.join([parte async for parte in response.streaming_content]).decode('utf-8-sig')
+        self.assertEqual(len(list(csv.reader(StringIO(contenido)))), 3)
+
+
+class GetCondicionalTests(AsistenciaTestBase):
+    """ETag fuerte y 304 por marcas de cambio (common/marcas.py)."""
+
+    def setUp(self):
+        super().setUp()
+        supervisor = Usuario.objects.create(
+            nombre='Ana Supervisora', correo='supervisor@escuela.com',
+            rol=Rol.objects.create(nombre=Rol.Nombre.SUPERVISOR),
+        )
+        self.supervisor = APIClient()
+        self.supervisor.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(supervisor)["access"]}')
+
+    def test_panel_responde_304_hasta_que_cambia_el_dia(self):
+        url = '/api/asistencia/panel/?fecha=2026-03-02'
+        etag = self.supervisor.get(url)['ETag']
+
+        # Solo la consulta de autenticación: la vista no se ejecuta
+        with self.assertNumQueries(1):
+            response = self.supervisor.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Otro día y otro filtro tienen su propio ETag
+        self.assertNotEqual(self.supervisor.get('/api/asistencia/panel/?fecha=2026-03-03')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar('entrada')
+        response = self.supervisor.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['maestros'][0]['estado'], 'en_turno')
+
+    def test_redes_historial_y_horarios(self):
+        redes = self.client.get('/api/asistencia/redes-activas/')['ETag']
+        historial = self.client.get('/api/asistencia/historial/')['ETag']
+        horario = self.client.get('/api/horarios/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RedAutorizada.objects.update(nombre='Biblioteca')
+            RedAutorizada.objects.get().save()
+        self.assertEqual(self.client.get('/api/asistencia/redes-activas/', HTTP_IF_NONE_MATCH=redes).status_code, 200)
+        # La red aparece en el historial (red_nombre)
+        self.assertEqual(self.client.get('/api/asistencia/historial/', HTTP_IF_NONE_MATCH=historial).status_code, 200)
+        self.assertEqual(self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=horario).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Horario.objects.filter(usuario=self.maestro).get().save()
+        self.assertEqual(self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=horario).status_code, 200)
+
+
+
+class PaginacionPorLlaveTests(AsistenciaTestBase):
+    """?paginacion=cursor en el listado de asistencias: sin COUNT ni OFFSET."""
+
+    def setUp(self):
+        super().setUp()
+        admin = Usuario.objects.create(
+            nombre='Admin', correo='admin@escuela.com', rol=Rol.objects.create(nombre=Rol.Nombre.ADMINISTRADOR),
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generar_tokens(admin)["access"]}')
+        # Varias asistencias con la misma fecha_hora: el id desempata
+        perimetro = Perimetro.objects.get()
+        Asistencia.objects.bulk_create([
+            Asistencia(
+                usuario=self.maestro, perimetro=perimetro, tipo=Asistencia.Tipo.ENTRADA, valido=i % 3 != 0,
+                latitud_real='20.659698', longitud_real='-103.349609',
+                fecha_hora=AHORA - timedelta(days=i // 2),
+            )
+            for i in range(7)
+        ])
+
+    def test_recorre_todo_en_orden_con_el_mismo_costo_por_pagina(self):
+        esperados = list(
+            Asistencia.objects.filter(valido=True).order_by('-fecha_hora', '-id').values_list('id', flat=True)
+        )
+        url = '/api/asistencia/registros/?paginacion=cursor&limite=2&valido=true'
+        vistos = []
+        while url:
+            # Autenticación + la página, sea la primera o la última
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertNotIn('total_aproximado', response.data)
+            vistos += [a['id'] for a in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(vistos, esperados)
+
+        response = self.client.get('/api/asistencia/registros/?paginacion=cursor&valido=true&total=aproximado')
+        self.assertEqual(response.data['total_aproximado'], len(esperados))
+        self.assertEqual(self.client.get('/api/asistencia/registros/?cursor=no-es-cursor').status_code, 400)
+        # Sin ?paginacion=cursor sigue la paginación por número de página
+        self.assertEqual(self.client.get('/api/asistencia/registros/').data['count'], 7)
+
+
+@override_settings(ROOT_URLCONF='config.urls_asgi')
+class VistasAsyncTests(AsistenciaTestBase):
+    """Las vistas ASGI responden igual que las DRF."""
+
+    def setUp(self):
+        super().setUp()
+        self.cabeceras = {'Authorization': f'Bearer {generar_tokens(self.maestro)["access"]}'}
+
+    def registrar_async(self, datos):
+        return self.async_client.post(
+            '/api/asistencia/registrar/', datos,
+            content_type='application/json', headers=self.cabeceras,
+        )
+
+    async def test_registro_y_estado_hoy(self):
+        response = await self.registrar_async({
+            'tipo': 'entrada',
+            'latitud': '20.659700',
+            'longitud': '-103.349600',
+            'ssid': 'ESCUELA_WIFI',
+            'bssid': 'aa:bb:cc:dd:ee:01',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['estado_horario'], 'retardo')
+
+        duplicada = await self.registrar_async({
+            'tipo': 'entrada', 'latitud': '20.659700', 'longitud': '-103.349600',
+            'ssid': 'ESCUELA_WIFI',
+        })
+        self.assertEqual(duplicada.status_code, 400)
+        self.assertIn('non_field_errors', duplicada.json())
+
+        estado = (await self.async_client.get('/api/asistencia/estado-hoy/', headers=self.cabeceras)).json()
+        self.assertTrue(estado['entrada_registrada'])
+        self.assertEqual(estado['entrada']['id'], response.json()['id'])
+
+    async def test_idempotency_key(self):
+        self.cabeceras['Idempotency-Key'] = 'async-1'
+        datos = {'tipo': 'entrada', 'latitud': '20.659700', 'longitud': '-103.349600', 'ssid': 'ESCUELA_WIFI'}
+
+        primera = await self.registrar_async(datos)
+        reintento = await self.registrar_async(datos)
+
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(reintento.json(), primera.json())
+
+    async def test_panel_en_vivo(self):
+        rol = await Rol.objects.acreate(nombre=Rol.Nombre.SUPERVISOR)
+        supervisor = await Usuario.objects.acreate(nombre='Ana Supervisora', correo='sup@escuela.com', rol=rol)
+        response = await self.async_client.get(
+            '/api/asistencia/panel/eventos/',
+            headers={'Authorization': f'Bearer {generar_tokens(supervisor)["access"]}'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        eventos = response.streaming_content
+
+        inicial = await anext(eventos)
+        self.assertTrue(inicial.startswith(b'event: panel\n'))
+        self.assertEqual(json.loads(inicial.split(b'data: ')[1])['total_maestros'], 1)
+
+        # Un marcado confirmado en otro hilo (vista WSGI, on_commit) llega como diferencia
+        respuesta = await self.registrar_async({
+            'tipo': 'entrada', 'latitud': '20.659700', 'longitud': '-103.349600', 'ssid': 'ESCUELA_WIFI',
+        })
+        asistencia = await Asistencia.objects.aget(pk=respuesta.json()['id'])
+        await sync_to_async(difusion.publicar_marcado)(asistencia, respuesta.json())
+
+        marcado = await anext(eventos)
+        self.assertTrue(marcado.startswith(b'event: marcado\n'))
+        datos = json.loads(marcado.split(b'data: ')[1])
+        self.assertEqual((datos['maestro'], datos['estado']), (self.maestro.id, 'en_turno'))
+        await eventos.aclose()
+
+    async def test_sin_token_se_rechaza(self):
+        response = await self.async_client.get('/api/asistencia/redes-activas/')
+
+        self.assertEqual(response.status_code, 403)
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .views import (
-    RegistrarAsistenciaView, HistorialAsistenciaView,
+    RegistrarAsistenciaView, RegistrarLoteView, HistorialAsistenciaView,
     PanelSupervisionView, AsistenciaViewSet,
     PerimetroViewSet, IncidenciaViewSet,
     EstadoAsistenciaHoyView,
@@ -18,6 +18,7 @@ router.register(r'redes', RedAutorizadaViewSet, basename='redes-autorizadas')
 urlpatterns = [
     # Endpoints especiales
     path('registrar/', RegistrarAsistenciaView.as_view(), name='registrar-asistencia'),
+    path('registrar-lote/', RegistrarLoteView.as_view(), name='registrar-lote'),
     path('historial/', HistorialAsistenciaView.as_view(), name='historial-asistencia'),
     path('panel/', PanelSupervisionView.as_view(), name='panel-supervision'),
     path('estado-hoy/', EstadoAsistenciaHoyView.as_view(), name='estado-asistencia-hoy'),
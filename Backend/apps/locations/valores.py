@@ -0,0 +1,86 @@
+"""
+Serialización de solo lectura desde .values(), para listados grandes.
+
+Produce exactamente el JSON de AsistenciaSerializer e IncidenciaSerializer
+(mismos campos, orden y formato) a partir de filas de .values() con los
+nombres ya unidos en la consulta: sin instanciar modelos ni recorrer
+`source='usuario.nombre'` campo por campo, y sin consultas por fila. Los
+valores que DRF formatea (decimales, fechas) pasan por los mismos campos
+de los serializers, así que siguen los ajustes de REST_FRAMEWORK.
+
+Uso: consulta_*(queryset) → se pagina o se recorre → asistencias(filas).
+"""
+from .models import Asistencia, Incidencia
+from .serializers import AsistenciaSerializer, IncidenciaSerializer
+
+CAMPOS_ASISTENCIA = (
+    'id', 'usuario', 'usuario__nombre', 'perimetro', 'perimetro__nombre', 'tipo',
+    'latitud_real', 'longitud_real', 'ssid_conectado', 'bssid_conectado', 'wifi_valido',
+    'red_autorizada', 'red_autorizada__nombre', 'fecha_hora', 'valido', 'distancia_metros',
+    'id_provisional',
+)
+CAMPOS_INCIDENCIA = (
+    'id', 'usuario', 'usuario__nombre', 'tipo', 'fecha', 'descripcion', 'created_at',
+)
+
+TIPOS_ASISTENCIA = dict(Asistencia.Tipo.choices)
+TIPOS_INCIDENCIA = dict(Incidencia.Tipo.choices)
+
+
+def consulta_asistencias(queryset):
+    return queryset.values(*CAMPOS_ASISTENCIA)
+
+
+def consulta_incidencias(queryset):
+    return queryset.values(*CAMPOS_INCIDENCIA)
+
+
+def asistencias(filas):
+    """Filas de consulta_asistencias() → lista con el formato de AsistenciaSerializer."""
+    campos = AsistenciaSerializer().fields
+    decimal = campos['latitud_real'].to_representation
+    fecha_hora = campos['fecha_hora'].to_representation
+    return [
+        {
+            'id': f['id'],
+            'usuario': f['usuario'],
+            'usuario_nombre': f['usuario__nombre'],
+            'perimetro': f['perimetro'],
+            'perimetro_nombre': f['perimetro__nombre'],
+            'tipo': f['tipo'],
+            'tipo_display': TIPOS_ASISTENCIA.get(f['tipo'], f['tipo']),
+            'latitud_real': decimal(f['latitud_real']),
+            'longitud_real': decimal(f['longitud_real']),
+            'ssid_conectado': f['ssid_conectado'],
+            'bssid_conectado': f['bssid_conectado'],
+            'wifi_valido': f['wifi_valido'],
+            'red_autorizada': f['red_autorizada'],
+            # Sin red, el serializer usa su default=''
+            'red_nombre': '' if f['red_autorizada'] is None else f['red_autorizada__nombre'],
+            'fecha_hora': fecha_hora(f['fecha_hora']),
+            'valido': f['valido'],
+            'distancia_metros': f['distancia_metros'],
+            'id_provisional': f['id_provisional'],
+        }
+        for f in filas
+    ]
+
+
+def incidencias(filas):
+    """Filas de consulta_incidencias() → lista con el formato de IncidenciaSerializer."""
+    campos = IncidenciaSerializer().fields
+    fecha = campos['fecha'].to_representation
+    creada = campos['created_at'].to_representation
+    return [
+        {
+            'id': f['id'],
+            'usuario': f['usuario'],
+            'usuario_nombre': f['usuario__nombre'],
+            'tipo': f['tipo'],
+            'tipo_display': TIPOS_INCIDENCIA.get(f['tipo'], f['tipo']),
+            'fecha': fecha(f['fecha']),
+            'descripcion': f['descripcion'],
+            'created_at': creada(f['created_at']),
+        }
+        for f in filas
+    ]
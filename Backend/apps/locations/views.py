@@ -2,26 +2,29 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import date, timedelta, datetime, time
+import heapq
+from datetime import date
+from functools import partial
 
+from common import marcas
+from common.idempotencia import idempotente
+from common.paginacion import PaginacionAsistencias, PaginacionIncidencias
 from common.permissions import EsAdministrador, EsSupervisorOAdmin, EsUsuarioAutenticado
-from apps.users.models import Usuario, Rol, Horario
 
+from . import archivo, estado_hoy, panel, resumen, revalidacion, valores
 from .models import Perimetro, Asistencia, Incidencia, RedAutorizada
+from .registro import (
+    AUTO_SALIDA_HORAS, registrar_asistencia, registrar_lote, registrar_auto_salida,
+    describir_registro,
+)
 from .serializers import (
     PerimetroSerializer, AsistenciaSerializer,
     RegistrarAsistenciaSerializer, IncidenciaSerializer,
-    RedAutorizadaSerializer,
+    RedAutorizadaSerializer, RegistroOfflineSerializer, RegistrarLoteSerializer,
 )
 
-# Minutos de tolerancia para considerar retardo (ej: 15 min después de hora_entrada)
-TOLERANCIA_RETARDO_MIN = 10
-# Minutos antes de hora_salida para considerar salida temprana
-TOLERANCIA_SALIDA_TEMPRANA_MIN = 15
-# Horas después de la entrada para auto-registrar salida
-AUTO_SALIDA_HORAS = 10
-
 
 # ──────────────────────────────────────────────
 # REGISTRO DE ASISTENCIA POR GPS
@@ -33,165 +36,75 @@ class RegistrarAsistenciaView(APIView):
     El maestro envía su lat/lng y tipo (entrada/salida).
     El sistema valida si está dentro del perímetro y compara
     la hora contra el horario asignado para generar incidencias.
+    Presupuesto: una consulta de estado del día + inserción(es) en una transacción.
+    Con el header Idempotency-Key, un reintento recibe la respuesta guardada
+    sin volver a validar ni escribir (ver common/idempotencia.py).
     """
     permission_classes = [EsUsuarioAutenticado]
 
+    @idempotente('registrar')
     def post(self, request):
         serializer = RegistrarAsistenciaSerializer(
             data=request.data,
             context={'usuario': request.usuario},
         )
         serializer.is_valid(raise_exception=True)
-        asistencia = serializer.save()
-
-        response_data = AsistenciaSerializer(asistencia).data
-
-        # ── Validación de perímetro ──
-        if not asistencia.valido:
-            response_data['mensaje'] = (
-                f'Estás fuera del perímetro. '
-                f'Distancia: {asistencia.distancia_metros}m '
-                f'(máximo permitido: {asistencia.perimetro.radio_metros}m). '
-                f'Se registró como INVÁLIDA.'
-            )
-            response_data['estado_horario'] = 'fuera_de_perimetro'
-            return Response(response_data, status=status.HTTP_201_CREATED)
 
-        # ── Validación contra horario ──
-        usuario = request.usuario
-        ahora = timezone.localtime()
-        # Python: weekday() → 0=Lunes ... 6=Domingo (coincide con dia_semana del modelo)
-        dia_actual = ahora.weekday()
+        # Inserción + incidencia de horario en una sola transacción
+        horario = serializer.validated_data['estado_dia'].horario
+        asistencia, incidencia, hora_actual = registrar_asistencia(
+            request.usuario, serializer.validated_data,
+        )
 
-        horario = Horario.objects.filter(
-            usuario=usuario,
-            dia_semana=dia_actual,
-        ).first()
+        response_data = AsistenciaSerializer(asistencia).data
+        if incidencia:
+            response_data['incidencia'] = IncidenciaSerializer(incidencia).data
+        tipo_incidencia = incidencia.tipo if incidencia else None
+        response_data.update(describir_registro(asistencia, horario, tipo_incidencia, hora_actual))
 
-        if not horario:
-            response_data['mensaje'] = (
-                'Asistencia registrada. No tienes horario asignado para hoy.'
-            )
-            response_data['estado_horario'] = 'sin_horario'
-            return Response(response_data, status=status.HTTP_201_CREATED)
+        # Con escritura diferida aún no tiene id: 202 con id_provisional
+        codigo = status.HTTP_201_CREATED if asistencia.pk else status.HTTP_202_ACCEPTED
+        return Response(response_data, status=codigo)
 
-        hora_actual = ahora.time()
-        incidencia_creada = None
 
-        if asistencia.tipo == Asistencia.Tipo.ENTRADA:
-            incidencia_creada = self._validar_entrada(
-                usuario, horario, hora_actual, ahora.date()
-            )
-        elif asistencia.tipo == Asistencia.Tipo.SALIDA:
-            incidencia_creada = self._validar_salida(
-                usuario, horario, hora_actual, ahora.date()
-            )
+class RegistrarLoteView(APIView):
+    """
+    POST /api/asistencia/registrar-lote/
+    La app envía los marcados que guardó sin conexión, cada uno con la
+    fecha_hora del dispositivo. Se aplican las mismas reglas que al registro
+    individual y se responde un resultado por registro (en el mismo orden),
+    para que la app sepa cuáles borrar de su cola y cuáles mostrar con error.
+    Presupuesto: tres lecturas + dos bulk_create, sin importar el tamaño del lote.
+    """
+    permission_classes = [EsUsuarioAutenticado]
 
-        # ── Construir respuesta con feedback ──
-        if incidencia_creada:
-            response_data['incidencia'] = IncidenciaSerializer(incidencia_creada).data
-
-            if incidencia_creada.tipo == Incidencia.Tipo.RETARDO:
-                minutos_tarde = self._diferencia_minutos(horario.hora_entrada, hora_actual)
-                response_data['mensaje'] = (
-                    f'⚠️ Retardo registrado. Llegaste {minutos_tarde} minutos tarde. '
-                    f'Tu hora de entrada es {horario.hora_entrada.strftime("%H:%M")} '
-                    f'y marcaste a las {hora_actual.strftime("%H:%M")}.'
-                )
-                response_data['estado_horario'] = 'retardo'
-            elif incidencia_creada.tipo == Incidencia.Tipo.SALIDA_TEMPRANA:
-                minutos_antes = self._diferencia_minutos(hora_actual, horario.hora_salida)
-                response_data['mensaje'] = (
-                    f'⚠️ Salida temprana registrada. Saliste {minutos_antes} minutos antes. '
-                    f'Tu hora de salida es {horario.hora_salida.strftime("%H:%M")} '
-                    f'y marcaste a las {hora_actual.strftime("%H:%M")}.'
-                )
-                response_data['estado_horario'] = 'salida_temprana'
-        else:
-            if asistencia.tipo == Asistencia.Tipo.ENTRADA:
-                response_data['mensaje'] = (
-                    f'✅ Entrada registrada a tiempo. '
-                    f'Hora de entrada: {horario.hora_entrada.strftime("%H:%M")}, '
-                    f'marcaste a las {hora_actual.strftime("%H:%M")}.'
-                )
-                response_data['estado_horario'] = 'a_tiempo'
+    def post(self, request):
+        lote = RegistrarLoteSerializer(data=request.data)
+        lote.is_valid(raise_exception=True)
+        registros = lote.validated_data['registros']
+
+        # Validación de campos por registro; los inválidos no detienen el lote
+        resultados = [None] * len(registros)
+        validos, indices = [], []
+        for i, registro in enumerate(registros):
+            serializer = RegistroOfflineSerializer(data=registro)
+            if serializer.is_valid():
+                validos.append(serializer.validated_data)
+                indices.append(i)
             else:
-                response_data['mensaje'] = (
-                    f'✅ Salida registrada correctamente. '
-                    f'Hora de salida: {horario.hora_salida.strftime("%H:%M")}, '
-                    f'marcaste a las {hora_actual.strftime("%H:%M")}.'
-                )
-                response_data['estado_horario'] = 'a_tiempo'
-
-        return Response(response_data, status=status.HTTP_201_CREATED)
-
-    def _validar_entrada(self, usuario, horario, hora_actual, fecha_hoy):
-        """
-        Compara la hora de marcado contra hora_entrada del horario.
-        Si llega después de hora_entrada + tolerancia → crea incidencia de retardo.
-        """
-        from datetime import timedelta as td
-
-        hora_limite = self._sumar_minutos(horario.hora_entrada, TOLERANCIA_RETARDO_MIN)
-
-        if hora_actual > hora_limite:
-            minutos = self._diferencia_minutos(horario.hora_entrada, hora_actual)
-            incidencia, _ = Incidencia.objects.get_or_create(
-                usuario=usuario,
-                tipo=Incidencia.Tipo.RETARDO,
-                fecha=fecha_hoy,
-                defaults={
-                    'descripcion': (
-                        f'Retardo automático. Hora de entrada programada: '
-                        f'{horario.hora_entrada.strftime("%H:%M")}, '
-                        f'hora registrada: {hora_actual.strftime("%H:%M")} '
-                        f'({minutos} min tarde).'
-                    ),
-                },
-            )
-            return incidencia
-        return None
-
-    def _validar_salida(self, usuario, horario, hora_actual, fecha_hoy):
-        """
-        Compara la hora de marcado contra hora_salida del horario.
-        Si sale antes de hora_salida - tolerancia → crea incidencia de salida temprana.
-        """
-        hora_limite = self._restar_minutos(horario.hora_salida, TOLERANCIA_SALIDA_TEMPRANA_MIN)
-
-        if hora_actual < hora_limite:
-            minutos = self._diferencia_minutos(hora_actual, horario.hora_salida)
-            incidencia, _ = Incidencia.objects.get_or_create(
-                usuario=usuario,
-                tipo=Incidencia.Tipo.SALIDA_TEMPRANA,
-                fecha=fecha_hoy,
-                defaults={
-                    'descripcion': (
-                        f'Salida temprana automática. Hora de salida programada: '
-                        f'{horario.hora_salida.strftime("%H:%M")}, '
-                        f'hora registrada: {hora_actual.strftime("%H:%M")} '
-                        f'({minutos} min antes).'
-                    ),
-                },
-            )
-            return incidencia
-        return None
+                resultados[i] = {'indice': i, 'registrado': False, 'errores': serializer.errors}
 
-    def _sumar_minutos(self, hora, minutos):
-        """Suma minutos a un objeto time."""
-        dt = datetime.combine(date.today(), hora) + timedelta(minutes=minutos)
-        return dt.time()
+        if validos:
+            for i, resultado in zip(indices, registrar_lote(request.usuario, validos)):
+                resultado['indice'] = i
+                resultados[i] = resultado
 
-    def _restar_minutos(self, hora, minutos):
-        """Resta minutos a un objeto time."""
-        dt = datetime.combine(date.today(), hora) - timedelta(minutes=minutos)
-        return dt.time()
-
-    def _diferencia_minutos(self, hora_menor, hora_mayor):
-        """Calcula la diferencia en minutos entre dos objetos time."""
-        dt1 = datetime.combine(date.today(), hora_menor)
-        dt2 = datetime.combine(date.today(), hora_mayor)
-        return int((dt2 - dt1).total_seconds() / 60)
+        registrados = sum(1 for r in resultados if r['registrado'])
+        return Response({
+            'registrados': registrados,
+            'rechazados': len(resultados) - registrados,
+            'resultados': resultados,
+        })
 
 
 # ──────────────────────────────────────────────
@@ -203,6 +116,8 @@ class EstadoAsistenciaHoyView(APIView):
     GET /api/asistencia/estado-hoy/
     Devuelve el estado de asistencia del usuario para el día actual.
     Incluye auto-salida si la entrada tiene más de AUTO_SALIDA_HORAS.
+    El estado se responde desde cache (ver estado_hoy.py); solo se consulta
+    Asistencia la primera vez del día o tras una edición.
     """
     permission_classes = [EsUsuarioAutenticado]
 
@@ -210,57 +125,45 @@ class EstadoAsistenciaHoyView(APIView):
         usuario = request.usuario
         hoy = timezone.localtime().date()
 
-        entrada = Asistencia.objects.filter(
-            usuario=usuario,
-            tipo=Asistencia.Tipo.ENTRADA,
-            fecha_hora__date=hoy,
-            valido=True,
-        ).first()
-
-        salida = Asistencia.objects.filter(
-            usuario=usuario,
-            tipo=Asistencia.Tipo.SALIDA,
-            fecha_hora__date=hoy,
-            valido=True,
-        ).first()
+        estado = estado_hoy.obtener(usuario.id, hoy)
+        if estado is None:
+            estado = self._cargar_estado(usuario, hoy)
 
         # ── Auto-salida: si la entrada tiene más de AUTO_SALIDA_HORAS y no hay salida ──
-        if entrada and not salida:
+        if estado['entrada_id'] and not estado['salida_id']:
             ahora = timezone.localtime()
-            horas_transcurridas = (ahora - entrada.fecha_hora).total_seconds() / 3600
+            horas_transcurridas = (ahora - estado['entrada_fecha_hora']).total_seconds() / 3600
             if horas_transcurridas >= AUTO_SALIDA_HORAS:
-                # Registrar salida automática
-                salida = Asistencia.objects.create(
-                    usuario=usuario,
-                    perimetro=entrada.perimetro,
-                    tipo=Asistencia.Tipo.SALIDA,
-                    latitud_real=entrada.latitud_real,
-                    longitud_real=entrada.longitud_real,
-                    valido=True,
-                    distancia_metros=entrada.distancia_metros,
-                )
-                # Crear incidencia de salida automática
-                Incidencia.objects.get_or_create(
-                    usuario=usuario,
-                    tipo=Incidencia.Tipo.SALIDA_TEMPRANA,
-                    fecha=hoy,
-                    defaults={
-                        'descripcion': (
-                            f'Salida automática registrada por el sistema. '
-                            f'Pasaron {int(horas_transcurridas)} horas desde la entrada '
-                            f'sin registrar salida manualmente.'
-                        ),
-                    },
-                )
+                self._registrar_auto_salida(usuario, estado, hoy, horas_transcurridas)
 
         return Response({
-            'entrada_registrada': entrada is not None,
-            'salida_registrada': salida is not None,
-            'entrada': AsistenciaSerializer(entrada).data if entrada else None,
-            'salida': AsistenciaSerializer(salida).data if salida else None,
+            'entrada_registrada': estado['entrada_id'] is not None,
+            'salida_registrada': estado['salida_id'] is not None,
+            'entrada': estado['entrada'],
+            'salida': estado['salida'],
             'fecha': str(hoy),
         })
 
+    def _cargar_estado(self, usuario, hoy):
+        """Lee entrada y salida válidas de hoy y las deja en cache."""
+        estado = estado_hoy.vacio()
+        validas = Asistencia.objects.filter(
+            usuario=usuario,
+            fecha_local=hoy,
+            valido=True,
+        ).select_related('usuario', 'perimetro', 'red_autorizada')
+        # Orden -fecha_hora: la primera de cada tipo es la más reciente
+        for asistencia in validas:
+            if estado[f'{asistencia.tipo}_id'] is None:
+                estado_hoy.anotar(estado, asistencia, AsistenciaSerializer(asistencia).data)
+        estado_hoy.guardar(usuario.id, hoy, estado)
+        return estado
+
+    def _registrar_auto_salida(self, usuario, estado, hoy, horas_transcurridas):
+        salida = registrar_auto_salida(usuario, estado['entrada_id'], hoy, horas_transcurridas)
+        # La señal de Asistencia ya la escribió en cache; aquí solo se responde
+        estado_hoy.anotar(estado, salida, AsistenciaSerializer(salida).data)
+
 
 # ──────────────────────────────────────────────
 # HISTORIAL DE ASISTENCIA (Req. 3)
@@ -271,25 +174,53 @@ class HistorialAsistenciaView(APIView):
     GET /api/asistencia/historial/
     Cada maestro consulta su propio historial.
     Query params opcionales: ?fecha_inicio=2026-01-01&fecha_fin=2026-01-31
+    Los meses archivados del rango (ver archivo.py; sin fecha_inicio, todos)
+    se leen del archivo y se intercalan por (fecha_hora, id).
+    Con ?paginacion=cursor (&limite=N) responde por páginas como
+    AsistenciaViewSet; el cursor sigue en el archivo cuando se acaban las
+    filas de la base de datos. La primera página
+    trae `resumen`: totales del rango calculados en SQL (resumen.totales).
     """
     permission_classes = [EsUsuarioAutenticado]
 
+    @marcas.con_etag(lambda vista, request: [
+        marcas.historial(request.usuario.id), marcas.horario(request.usuario.id),
+        marcas.PERIMETROS, marcas.REDES,
+    ])
     def get(self, request):
-        asistencias = Asistencia.objects.filter(
-            usuario=request.usuario,
-        ).select_related('perimetro')
+        asistencias = Asistencia.objects.filter(usuario=request.usuario)
 
         # Filtros opcionales por fecha
         fecha_inicio = request.query_params.get('fecha_inicio')
         fecha_fin = request.query_params.get('fecha_fin')
 
         if fecha_inicio:
-            asistencias = asistencias.filter(fecha_hora__date__gte=fecha_inicio)
+            asistencias = asistencias.filter(fecha_local__gte=fecha_inicio)
         if fecha_fin:
-            asistencias = asistencias.filter(fecha_hora__date__lte=fecha_fin)
-
-        serializer = AsistenciaSerializer(asistencias, many=True)
-        return Response(serializer.data)
+            asistencias = asistencias.filter(fecha_local__lte=fecha_fin)
+
+        filas = valores.consulta_asistencias(asistencias)
+        if PaginacionAsistencias.solicitada(request):
+            paginador = PaginacionAsistencias()
+            pagina = paginador.paginate_queryset(filas, request, self)
+            datos = paginador.completar(
+                pagina, valores.asistencias(pagina),
+                partial(archivo.entre, request.usuario.id, fecha_inicio, fecha_fin),
+            )
+            respuesta = paginador.get_paginated_response(datos)
+            if not request.query_params.get('cursor'):
+                respuesta.data['resumen'] = resumen.totales(request.usuario.id, fecha_inicio, fecha_fin)
+            return respuesta
+
+        filas = list(filas.order_by('-fecha_hora', '-id'))
+        datos = valores.asistencias(filas)
+        archivadas = archivo.entre(request.usuario.id, fecha_inicio, fecha_fin)
+        if archivadas:
+            datos = [dato for _, _, dato in heapq.merge(
+                ((fila['fecha_hora'], fila['id'], dato) for fila, dato in zip(filas, datos)),
+                archivadas, key=lambda fila: fila[:2], reverse=True,
+            )]
+        return Response(datos)
 
 
 # ──────────────────────────────────────────────
@@ -300,64 +231,53 @@ class PanelSupervisionView(APIView):
     """
     GET /api/asistencia/panel/
     Supervisores y admins ven el estado de asistencia de hoy.
-    Query params opcionales: ?fecha=2026-02-06
+    Query params opcionales:
+      ?fecha=2026-02-06
+      ?estado=en_turno,fuera_de_perimetro  ?nombre=prefijo  ?perimetro=1
+      ?limite=50&cursor=...  → una página; `siguiente` trae el cursor de la próxima
+      ?stream=1              → todos los maestros en una respuesta JSON en streaming
+    Lee el resumen diario (ver panel.py): tres consultas por página sin
+    importar el número de maestros. Responde 304 a If-None-Match si el día
+    no cambió (ver common/marcas.py).
     """
     permission_classes = [EsSupervisorOAdmin]
 
-    def get(self, request):
-        fecha = request.query_params.get('fecha', str(date.today()))
-
-        # Todos los maestros activos
-        maestros = Usuario.objects.filter(
-            rol__nombre=Rol.Nombre.MAESTRO,
-            activo=True,
-        ).select_related('rol')
-
-        resultado = []
-        for maestro in maestros:
-            asistencias_hoy = Asistencia.objects.filter(
-                usuario=maestro,
-                fecha_hora__date=fecha,
-            ).order_by('fecha_hora')
-
-            entrada = asistencias_hoy.filter(tipo=Asistencia.Tipo.ENTRADA).first()
-            salida = asistencias_hoy.filter(tipo=Asistencia.Tipo.SALIDA).last()
-
-            incidencias_hoy = Incidencia.objects.filter(
-                usuario=maestro,
-                fecha=fecha,
-            )
+    @staticmethod
+    def _fecha(request):
+        return request.query_params.get('fecha', str(date.today()))
 
-            resultado.append({
-                'maestro': {
-                    'id': maestro.id,
-                    'nombre': maestro.nombre,
-                    'correo': maestro.correo,
-                },
-                'entrada': AsistenciaSerializer(entrada).data if entrada else None,
-                'salida': AsistenciaSerializer(salida).data if salida else None,
-                'incidencias': IncidenciaSerializer(incidencias_hoy, many=True).data,
-                'estado': self._calcular_estado(entrada, salida),
+    @marcas.con_etag(lambda vista, request: [
+        marcas.panel(vista._fecha(request)), marcas.MAESTROS, marcas.PERIMETROS, marcas.REDES,
+    ])
+    def get(self, request):
+        params = request.query_params
+        fecha = self._fecha(request)
+        filtrados = panel.maestros(fecha, **panel.leer_filtros(params))
+        limite = panel.leer_limite(params)
+        qs = filtrados
+        if params.get('cursor'):
+            qs = panel.despues_de(qs, *panel.decodificar_cursor(params['cursor']))
+
+        if params.get('stream'):
+            return StreamingHttpResponse(panel.json_en_streaming(fecha, qs), content_type='application/json')
+
+        if limite is None:
+            resultado = panel.filas(fecha, list(qs))
+            return Response({
+                'fecha': fecha,
+                'total_maestros': len(resultado),
+                'maestros': resultado,
             })
 
+        pagina = list(qs[:limite + 1])
+        siguiente = panel.codificar_cursor(pagina[limite - 1]) if len(pagina) > limite else None
         return Response({
             'fecha': fecha,
-            'total_maestros': len(resultado),
-            'maestros': resultado,
+            'total_maestros': filtrados.count(),
+            'maestros': panel.filas(fecha, pagina[:limite]),
+            'siguiente': siguiente,
         })
 
-    def _calcular_estado(self, entrada, salida):
-        """Calcula el estado del maestro basado en sus registros."""
-        if not entrada:
-            return 'sin_registro'
-        if entrada and not entrada.valido:
-            return 'fuera_de_perimetro'
-        if entrada and not salida:
-            return 'en_turno'
-        if entrada and salida:
-            return 'turno_completado'
-        return 'desconocido'
-
 
 # ──────────────────────────────────────────────
 # ADMIN: ASISTENCIA COMPLETA
@@ -367,10 +287,13 @@ class AsistenciaViewSet(viewsets.ReadOnlyModelViewSet):
     """
     GET /api/asistencia/         → Lista todas (admin/supervisor)
     GET /api/asistencia/{id}/    → Detalle
-    Query params: ?usuario=1&fecha_inicio=2026-01-01&fecha_fin=2026-01-31
+    Query params: ?usuario=1&fecha_inicio=2026-01-01&fecha_fin=2026-01-31&valido=true
+    Paginación: ?page=N, o ?paginacion=cursor y seguir `next` (por llave,
+    sin COUNT ni OFFSET; ?total=aproximado agrega una estimación del total)
     """
     serializer_class = AsistenciaSerializer
     permission_classes = [EsSupervisorOAdmin]
+    pagination_class = PaginacionAsistencias
 
     def get_queryset(self):
         qs = Asistencia.objects.select_related('usuario', 'perimetro').all()
@@ -384,14 +307,22 @@ class AsistenciaViewSet(viewsets.ReadOnlyModelViewSet):
         if usuario_id:
             qs = qs.filter(usuario_id=usuario_id)
         if fecha_inicio:
-            qs = qs.filter(fecha_hora__date__gte=fecha_inicio)
+            qs = qs.filter(fecha_local__gte=fecha_inicio)
         if fecha_fin:
-            qs = qs.filter(fecha_hora__date__lte=fecha_fin)
+            qs = qs.filter(fecha_local__lte=fecha_fin)
         if solo_validos is not None:
             qs = qs.filter(valido=solo_validos.lower() == 'true')
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        # Solo lectura: filas de .values() con los nombres unidos (ver valores.py)
+        filas = valores.consulta_asistencias(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(valores.asistencias(pagina))
+        return Response(valores.asistencias(filas))
+
 
 # ──────────────────────────────────────────────
 # ADMIN: PERÍMETROS (Req. 6)
@@ -400,11 +331,28 @@ class AsistenciaViewSet(viewsets.ReadOnlyModelViewSet):
 class PerimetroViewSet(viewsets.ModelViewSet):
     """
     CRUD de perímetros. Solo administradores.
+    Al cambiar centro o radio se revalidan las asistencias del perímetro en
+    segundo plano, después de responder (ver revalidacion.encolar).
+    POST /api/asistencia/perimetros/{id}/revalidar/?dry_run=true
+         → Reporta (o aplica) los cambios de validez sin editar el perímetro
     """
     queryset = Perimetro.objects.all()
     serializer_class = PerimetroSerializer
     permission_classes = [EsAdministrador]
 
+    def perform_update(self, serializer):
+        anterior = serializer.instance
+        geometria = (anterior.latitud, anterior.longitud, anterior.radio_metros)
+        perimetro = serializer.save()
+        if geometria != (perimetro.latitud, perimetro.longitud, perimetro.radio_metros):
+            revalidacion.encolar(perimetro.id)
+
+    @action(detail=True, methods=['post'])
+    def revalidar(self, request, pk=None):
+        dry_run = request.query_params.get('dry_run', 'false').lower() == 'true'
+        resultado = revalidacion.revalidar_perimetro(self.get_object(), dry_run=dry_run)
+        return Response(resultado)
+
 
 # ──────────────────────────────────────────────
 # ADMIN: INCIDENCIAS
@@ -414,8 +362,11 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
     """
     CRUD de incidencias.
     Maestros ven las suyas, admin/supervisor ven todas.
+    Query params: ?usuario=1&fecha=2026-01-15
+    Paginación: como AsistenciaViewSet, por llave (fecha, id)
     """
     serializer_class = IncidenciaSerializer
+    pagination_class = PaginacionIncidencias
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -440,6 +391,13 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        filas = valores.consulta_incidencias(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(filas)
+        if pagina is not None:
+            return self.get_paginated_response(valores.incidencias(pagina))
+        return Response(valores.incidencias(filas))
+
 
 # ──────────────────────────────────────────────
 # ADMIN: REDES AUTORIZADAS (Req. 6)
@@ -467,6 +425,7 @@ class RedesActivasView(APIView):
     """
     permission_classes = [EsUsuarioAutenticado]
 
+    @marcas.con_etag(lambda vista, request: [marcas.REDES])
     def get(self, request):
         redes = RedAutorizada.objects.filter(activo=True).values('ssid', 'bssid', 'nombre')
         return Response(list(redes))
@@ -0,0 +1,252 @@
+"""
+Vistas async (ASGI) de los endpoints que más se llaman en la hora pico:
+registro de asistencia, estado de hoy y redes activas. También la
+exportación CSV/XLSX, que así envía las filas sin leerlas todas antes.
+
+DRF no soporta vistas async, así que son vistas de Django que reutilizan
+los serializers para validar y dar formato, autenticadas con
+JWTAuthenticationAsync. Las lecturas usan el ORM asíncrono; la inserción
+del registro necesita una transacción, que en Django solo existe en modo
+síncrono, por eso va en un hilo con sync_to_async.
+
+Se sirven en las mismas rutas cuando la app corre bajo ASGI
+(config/asgi.py → config/urls_asgi.py); bajo WSGI siguen las vistas DRF.
+El panel en vivo (PanelEventosAsyncView, Server-Sent Events) solo existe
+bajo ASGI: una conexión abierta no ocupa un worker.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed
+
+from common import exportar, marcas, trabajos
+from common.authentication import JWTAuthenticationAsync
+from common.idempotencia import idempotente
+from common.permissions import EsSupervisorOAdmin, EsUsuarioAutenticado
+
+from . import difusion, estado_hoy, panel
+from .indices import indice_redes, indice_perimetros, normalizar_bssid
+from .models import Asistencia, RedAutorizada
+from .registro import (
+    AUTO_SALIDA_HORAS, aobtener_estado_dia, registrar_asistencia,
+    registrar_auto_salida, describir_registro, error_reglas_dia, error_wifi,
+)
+from .serializers import AsistenciaSerializer, CamposRegistroSerializer, IncidenciaSerializer
+
+
+def respuesta(datos, status=200):
+    """JSON con el mismo formato que el JSONRenderer de DRF (UTF-8 sin escapar)."""
+    return JsonResponse(datos, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+def _resolver_ubicacion_y_red(latitud, longitud, ssid, bssid):
+    # Los índices pueden reconstruirse desde la base de datos: se llaman en un hilo
+    return indice_perimetros.localizar(latitud, longitud), indice_redes.buscar(ssid, bssid)
+
+
+class VistaAsync(View):
+    """
+    Base de las vistas async: autentica con JWT, aplica los permisos de
+    common.permissions y traduce los errores al formato de DRF.
+    """
+    autenticacion = JWTAuthenticationAsync()
+    permission_classes = [EsUsuarioAutenticado]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Autenticación por token, sin cookies de sesión: igual que APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.usuario = None
+        try:
+            await self.autenticacion.autenticar(request)
+        except AuthenticationFailed as e:
+            return respuesta({'detail': str(e.detail)}, status=403)
+
+        for permiso in (clase() for clase in self.permission_classes):
+            if not permiso.has_permission(request, self):
+                return respuesta({'detail': permiso.message}, status=403)
+
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            return respuesta(e.detail if isinstance(e.detail, (dict, list)) else {'detail': e.detail},
+                             status=e.status_code)
+
+
+class RegistrarAsistenciaAsyncView(VistaAsync):
+    """
+    POST /api/asistencia/registrar/ (ASGI)
+    Mismas reglas, respuesta e Idempotency-Key que RegistrarAsistenciaView.
+    """
+
+    @idempotente('registrar')
+    async def post(self, request):
+        try:
+            cuerpo = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return respuesta({'detail': f'JSON parse error - {e}'}, status=400)
+
+        serializer = CamposRegistroSerializer(data=cuerpo)
+        if not serializer.is_valid():
+            return respuesta(serializer.errors, status=400)
+        datos = serializer.validated_data
+
+        usuario = request.usuario
+        ssid = datos.get('ssid', '').strip()
+        bssid = normalizar_bssid(datos.get('bssid', ''))
+        ubicacion, red = await sync_to_async(_resolver_ubicacion_y_red)(
+            datos['latitud'], datos['longitud'], ssid, bssid,
+        )
+        if not ubicacion:
+            return self._rechazar('No hay un perímetro activo configurado.')
+
+        estado = await aobtener_estado_dia(usuario, timezone.localtime().date())
+        error = (
+            error_reglas_dia(datos['tipo'], estado.entrada_id, estado.salida_id)
+            or error_wifi(ssid, bssid, red)
+        )
+        if error:
+            return self._rechazar(error)
+
+        datos.update(
+            ssid=ssid, bssid=bssid, estado_dia=estado,
+            red_autorizada=red, wifi_valido=True,
+        )
+        datos['perimetro'], datos['dentro'], datos['distancia'] = ubicacion
+
+        # Inserción + incidencia en una transacción (solo existe en modo síncrono)
+        asistencia, incidencia, hora_actual = await sync_to_async(registrar_asistencia)(usuario, datos)
+
+        response_data = AsistenciaSerializer(asistencia).data
+        if incidencia:
+            response_data['incidencia'] = IncidenciaSerializer(incidencia).data
+        tipo_incidencia = incidencia.tipo if incidencia else None
+        response_data.update(describir_registro(asistencia, estado.horario, tipo_incidencia, hora_actual))
+
+        # Con escritura diferida aún no tiene id: 202 con id_provisional
+        return respuesta(response_data, status=201 if asistencia.pk else 202)
+
+    def _rechazar(self, mensaje):
+        return respuesta({'non_field_errors': [mensaje]}, status=400)
+
+
+class EstadoAsistenciaHoyAsyncView(VistaAsync):
+    """
+    GET /api/asistencia/estado-hoy/ (ASGI)
+    Mismo contrato que EstadoAsistenciaHoyView; en el caso común solo lee la cache.
+    """
+
+    async def get(self, request):
+        usuario = request.usuario
+        hoy = timezone.localtime().date()
+
+        estado = await estado_hoy.aobtener(usuario.id, hoy)
+        if estado is None:
+            estado = await self._cargar_estado(usuario, hoy)
+
+        # ── Auto-salida: si la entrada tiene más de AUTO_SALIDA_HORAS y no hay salida ──
+        if estado['entrada_id'] and not estado['salida_id']:
+            ahora = timezone.localtime()
+            horas_transcurridas = (ahora - estado['entrada_fecha_hora']).total_seconds() / 3600
+            if horas_transcurridas >= AUTO_SALIDA_HORAS:
+                salida = await sync_to_async(registrar_auto_salida)(
+                    usuario, estado['entrada_id'], hoy, horas_transcurridas,
+                )
+                estado_hoy.anotar(estado, salida, AsistenciaSerializer(salida).data)
+
+        return respuesta({
+            'entrada_registrada': estado['entrada_id'] is not None,
+            'salida_registrada': estado['salida_id'] is not None,
+            'entrada': estado['entrada'],
+            'salida': estado['salida'],
+            'fecha': str(hoy),
+        })
+
+    async def _cargar_estado(self, usuario, hoy):
+        estado = estado_hoy.vacio()
+        validas = Asistencia.objects.filter(
+            usuario=usuario,
+            fecha_local=hoy,
+            valido=True,
+        ).select_related('usuario', 'perimetro', 'red_autorizada')
+        async for asistencia in validas:
+            if estado[f'{asistencia.tipo}_id'] is None:
+                estado_hoy.anotar(estado, asistencia, AsistenciaSerializer(asistencia).data)
+        await estado_hoy.aguardar(usuario.id, hoy, estado)
+        return estado
+
+
+class RedesActivasAsyncView(VistaAsync):
+    """GET /api/asistencia/redes-activas/ (ASGI)"""
+
+    @marcas.con_etag(lambda vista, request: [marcas.REDES])
+    async def get(self, request):
+        redes = RedAutorizada.objects.filter(activo=True).values('ssid', 'bssid', 'nombre')
+        return respuesta([red async for red in redes])
+
+
+class PanelEventosAsyncView(VistaAsync):
+    """
+    GET /api/asistencia/panel/eventos/ (solo ASGI, Server-Sent Events)
+    Envía el panel de hoy (evento `panel`, mismo JSON que el panel completo)
+    y después las diferencias por maestro al confirmarse cada marcado
+    (evento `marcado`) o incidencia (evento `incidencia`). Si la conexión se
+    atrasa demasiado se vuelve a enviar el panel completo.
+    """
+    permission_classes = [EsSupervisorOAdmin]
+    # Comentario SSE periódico para que proxies y balanceadores no cierren la conexión
+    LATIDO_S = 25
+
+    async def get(self, request):
+        return StreamingHttpResponse(
+            self._eventos(),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    async def _eventos(self):
+        # Suscrito antes de leer el panel: ningún marcado queda entre ambos
+        async with difusion.obtener_hub().suscribir() as cola:
+            yield await self._panel()
+            while True:
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), self.LATIDO_S)
+                except asyncio.TimeoutError:
+                    yield ': latido\n\n'
+                    continue
+                yield await self._panel() if mensaje == difusion.RESINCRONIZAR else mensaje
+
+    @staticmethod
+    async def _panel():
+        fecha = str(timezone.localdate())
+        filas = await sync_to_async(panel.filas)(fecha, [m async for m in panel.maestros(fecha)])
+        return difusion.mensaje_sse('panel', {
+            'fecha': fecha,
+            'total_maestros': len(filas),
+            'maestros': filas,
+        })
+
+
+class ExportarAsyncView(VistaAsync):
+    """
+    GET /api/reportes/exportar/<tipo>/ (ASGI)
+    Mismos filtros y archivo que ExportarView; las filas se leen por bloques
+    en un hilo (ver exportar.aen_streaming).
+    """
+    permission_classes = [EsSupervisorOAdmin]
+
+    async def get(self, request, tipo):
+        parametros = trabajos.filtros(request.GET, tipo)
+        formato = exportar.leer_formato(request.GET)
+        # El iterador no consulta hasta pedirle la primera fila
+        filas = exportar.consulta(tipo, parametros).iterator(chunk_size=exportar.FILAS_POR_CONSULTA)
+        return exportar.respuesta(
+            tipo, parametros, formato, exportar.aen_streaming(exportar.escritor(tipo, formato), filas),
+        )
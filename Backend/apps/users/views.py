@@ -7,6 +7,7 @@ from django.core.cache import cache
 import random
 import string
 
+from common import marcas
 from common.permissions import EsAdministrador, EsSupervisorOAdmin, EsUsuarioAutenticado
 from common.authentication import generar_tokens
 
@@ -299,3 +300,16 @@ class HorarioViewSet(viewsets.ModelViewSet):
         # Maestros solo ven sus propios horarios
         return Horario.objects.filter(usuario=usuario)
 
+    def _alcances(self, request, *args, **kwargs):
+        usuario = request.usuario
+        if usuario.es_admin or usuario.es_supervisor:
+            return [marcas.HORARIOS]
+        return [marcas.horario(usuario.id)]
+
+    @marcas.con_etag(_alcances)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @marcas.con_etag(_alcances)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,151 @@
+"""
+Prueba de carga: throughput de los endpoints de la hora pico bajo concurrencia,
+comparando el servidor WSGI (vistas DRF) contra el ASGI (vistas async).
+
+Levanta los dos servidores contra la misma base de datos, por ejemplo:
+    gunicorn config.wsgi -w 1 --threads 1 -b 127.0.0.1:8001
+    uvicorn config.asgi:application --workers 1 --port 8002
+
+y ejecuta:
+    python bench_concurrencia.py --wsgi http://127.0.0.1:8001 --asgi http://127.0.0.1:8002 \\
+        [--endpoint estado-hoy] [--concurrencia 1 10 50] [--peticiones 500] [--maestros 50]
+
+Los tokens se generan para los primeros --maestros maestros activos. Con
+--endpoint registrar cada maestro inserta su entrada del día en el primer
+envío y el resto se rechaza como duplicado (recorre todas las validaciones,
+sin escribir); no usar contra la base de datos de producción.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.users.models import Rol, Usuario
+from apps.locations.models import Perimetro, RedAutorizada
+from common.authentication import generar_tokens
+
+RUTAS = {
+    'registrar': ('POST', '/api/asistencia/registrar/'),
+    'estado-hoy': ('GET', '/api/asistencia/estado-hoy/'),
+    'redes-activas': ('GET', '/api/asistencia/redes-activas/'),
+}
+
+
+def preparar(num_maestros, endpoint):
+    maestros = (
+        Usuario.objects.filter(rol__nombre=Rol.Nombre.MAESTRO, activo=True)
+        .select_related('rol').order_by('id')[:num_maestros]
+    )
+    tokens = [generar_tokens(m)['access'] for m in maestros]
+    if not tokens:
+        raise SystemExit('No hay maestros activos; ejecuta seed_data.py primero.')
+
+    cuerpo = None
+    if endpoint == 'registrar':
+        perimetro = Perimetro.objects.filter(activo=True).first()
+        red = RedAutorizada.objects.filter(activo=True).first()
+        if not perimetro or not red:
+            raise SystemExit('Se necesita un perímetro y una red autorizada activos.')
+        cuerpo = json.dumps({
+            'tipo': 'entrada',
+            'latitud': str(perimetro.latitud),
+            'longitud': str(perimetro.longitud),
+            'ssid': red.ssid,
+            'bssid': red.bssid,
+        })
+    return tokens, cuerpo
+
+
+def correr(base_url, endpoint, tokens, cuerpo, concurrencia, peticiones):
+    """Lanza `peticiones` con `concurrencia` hilos (una conexión keep-alive por hilo)."""
+    metodo, ruta = RUTAS[endpoint]
+    url = urlsplit(base_url)
+    local = threading.local()
+    contador = iter(range(peticiones))
+    candado = threading.Lock()
+    latencias = []
+    estados = Counter()
+
+    def conexion():
+        if not hasattr(local, 'conn'):
+            local.conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        return local.conn
+
+    def trabajador():
+        while True:
+            with candado:
+                i = next(contador, None)
+            if i is None:
+                return
+            cabeceras = {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}
+            if cuerpo:
+                cabeceras['Content-Type'] = 'application/json'
+            inicio = time.perf_counter()
+            try:
+                conn = conexion()
+                conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+                respuesta = conn.getresponse()
+                respuesta.read()
+                estado = respuesta.status
+            except (OSError, http.client.HTTPException):
+                local.__dict__.pop('conn', None)
+                estado = 'error'
+            with candado:
+                latencias.append(time.perf_counter() - inicio)
+                estados[estado] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        for _ in range(concurrencia):
+            pool.submit(trabajador)
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        'rps': peticiones / total,
+        'p50': statistics.median(latencias) * 1000,
+        'p95': latencias[int(len(latencias) * 0.95) - 1] * 1000,
+        'estados': dict(estados),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi', help='URL base del servidor WSGI')
+    parser.add_argument('--asgi', help='URL base del servidor ASGI')
+    parser.add_argument('--endpoint', choices=RUTAS, default='estado-hoy')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--peticiones', type=int, default=500)
+    parser.add_argument('--maestros', type=int, default=50)
+    args = parser.parse_args()
+
+    servidores = [(nombre, url) for nombre, url in (('WSGI', args.wsgi), ('ASGI', args.asgi)) if url]
+    if not servidores:
+        parser.error('indica al menos --wsgi o --asgi')
+
+    tokens, cuerpo = preparar(args.maestros, args.endpoint)
+    metodo, ruta = RUTAS[args.endpoint]
+    print(f'{metodo} {ruta} · {args.peticiones} peticiones · {len(tokens)} maestros\n')
+    print(f'{"servidor":<8} {"conc.":>5} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8}  respuestas')
+    for concurrencia in args.concurrencia:
+        for nombre, url in servidores:
+            r = correr(url, args.endpoint, tokens, cuerpo, concurrencia, args.peticiones)
+            print(
+                f'{nombre:<8} {concurrencia:>5} {r["rps"]:>9.1f} {r["p50"]:>8.1f} {r["p95"]:>8.1f}  '
+                f'{r["estados"]}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark de la escritura diferida: commits por segundo en la base de datos
+principal registrando directo (un commit por registro) contra el buffer
+local + vaciador (un commit por lote).
+
+Llama a registrar_asistencia() desde varios hilos, como lo harían los
+workers durante el pico de la entrada, con datos ya validados. A
+diferencia de los otros benchmarks, aquí los commits son lo que se mide,
+así que los datos de prueba se insertan de verdad y se borran al final.
+
+Uso: python bench_escritura_diferida.py [--registros 5000] [--hilos 8] [--intervalo-ms 250]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from apps.users.models import Rol, Usuario
+from apps.locations import escritura_diferida
+from apps.locations.models import Perimetro, Asistencia
+from apps.locations.registro import EstadoDia, registrar_asistencia
+
+LAT, LNG = '20.659698', '-103.349609'
+
+
+def crear_datos(num_maestros):
+    perimetro = Perimetro.objects.create(nombre='Bench diferida', latitud=LAT, longitud=LNG, radio_metros=100)
+    rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+    maestros = Usuario.objects.bulk_create([
+        Usuario(nombre=f'Bench diferida {i}', correo=f'bench-diferida{i}@bench.local', password='!', rol=rol)
+        for i in range(num_maestros)
+    ])
+    return perimetro, maestros
+
+
+def borrar_datos(perimetro, maestros):
+    Asistencia.objects.filter(usuario__in=maestros).delete()
+    Usuario.objects.filter(id__in=[m.id for m in maestros]).delete()
+    perimetro.delete()
+
+
+def registrar(maestros, perimetro, registros, hilos):
+    """Lanza `registros` llamadas a registrar_asistencia repartidas en `hilos`."""
+    estado = EstadoDia(None, None, None, False, False)
+
+    def uno(i):
+        registrar_asistencia(maestros[i % len(maestros)], {
+            'estado_dia': estado, 'perimetro': perimetro, 'tipo': 'entrada',
+            'latitud': LAT, 'longitud': LNG, 'dentro': True, 'distancia': 0.0,
+        })
+
+    def trabajador(indices):
+        try:
+            for i in indices:
+                uno(i)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(trabajador, [range(h, registros, hilos) for h in range(hilos)]))
+    return time.perf_counter() - inicio
+
+
+def contar_commits():
+    """Cuenta los lotes que escribe el vaciador (un commit cada uno)."""
+    lotes = []
+    original = escritura_diferida.vaciar_lote
+
+    def contado(*args, **kwargs):
+        n = original(*args, **kwargs)
+        if n:
+            lotes.append(n)
+        return n
+
+    escritura_diferida.vaciar_lote = contado
+    return lotes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registros', type=int, default=5000)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--maestros', type=int, default=500)
+    parser.add_argument('--intervalo-ms', type=int, default=250)
+    args = parser.parse_args()
+
+    perimetro, maestros = crear_datos(args.maestros)
+    try:
+        print(f'{args.registros} registros · {args.hilos} hilos · {connection.vendor}\n')
+
+        # ── Directo: un INSERT + COMMIT por registro ──
+        with override_settings(ASISTENCIA_ESCRITURA_DIFERIDA=False):
+            directo = registrar(maestros, perimetro, args.registros, args.hilos)
+        print(
+            f'directo   : {args.registros / directo:8.0f} registros/s · '
+            f'{args.registros} commits ({args.registros / directo:.0f} commits/s)'
+        )
+        Asistencia.objects.filter(usuario__in=maestros).delete()
+
+        # ── Diferido: buffer local + vaciador por lotes ──
+        with tempfile.TemporaryDirectory() as directorio, override_settings(
+            ASISTENCIA_ESCRITURA_DIFERIDA=True,
+            ASISTENCIA_BUFFER_RUTA=str(Path(directorio) / 'buffer.sqlite3'),
+            ASISTENCIA_BUFFER_INTERVALO_MS=args.intervalo_ms,
+        ):
+            lotes = contar_commits()
+            inicio = time.perf_counter()
+            aceptado = registrar(maestros, perimetro, args.registros, args.hilos)
+            buffer = escritura_diferida.obtener_buffer()
+            while buffer.cantidad():
+                time.sleep(0.01)
+            total = time.perf_counter() - inicio
+            insertados = Asistencia.objects.filter(usuario__in=maestros).count()
+
+        print(
+            f'diferido  : {args.registros / aceptado:8.0f} registros/s aceptados · '
+            f'{insertados} insertados en {total:.2f} s · '
+            f'{len(lotes)} commits ({len(lotes) / total:.1f} commits/s, '
+            f'{args.registros / max(len(lotes), 1):.0f} registros por commit)'
+        )
+    finally:
+        borrar_datos(perimetro, maestros)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark de la exportación CSV/XLSX en streaming (common/exportar.py).
+
+Crea N asistencias dentro de una transacción que se revierte al final y
+recorre la exportación completa en cada formato: tiempo al primer bloque,
+tiempo total, filas por segundo y tamaño; con --memoria, el pico de
+memoria de Python (tracemalloc), que debe quedarse plano al crecer N.
+
+Uso: python bench_exportacion.py [--filas 10000 100000] [--maestros 200] [--salida DIR] [--memoria]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import Rol, Usuario
+from apps.locations.models import Perimetro, Asistencia
+from common import exportar
+
+LAT, LNG = '20.659698', '-103.349609'
+LOTE = 5000
+
+
+def agregar_asistencias(desde, hasta, usuarios, perimetro):
+    inicio = timezone.make_aware(datetime(2020, 1, 6, 7, 0))
+    lote = []
+    for i in range(desde, hasta):
+        lote.append(Asistencia(
+            usuario=usuarios[i % len(usuarios)], perimetro=perimetro,
+            tipo=Asistencia.Tipo.ENTRADA if i % 2 == 0 else Asistencia.Tipo.SALIDA,
+            latitud_real=LAT, longitud_real=LNG, distancia_metros=12.5,
+            fecha_hora=inicio + timedelta(minutes=i),
+        ))
+        if len(lote) == LOTE:
+            Asistencia.objects.bulk_create(lote)
+            lote = []
+    Asistencia.objects.bulk_create(lote)
+
+
+def medir(formato, parametros, salida, memoria):
+    filas = exportar.consulta('asistencia', parametros).iterator(chunk_size=exportar.FILAS_POR_CONSULTA)
+    partes = exportar.en_streaming(exportar.escritor('asistencia', formato), filas)
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    primer_bloque = None
+    tamano = 0
+    with open(salida / f'exportacion.{formato}', 'wb') as f:
+        for parte in partes:
+            if primer_bloque is None:
+                primer_bloque = time.perf_counter() - inicio
+            f.write(parte)
+            tamano += len(parte)
+    total = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1] if memoria else 0
+    tracemalloc.stop()
+    return primer_bloque, total, tamano, pico
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--maestros', type=int, default=200)
+    parser.add_argument('--salida', type=Path, default=Path('/tmp'))
+    # tracemalloc hace varias veces más lenta la exportación: tiempos y memoria por separado
+    parser.add_argument('--memoria', action='store_true', help='Medir el pico de memoria en lugar del tiempo')
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        perimetro = Perimetro.objects.create(nombre='Bench exportacion', latitud=LAT, longitud=LNG, radio_metros=100)
+        rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(nombre=f'Bench exportacion {i}', correo=f'bench-exp{i}@bench.local', password='!', rol=rol)
+            for i in range(args.maestros)
+        ])
+        # Las asistencias que ya existen también se exportan
+        base = Asistencia.objects.count()
+        parametros = {'fecha_inicio': None, 'fecha_fin': None, 'usuario': None}
+
+        print(f'{"filas":>8} {"formato":>7} {"primer bloque":>14} {"total":>9} {"filas/s":>9} {"MB":>7} {"pico MB":>8}')
+        actuales = 0
+        for tamano in sorted(args.filas):
+            agregar_asistencias(actuales, tamano, usuarios, perimetro)
+            actuales = tamano
+            for formato in exportar.FORMATOS:
+                primer_bloque, total, bytes_, pico = medir(formato, parametros, args.salida, args.memoria)
+                filas = base + tamano
+                print(f'{filas:>8} {formato:>7} {primer_bloque * 1000:>11.1f} ms {total:>7.2f} s '
+                      f'{filas / total:>9.0f} {bytes_ / 1e6:>7.1f} {pico / 1e6:>8.2f}')
+
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
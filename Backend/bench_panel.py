@@ -0,0 +1,112 @@
+"""
+Benchmark del panel de supervisión (GET /api/asistencia/panel/) según el
+número de maestros activos.
+
+Va agregando maestros con entrada, salida e incidencias del día y mide el
+panel en cada tamaño: el número de consultas debe mantenerse constante y
+la latencia por maestro, plana. Los datos se crean dentro de una
+transacción que se revierte al final.
+
+Uso: python bench_panel.py [--tamanos 100 500 1000 2000] [--repeticiones 5]
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from apps.users.models import Rol, Usuario
+from apps.locations import resumen
+from apps.locations.models import Perimetro, Asistencia, Incidencia
+from apps.locations.views import PanelSupervisionView
+from common.authentication import generar_tokens
+
+LAT, LNG = '20.659698', '-103.349609'
+
+
+def agregar_maestros(desde, hasta, rol, perimetro, fecha):
+    maestros = Usuario.objects.bulk_create([
+        Usuario(nombre=f'Bench panel {i}', correo=f'bench-panel{i}@bench.local', password='!', rol=rol)
+        for i in range(desde, hasta)
+    ])
+    inicio = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+    asistencias, incidencias = [], []
+    for i, maestro in enumerate(maestros, start=desde):
+        # 1 de cada 10 falta; del resto, la mitad ya registró salida
+        if i % 10 == 0:
+            incidencias.append(Incidencia(usuario=maestro, tipo=Incidencia.Tipo.FALTA, fecha=fecha))
+            continue
+        asistencias.append(Asistencia(
+            usuario=maestro, perimetro=perimetro, tipo=Asistencia.Tipo.ENTRADA,
+            latitud_real=LAT, longitud_real=LNG, fecha_hora=inicio + timedelta(hours=7, minutes=i % 30),
+        ))
+        if i % 2:
+            asistencias.append(Asistencia(
+                usuario=maestro, perimetro=perimetro, tipo=Asistencia.Tipo.SALIDA,
+                latitud_real=LAT, longitud_real=LNG, fecha_hora=inicio + timedelta(hours=14, minutes=30),
+            ))
+        if i % 7 == 0:
+            incidencias.append(Incidencia(usuario=maestro, tipo=Incidencia.Tipo.RETARDO, fecha=fecha))
+    Asistencia.objects.bulk_create(asistencias)
+    Incidencia.objects.bulk_create(incidencias)
+    # bulk_create no pasa por el registro: el panel lee el resumen diario
+    resumen.recalcular((maestro.id, fecha) for maestro in maestros)
+
+
+def medir(token, fecha, repeticiones):
+    factory = APIRequestFactory()
+    vista = PanelSupervisionView.as_view()
+    tiempos = []
+    for _ in range(repeticiones):
+        request = factory.get('/api/asistencia/panel/', {'fecha': str(fecha)},
+                              HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            response = vista(request)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert response.status_code == 200, response.data
+    return statistics.median(tiempos), len(ctx.captured_queries), response.data['total_maestros']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 500, 1000, 2000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    fecha = timezone.localdate()
+    with transaction.atomic():
+        perimetro = Perimetro.objects.create(nombre='Bench panel', latitud=LAT, longitud=LNG, radio_metros=100)
+        rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+        rol_supervisor, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.SUPERVISOR)
+        supervisor = Usuario.objects.create(
+            nombre='Bench supervisor', correo='bench-supervisor@bench.local', password='!', rol=rol_supervisor,
+        )
+        token = generar_tokens(supervisor)['access']
+        # Los maestros que ya existen también salen en el panel
+        base = Usuario.objects.filter(rol=rol, activo=True).count()
+
+        print(f'{"maestros":>9} {"mediana":>10} {"ms/maestro":>11} {"consultas":>10}')
+        actuales = 0
+        for tamano in sorted(args.tamanos):
+            agregar_maestros(actuales, tamano, rol, perimetro, fecha)
+            actuales = tamano
+            mediana, consultas, total = medir(token, fecha, args.repeticiones)
+            assert total == base + tamano, total
+            print(f'{total:>9} {mediana:>7.1f} ms {mediana / total:>11.3f} {consultas:>10}')
+
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark del reporte por maestro en paralelo (common/por_maestro.py):
+páginas por segundo con 1, 2, 4 y 8 procesos, y aceleración sobre 1.
+
+Crea N maestros con un mes de ResumenDiario (un día por fila, ~2 páginas
+por maestro). Los procesos del pool abren su propia conexión, así que los
+datos se confirman y se borran al terminar (no se puede revertir una
+transacción). El tiempo incluye arrancar el pool y armar el ZIP o unir el
+PDF; con --salida pdf, la unión (pypdf, en el proceso principal) es la
+parte que no escala con los procesos.
+
+Uso: python bench_por_maestro.py [--maestros 300] [--procesos 1 2 4 8] [--salida zip pdf] [--dir DIR]
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from apps.users.models import Rol, Usuario
+from apps.locations.models import ResumenDiario
+from common import por_maestro
+
+DESDE, HASTA = date(2020, 3, 1), date(2020, 3, 31)
+LOTE = 5000
+
+
+def crear_datos(maestros):
+    rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+    usuarios = Usuario.objects.bulk_create([
+        Usuario(nombre=f'Bench por maestro {i:05}', correo=f'bench-pm{i}@bench.local', password='!', rol=rol)
+        for i in range(maestros)
+    ])
+    dias = (HASTA - DESDE).days + 1
+    lote = []
+    for usuario in usuarios:
+        for d in range(dias):
+            lote.append(ResumenDiario(
+                usuario=usuario, fecha=DESDE + timedelta(days=d), minutos_retardo=d % 7,
+                tiene_retardo=d % 7 > 0, estado=ResumenDiario.Estado.TURNO_COMPLETADO,
+            ))
+            if len(lote) == LOTE:
+                ResumenDiario.objects.bulk_create(lote)
+                lote = []
+    ResumenDiario.objects.bulk_create(lote)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--maestros', type=int, default=300)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--salida', nargs='+', choices=por_maestro.SALIDAS, default=list(por_maestro.SALIDAS))
+    parser.add_argument('--dir', type=Path, default=Path('/tmp'))
+    args = parser.parse_args()
+
+    print(f'CPU disponibles: {os.cpu_count()}')
+    crear_datos(args.maestros)
+    try:
+        parametros = {'fecha_inicio': DESDE.isoformat(), 'fecha_fin': HASTA.isoformat(), 'usuario': None}
+        print(f'{"salida":>6} {"procesos":>8} {"maestros":>8} {"páginas":>8} {"total":>9} {"páginas/s":>10} {"aceleración":>12}')
+        for salida in args.salida:
+            base = None
+            for procesos in args.procesos:
+                inicio = time.perf_counter()
+                with open(args.dir / f'por_maestro.{salida}', 'wb') as destino:
+                    maestros, paginas = por_maestro.generar(parametros, destino, salida, procesos)
+                total = time.perf_counter() - inicio
+                base = base or total
+                print(f'{salida:>6} {procesos:>8} {maestros:>8} {paginas:>8} {total:>7.2f} s '
+                      f'{paginas / total:>10.1f} {base / total:>11.2f}x')
+    finally:
+        Usuario.objects.filter(correo__endswith='@bench.local', nombre__startswith='Bench por maestro').delete()
+
+
+if __name__ == '__main__':
+    main()
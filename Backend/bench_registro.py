@@ -0,0 +1,113 @@
+"""
+Benchmark de latencia del registro de asistencia (POST /api/asistencia/registrar/).
+
+Compara el registro con y sin los índices en memoria. Crea datos de prueba
+dentro de una transacción que se revierte al final, por lo que no deja
+rastro en la base de datos.
+
+Uso: python bench_registro.py [--maestros 300] [--redes 200] [--perimetros 200]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.users.models import Rol, Usuario
+from apps.locations.models import Perimetro, RedAutorizada
+from apps.locations.views import RegistrarAsistenciaView
+from common.authentication import generar_tokens
+
+LAT, LNG = '20.659698', '-103.349609'
+
+
+def crear_datos(num_maestros, num_redes, num_perimetros):
+    Perimetro.objects.update(activo=False)
+    # Campus distribuidos en una rejilla de ~2 km; el del punto de registro va al final
+    Perimetro.objects.bulk_create([
+        Perimetro(
+            nombre=f'Bench {i}', radio_metros=150,
+            latitud=round(float(LAT) + 0.02 * (i // 20 + 1), 6),
+            longitud=round(float(LNG) + 0.02 * (i % 20), 6),
+        )
+        for i in range(num_perimetros - 1)
+    ])
+    Perimetro.objects.create(nombre='Bench', latitud=LAT, longitud=LNG, radio_metros=100)
+    for i in range(num_redes):
+        RedAutorizada.objects.create(
+            nombre=f'Bench {i}', ssid=f'BENCH_{i}', bssid=f'BE:NC:00:00:{i // 256:02X}:{i % 256:02X}',
+        )
+    rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+    maestros = Usuario.objects.bulk_create([
+        Usuario(nombre=f'Bench {i}', correo=f'bench{i}@bench.local', password='!', rol=rol)
+        for i in range(num_maestros)
+    ])
+    return [generar_tokens(m)['access'] for m in maestros]
+
+
+def medir(tokens, bssid):
+    factory = APIRequestFactory()
+    vista = RegistrarAsistenciaView.as_view()
+    tiempos = []
+    consultas = 0
+    for token in tokens:
+        request = factory.post('/api/asistencia/registrar/', {
+            'tipo': 'entrada', 'latitud': LAT, 'longitud': LNG,
+            'ssid': 'BENCH_X', 'bssid': bssid,
+        }, format='json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            response = vista(request)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        assert response.status_code == 201, response.data
+        consultas += len(ctx.captured_queries)
+    return tiempos, consultas / len(tokens)
+
+
+def reportar(nombre, tiempos, consultas):
+    tiempos = sorted(tiempos)
+    p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+    print(
+        f'{nombre:<12} media={statistics.mean(tiempos):7.2f} ms  '
+        f'p50={statistics.median(tiempos):7.2f} ms  p95={p95:7.2f} ms  '
+        f'consultas/registro={consultas:.1f}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--maestros', type=int, default=300)
+    parser.add_argument('--redes', type=int, default=200)
+    parser.add_argument('--perimetros', type=int, default=200)
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        tokens = crear_datos(args.maestros * 2, args.redes, args.perimetros)
+        # Última red creada: el peor caso para una búsqueda sin índice
+        bssid = RedAutorizada.objects.order_by('-id').values_list('bssid', flat=True).first()
+
+        with override_settings(ASISTENCIA_INDICES_EN_MEMORIA=False):
+            sin_indice = medir(tokens[:args.maestros], bssid)
+        with override_settings(ASISTENCIA_INDICES_EN_MEMORIA=True):
+            con_indice = medir(tokens[args.maestros:], bssid)
+
+        transaction.set_rollback(True)
+
+    print(
+        f'Registros por modo: {args.maestros} | Redes autorizadas: {args.redes} | '
+        f'Perímetros activos: {args.perimetros}'
+    )
+    reportar('sin índice', *sin_indice)
+    reportar('con índice', *con_indice)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark de la serialización de listados: AsistenciaSerializer sobre
+instancias (con select_related) contra el camino de .values() de
+apps/locations/valores.py, en filas por segundo.
+
+Crea N asistencias (y N/10 incidencias) repartidas entre maestros dentro de
+una transacción que se revierte al final, y serializa el listado completo
+con cada camino. Verifica además que ambos produzcan el mismo JSON.
+
+Uso: python bench_serializacion.py [--filas 100000] [--maestros 200] [--repeticiones 3]
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.users.models import Rol, Usuario
+from apps.locations import valores
+from apps.locations.models import Perimetro, Asistencia, Incidencia, RedAutorizada
+from apps.locations.serializers import AsistenciaSerializer, IncidenciaSerializer
+
+LAT, LNG = '20.659698', '-103.349609'
+LOTE = 5000
+
+
+def crear_datos(filas, maestros):
+    perimetro = Perimetro.objects.create(nombre='Bench serializacion', latitud=LAT, longitud=LNG, radio_metros=100)
+    red = RedAutorizada.objects.create(nombre='Bench red', ssid='bench', bssid='AA:BB:CC:DD:EE:FF')
+    rol, _ = Rol.objects.get_or_create(nombre=Rol.Nombre.MAESTRO)
+    usuarios = Usuario.objects.bulk_create([
+        Usuario(nombre=f'Bench serializacion {i}', correo=f'bench-ser{i}@bench.local', password='!', rol=rol)
+        for i in range(maestros)
+    ])
+    inicio = timezone.make_aware(datetime(2020, 1, 6, 7, 0))
+    lote = []
+    for i in range(filas):
+        lote.append(Asistencia(
+            usuario=usuarios[i % maestros], perimetro=perimetro,
+            tipo=Asistencia.Tipo.ENTRADA if i % 2 == 0 else Asistencia.Tipo.SALIDA,
+            latitud_real=LAT, longitud_real=LNG, distancia_metros=12.5,
+            red_autorizada=red if i % 3 else None, wifi_valido=bool(i % 3),
+            fecha_hora=inicio + timedelta(minutes=i),
+        ))
+        if len(lote) == LOTE:
+            Asistencia.objects.bulk_create(lote)
+            lote = []
+    Asistencia.objects.bulk_create(lote)
+    Incidencia.objects.bulk_create([
+        Incidencia(usuario=usuarios[i % maestros], tipo=Incidencia.Tipo.RETARDO,
+                   fecha=inicio.date() + timedelta(days=i // maestros))
+        for i in range(filas // 10)
+    ])
+    return perimetro
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        datos = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), datos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--maestros', type=int, default=200)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        perimetro = crear_datos(args.filas, args.maestros)
+        asistencias = Asistencia.objects.filter(perimetro=perimetro).order_by('-fecha_hora', '-id')
+        incidencias = Incidencia.objects.filter(usuario__correo__endswith='@bench.local').order_by('-fecha', '-id')
+
+        casos = [
+            ('asistencias', asistencias.count(),
+             lambda: AsistenciaSerializer(
+                 asistencias.select_related('usuario', 'perimetro', 'red_autorizada'), many=True).data,
+             lambda: valores.asistencias(valores.consulta_asistencias(asistencias))),
+            ('incidencias', incidencias.count(),
+             lambda: IncidenciaSerializer(incidencias.select_related('usuario'), many=True).data,
+             lambda: valores.incidencias(valores.consulta_incidencias(incidencias))),
+        ]
+        print(f'{"listado":>12} {"filas":>8} {"serializer":>14} {"values":>14} {"aceleración":>12}')
+        for nombre, filas, por_serializer, por_valores in casos:
+            t_serializer, esperado = medir(por_serializer, args.repeticiones)
+            t_valores, obtenido = medir(por_valores, args.repeticiones)
+            assert JSONRenderer().render(obtenido) == JSONRenderer().render(esperado), nombre
+            print(f'{nombre:>12} {filas:>8} {filas / t_serializer:>10.0f} f/s '
+                  f'{filas / t_valores:>10.0f} f/s {t_serializer / t_valores:>11.1f}x')
+
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
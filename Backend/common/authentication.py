@@ -23,6 +23,23 @@ def generar_tokens(usuario):
     }
 
 
+def _token_del_header(request):
+    """Token Bearer del header Authorization, o None si no viene."""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+
+def _usuario_id_del_token(token_str):
+    """Valida el token y retorna (token, usuario_id)."""
+    token = AccessToken(token_str)
+    usuario_id = token.get('usuario_id')
+    if usuario_id is None:
+        raise AuthenticationFailed('Token inválido: no contiene usuario_id.')
+    return token, usuario_id
+
+
 class JWTAuthenticationCustom(BaseAuthentication):
     """
     Autenticación que lee el token JWT del header Authorization,
@@ -30,17 +47,12 @@ class JWTAuthenticationCustom(BaseAuthentication):
     """
 
     def authenticate(self, request):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token_str = _token_del_header(request)
+        if token_str is None:
             return None
 
-        token_str = auth_header.split(' ')[1]
-
         try:
-            token = AccessToken(token_str)
-            usuario_id = token.get('usuario_id')
-            if usuario_id is None:
-                raise AuthenticationFailed('Token inválido: no contiene usuario_id.')
+            token, usuario_id = _usuario_id_del_token(token_str)
 
             usuario = Usuario.objects.select_related('rol').get(id=usuario_id)
 
@@ -55,3 +67,33 @@ class JWTAuthenticationCustom(BaseAuthentication):
             raise AuthenticationFailed('Usuario no encontrado.')
         except Exception as e:
             raise AuthenticationFailed(f'Token inválido: {str(e)}')
+
+
+class JWTAuthenticationAsync:
+    """
+    Misma validación que JWTAuthenticationCustom para las vistas async
+    (ASGI), con el ORM asíncrono: no bloquea el event loop mientras se
+    carga el usuario. Trabaja sobre el HttpRequest de Django.
+    """
+
+    async def autenticar(self, request):
+        """Retorna el usuario (y lo inyecta en request.usuario) o None si no hay token."""
+        token_str = _token_del_header(request)
+        if token_str is None:
+            return None
+
+        try:
+            _, usuario_id = _usuario_id_del_token(token_str)
+
+            usuario = await Usuario.objects.select_related('rol').aget(id=usuario_id)
+
+            if not usuario.activo:
+                raise AuthenticationFailed('Usuario desactivado.')
+
+            request.usuario = usuario
+            return usuario
+
+        except Usuario.DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado.')
+        except Exception as e:
+            raise AuthenticationFailed(f'Token inválido: {str(e)}')
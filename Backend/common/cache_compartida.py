@@ -0,0 +1,42 @@
+"""
+¿Ven todos los procesos la misma cache?
+
+Los índices en memoria (apps/locations/indices.py), el estado del día, los
+horarios compilados y las marcas de cambio (ETag y caché de reportes) se
+invalidan escribiendo en la cache de Django. Con una cache local al proceso
+(locmem, dummy) esa escritura solo la ve el worker que la hizo: con
+gunicorn -w N los demás seguirían sirviendo datos viejos. Sin cache
+compartida esos mecanismos se desactivan o se degradan a algo seguro, y el
+chequeo de arranque lo avisa.
+
+CACHE_UN_SOLO_PROCESO=True declara que el servidor corre en un solo proceso
+(runserver, uvicorn sin --workers, las pruebas): ahí locmem sí es válida.
+"""
+from django.conf import settings
+from django.core import checks
+
+LOCALES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def compartida():
+    """True si una escritura en la cache la ven todos los procesos del servidor."""
+    return settings.CACHE_UN_SOLO_PROCESO or settings.CACHES['default']['BACKEND'] not in LOCALES
+
+
+def revisar(app_configs=None, **kwargs):
+    """Chequeo de sistema: avisa si la cache es local al proceso."""
+    if compartida():
+        return []
+    return [checks.Warning(
+        'La cache por defecto es local al proceso.',
+        hint=(
+            'Con varios workers, configura CACHE_URL con Redis o Memcached. Mientras tanto, los índices en '
+            'memoria se reconstruyen cada pocos segundos, el estado del día y los horarios se leen de la base '
+            'de datos, no hay ETag ni caché de reportes y una llave de idempotencia solo se reconoce en el '
+            'worker que la vio. Con un solo proceso, CACHE_UN_SOLO_PROCESO=True.'
+        ),
+        id='locations.W001',
+    )]
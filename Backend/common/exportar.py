@@ -0,0 +1,309 @@
+"""
+Exportación de asistencias, incidencias y el resumen por maestro en CSV y
+XLSX, en streaming.
+
+Las filas salen de un cursor del servidor (.iterator(); en PostgreSQL, un
+cursor con nombre) y se escriben por bloques de FILAS_POR_BLOQUE: los
+primeros bytes salen de inmediato y en memoria solo hay un bloque. Bajo
+WSGI la vista es ExportarView (common/views.py); bajo ASGI,
+ExportarAsyncView, que entrega un iterador async (con uno síncrono,
+StreamingHttpResponse leería el archivo completo antes de enviarlo).
+
+El XLSX se arma sin dependencias: es un ZIP con las partes mínimas de un
+libro de Excel y una hoja con texto en línea (sin tabla de cadenas
+compartidas), escrito con zipfile sobre una salida que no permite seek. La
+hoja usa ZIP64 para pasar de 4 GB sin comprimir.
+
+Los meses archivados no se exportan desde aquí: ya están en CSV en
+ASISTENCIA_ARCHIVO_DIR (ver apps/locations/archivo.py).
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from apps.locations import resumen
+from apps.locations.models import Asistencia, Incidencia, TrabajoReporte
+
+Tipo = TrabajoReporte.Tipo
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+FILAS_POR_CONSULTA = 2000
+FILAS_POR_BLOQUE = 1000
+
+# (encabezado, campo de values_list)
+COLUMNAS = {
+    Tipo.ASISTENCIA: [
+        ('id', 'id'),
+        ('usuario', 'usuario'),
+        ('usuario_nombre', 'usuario__nombre'),
+        ('usuario_correo', 'usuario__correo'),
+        ('fecha', 'fecha_local'),
+        ('fecha_hora', 'fecha_hora'),
+        ('tipo', 'tipo'),
+        ('valido', 'valido'),
+        ('perimetro_nombre', 'perimetro__nombre'),
+        ('distancia_metros', 'distancia_metros'),
+        ('latitud_real', 'latitud_real'),
+        ('longitud_real', 'longitud_real'),
+        ('wifi_valido', 'wifi_valido'),
+        ('ssid_conectado', 'ssid_conectado'),
+        ('bssid_conectado', 'bssid_conectado'),
+        ('red_nombre', 'red_autorizada__nombre'),
+    ],
+    Tipo.INCIDENCIAS: [
+        ('id', 'id'),
+        ('usuario', 'usuario'),
+        ('usuario_nombre', 'usuario__nombre'),
+        ('usuario_correo', 'usuario__correo'),
+        ('fecha', 'fecha'),
+        ('tipo', 'tipo'),
+        ('descripcion', 'descripcion'),
+        ('created_at', 'created_at'),
+    ],
+    # Una fila por maestro (resumen.totales_por_maestro)
+    Tipo.RESUMEN: [
+        ('usuario', 'id'),
+        ('usuario_nombre', 'nombre'),
+        ('usuario_correo', 'correo'),
+        *((campo, campo) for campo in resumen.CAMPOS_TOTALES[3:]),
+    ],
+}
+
+
+def encabezados(tipo):
+    return [encabezado for encabezado, _ in COLUMNAS[tipo]]
+
+
+def consulta(tipo, parametros):
+    """
+    Filas (tuplas) de la exportación con los filtros de los reportes PDF, en
+    orden cronológico; las del resumen, por nombre del maestro.
+    """
+    campos = [campo for _, campo in COLUMNAS[tipo]]
+    if tipo == Tipo.RESUMEN:
+        return resumen.totales_por_maestro(
+            parametros['fecha_inicio'], parametros['fecha_fin'], parametros['usuario'],
+        ).values_list(*campos)
+    if tipo == Tipo.ASISTENCIA:
+        qs, campo_fecha, orden = Asistencia.objects.all(), 'fecha_local', ('fecha_hora', 'id')
+    else:
+        qs, campo_fecha, orden = Incidencia.objects.all(), 'fecha', ('fecha', 'id')
+    if parametros['usuario']:
+        qs = qs.filter(usuario_id=parametros['usuario'])
+    if parametros['fecha_inicio']:
+        qs = qs.filter(**{f'{campo_fecha}__gte': parametros['fecha_inicio']})
+    if parametros['fecha_fin']:
+        qs = qs.filter(**{f'{campo_fecha}__lte': parametros['fecha_fin']})
+    return qs.order_by(*orden).values_list(*campos)
+
+
+def leer_formato(query_params):
+    formato = query_params.get('formato') or 'csv'
+    if formato not in FORMATOS:
+        raise ValidationError({'formato': f'Formato no soportado; usa {" o ".join(FORMATOS)}.'})
+    return formato
+
+
+def nombre_archivo(tipo, parametros, formato):
+    return f'{tipo}_{parametros["fecha_inicio"] or "completo"}.{formato}'
+
+
+def respuesta(tipo, parametros, formato, contenido):
+    """StreamingHttpResponse del archivo; `contenido` viene de en_streaming o aen_streaming."""
+    return StreamingHttpResponse(
+        contenido,
+        content_type=FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename="{nombre_archivo(tipo, parametros, formato)}"'},
+    )
+
+
+def _texto(valor):
+    """Valor de celda como texto: fechas en ISO (fecha_hora en hora local), None vacío."""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+# ──────────────────────────────────────────────
+# ESCRITORES
+# ──────────────────────────────────────────────
+
+class EscritorCSV:
+    """CSV en UTF-8 con BOM (Excel lo abre con acentos)."""
+
+    def __init__(self, encabezados):
+        self._encabezados = encabezados
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+
+    def _vaciar(self):
+        datos = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return datos.encode('utf-8')
+
+    def inicio(self):
+        self._buffer.write('\ufeff')
+        self._csv.writerow(self._encabezados)
+        return self._vaciar()
+
+    def escribir(self, filas):
+        self._csv.writerows([_texto(valor) for valor in fila] for fila in filas)
+        return self._vaciar()
+
+    def fin(self):
+        return b''
+
+
+class _Salida:
+    """Destino de zipfile sin seek: junta lo escrito hasta que se vacía."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_NS_PAQUETE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+# Caracteres que XML 1.0 no admite (pueden venir en una descripción)
+_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _celda(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_NO_XML.sub("", _texto(valor)))}</t></is></c>'
+
+
+def _fila_xml(fila):
+    return '<row>' + ''.join(_celda(valor) for valor in fila) + '</row>'
+
+
+class EscritorXLSX:
+    """Libro de Excel con una hoja: encabezados en la primera fila, una fila por registro."""
+
+    def __init__(self, encabezados, hoja='Datos'):
+        self._encabezados = encabezados
+        self._hoja_nombre = hoja
+        self._salida = _Salida()
+        self._zip = zipfile.ZipFile(self._salida, 'w', zipfile.ZIP_DEFLATED)
+        self._hoja = None
+
+    def inicio(self):
+        for nombre, contenido in _PARTES_XLSX.items():
+            self._zip.writestr(nombre, contenido)
+        self._zip.writestr('xl/workbook.xml', (
+            _XML + f'<workbook xmlns="{_NS}" xmlns:r="{_NS_REL}"><sheets>'
+            f'<sheet name="{escape(self._hoja_nombre)}" sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        ))
+        self._hoja = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._hoja.write((_XML + f'<worksheet xmlns="{_NS}"><sheetData>' + _fila_xml(self._encabezados)).encode())
+        return self._salida.vaciar()
+
+    def escribir(self, filas):
+        self._hoja.write(''.join(_fila_xml(fila) for fila in filas).encode())
+        return self._salida.vaciar()
+
+    def fin(self):
+        self._hoja.write(b'</sheetData></worksheet>')
+        self._hoja.close()
+        self._zip.close()
+        return self._salida.vaciar()
+
+
+def escritor(tipo, formato):
+    if formato == 'xlsx':
+        return EscritorXLSX(encabezados(tipo), hoja=Tipo(tipo).label)
+    return EscritorCSV(encabezados(tipo))
+
+
+# ──────────────────────────────────────────────
+# STREAMING
+# ──────────────────────────────────────────────
+
+def en_streaming(escritor, filas):
+    """Bytes del archivo por bloques, a partir de un iterador de tuplas (.iterator() del ORM)."""
+    yield escritor.inicio()
+    while bloque := list(islice(filas, FILAS_POR_BLOQUE)):
+        # Comprimido, un bloque puede no producir bytes todavía
+        if datos := escritor.escribir(bloque):
+            yield datos
+    if datos := escritor.fin():
+        yield datos
+
+
+async def aen_streaming(escritor, filas):
+    """
+    Igual que en_streaming, para vistas async: cada bloque de `filas` se lee
+    con sync_to_async, siempre en el mismo hilo (el del cursor). No se usa
+    .aiterator(): con values_list ejecuta la consulta en el event loop.
+    """
+    siguiente_bloque = sync_to_async(lambda: list(islice(filas, FILAS_POR_BLOQUE)))
+    yield escritor.inicio()
+    while bloque := await siguiente_bloque():
+        if datos := escritor.escribir(bloque):
+            yield datos
+    if datos := escritor.fin():
+        yield datos
@@ -0,0 +1,151 @@
+"""
+Llaves de idempotencia (header Idempotency-Key) para POST que la app
+reintenta en redes inestables.
+
+La primera petición con una llave la reserva en la cache y, si responde
+2xx, se guarda (huella del cuerpo, status, JSON) por TTL_RESPUESTA. Un
+reintento con la misma llave recibe la respuesta guardada sin volver a
+ejecutar la vista. Las llaves son por usuario; las respuestas de error no
+se guardan, para que el reintento vuelva a validar.
+
+La reserva necesita una cache compartida: con locmem y varios workers, un
+reintento que llega a otro worker no ve la llave y se ejecuta de nuevo (el
+chequeo de arranque de common/cache_compartida.py lo avisa).
+"""
+import functools
+import hashlib
+import inspect
+import json
+
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+CABECERA = 'Idempotency-Key'
+LONGITUD_MAX = 255
+# Tiempo que se conserva la respuesta y el que dura la reserva mientras se procesa
+TTL_RESPUESTA = 24 * 3600
+TTL_EN_PROCESO = 60
+
+
+class SolicitudEnProceso(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Ya se está procesando una solicitud con esta Idempotency-Key.'
+
+
+class LlaveReutilizada(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'La Idempotency-Key ya se usó con un cuerpo distinto.'
+
+
+def leer_llave(request):
+    """Valor del header o None; rechaza llaves vacías o demasiado largas."""
+    llave = request.headers.get(CABECERA)
+    if llave is None:
+        return None
+    llave = llave.strip()
+    if not llave or len(llave) > LONGITUD_MAX or not llave.isprintable():
+        raise ValidationError({CABECERA: f'Debe tener entre 1 y {LONGITUD_MAX} caracteres imprimibles.'})
+    return llave
+
+
+def _clave(alcance, usuario_id, llave):
+    return f'idempotencia:{alcance}:{usuario_id}:{hashlib.sha256(llave.encode()).hexdigest()[:32]}'
+
+
+def _huella(request):
+    """Hash corto del cuerpo, para detectar la misma llave con otro contenido."""
+    if isinstance(request, Request):
+        cuerpo = json.dumps(request.data, sort_keys=True, cls=JSONEncoder).encode()
+    else:
+        cuerpo = request.body
+    return hashlib.sha256(cuerpo).hexdigest()[:16]
+
+
+def _resolver(guardado, huella):
+    """
+    Interpreta lo que hay en la cache para la llave.
+    Retorna (status, datos) a repetir, o lanza si la llave no se puede usar.
+    """
+    huella_guardada, codigo, contenido = guardado
+    if huella_guardada != huella:
+        raise LlaveReutilizada()
+    if codigo is None:
+        raise SolicitudEnProceso()
+    return codigo, json.loads(contenido)
+
+
+def _contenido(response):
+    """La respuesta como texto JSON (compacto y sin referencias al serializer)."""
+    if hasattr(response, 'data'):
+        return json.dumps(response.data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return response.content.decode()
+
+
+def _repetir(request, codigo, datos):
+    cabeceras = {'Idempotent-Replayed': 'true'}
+    if isinstance(request, Request):
+        return Response(datos, status=codigo, headers=cabeceras)
+    return JsonResponse(
+        datos, status=codigo, safe=False, headers=cabeceras, json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def idempotente(alcance):
+    """
+    Decorador para el handler POST de una vista (APIView o vista async).
+    `alcance` separa las llaves de distintos endpoints. Requiere request.usuario.
+    """
+    def decorador(handler):
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def envoltura_async(self, request, *args, **kwargs):
+                llave = leer_llave(request)
+                if llave is None:
+                    return await handler(self, request, *args, **kwargs)
+                clave, huella = _clave(alcance, request.usuario.id, llave), _huella(request)
+                if not await cache.aadd(clave, (huella, None, None), TTL_EN_PROCESO):
+                    guardado = await cache.aget(clave)
+                    if guardado is not None:
+                        return _repetir(request, *_resolver(guardado, huella))
+                    await cache.aset(clave, (huella, None, None), TTL_EN_PROCESO)
+                try:
+                    response = await handler(self, request, *args, **kwargs)
+                except BaseException:
+                    await cache.adelete(clave)
+                    raise
+                if 200 <= response.status_code < 300:
+                    await cache.aset(clave, (huella, response.status_code, _contenido(response)), TTL_RESPUESTA)
+                else:
+                    await cache.adelete(clave)
+                return response
+            return envoltura_async
+
+        @functools.wraps(handler)
+        def envoltura(self, request, *args, **kwargs):
+            llave = leer_llave(request)
+            if llave is None:
+                return handler(self, request, *args, **kwargs)
+            clave, huella = _clave(alcance, request.usuario.id, llave), _huella(request)
+            if not cache.add(clave, (huella, None, None), TTL_EN_PROCESO):
+                guardado = cache.get(clave)
+                if guardado is not None:
+                    return _repetir(request, *_resolver(guardado, huella))
+                # Expiró entre add y get: se toma la reserva
+                cache.set(clave, (huella, None, None), TTL_EN_PROCESO)
+            try:
+                response = handler(self, request, *args, **kwargs)
+            except BaseException:
+                cache.delete(clave)
+                raise
+            if 200 <= response.status_code < 300:
+                cache.set(clave, (huella, response.status_code, _contenido(response)), TTL_RESPUESTA)
+            else:
+                cache.delete(clave)
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,172 @@
+"""
+Marcas de cambio por alcance y GET condicional (ETag / If-None-Match).
+
+Cada alcance ('redes', 'panel:2026-03-02', 'historial:7', ...) tiene en la
+cache un token que se reemplaza al confirmarse cualquier escritura que lo
+afecte. El ETag de una respuesta es el hash de los tokens de los alcances
+de los que depende, la URL completa, el Accept y el usuario. Si el cliente
+manda ese ETag en If-None-Match se responde 304 sin ejecutar la vista:
+leer las marcas es una sola lectura de la cache.
+
+Las marcas se avanzan solo al confirmar la transacción; avanzarlas antes
+permitiría que un lector asocie el ETag nuevo a los datos anteriores. Si
+la cache pierde un token se crea otro: el cliente recibe una vez la
+respuesta completa, nunca una obsoleta.
+
+Si la cache es local al proceso (ver common/cache_compartida.py), el token
+nuevo solo lo vería el worker que hizo el cambio y otro podría responder
+304 con datos viejos: sin cache compartida no se usan ETag.
+"""
+import functools
+import hashlib
+import inspect
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from common import cache_compartida
+
+PREFIJO = 'marca'
+TTL_SEGUNDOS = 30 * 24 * 3600
+
+# Alcances globales
+REDES = 'redes'
+PERIMETROS = 'perimetros'
+MAESTROS = 'maestros'
+HORARIOS = 'horarios'
+
+
+def panel(fecha):
+    """Panel de supervisión de una fecha (asistencias e incidencias del día)."""
+    return f'panel:{fecha}'
+
+
+def mes(fecha):
+    """Todos los registros de un mes ('2026-03'); lo usan los reportes de períodos largos."""
+    return f'mes:{str(fecha)[:7]}'
+
+
+def historial(usuario_id):
+    return f'historial:{usuario_id}'
+
+
+def horario(usuario_id):
+    return f'horario:{usuario_id}'
+
+
+def dias(pares):
+    """Alcances que cambian con los registros de los pares (usuario_id, fecha)."""
+    alcances = set()
+    for usuario_id, fecha in pares:
+        alcances.update((panel(fecha), mes(fecha), historial(usuario_id)))
+    return alcances
+
+
+def _clave(alcance):
+    return f'{PREFIJO}:{alcance}'
+
+
+def _token():
+    return uuid.uuid4().hex
+
+
+# ──────────────────────────────────────────────
+# LEER Y AVANZAR
+# ──────────────────────────────────────────────
+
+def tokens(alcances):
+    """Token actual de cada alcance (en el orden dado); crea los que falten."""
+    claves = [_clave(a) for a in alcances]
+    actuales = cache.get_many(claves)
+    faltantes = [c for c in claves if c not in actuales]
+    if faltantes:
+        for c in faltantes:
+            cache.add(c, _token(), TTL_SEGUNDOS)
+        # Otro proceso pudo crearlo primero: vale el que quedó en la cache
+        actuales.update(cache.get_many(faltantes))
+    # Sin token (cache que no guarda nada): uno nuevo, que nunca coincide
+    return [actuales.get(c) or _token() for c in claves]
+
+
+async def atokens(alcances):
+    claves = [_clave(a) for a in alcances]
+    actuales = await cache.aget_many(claves)
+    faltantes = [c for c in claves if c not in actuales]
+    if faltantes:
+        for c in faltantes:
+            await cache.aadd(c, _token(), TTL_SEGUNDOS)
+        actuales.update(await cache.aget_many(faltantes))
+    return [actuales.get(c) or _token() for c in claves]
+
+
+def avanzar(*alcances):
+    """Reemplaza el token de los alcances cuando se confirme la transacción actual."""
+    if not alcances:
+        return
+    nuevos = {_clave(a): _token() for a in alcances}
+    transaction.on_commit(lambda: cache.set_many(nuevos, TTL_SEGUNDOS))
+
+
+# ──────────────────────────────────────────────
+# GET CONDICIONAL
+# ──────────────────────────────────────────────
+
+def _etag(request, tokens_actuales):
+    partes = [
+        request.get_full_path(),
+        request.headers.get('Accept', ''),
+        str(request.usuario.id),
+        *tokens_actuales,
+    ]
+    return '"%s"' % hashlib.sha256('\n'.join(partes).encode()).hexdigest()[:32]
+
+
+def _coincide(request, etag):
+    cabecera = request.headers.get('If-None-Match')
+    return bool(cabecera) and etag in parse_etags(cabecera)
+
+
+def _no_modificado(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def con_etag(alcances):
+    """
+    Decorador para el handler GET de una vista (APIView, ViewSet o vista
+    async). `alcances(vista, request, *args, **kwargs)` retorna los alcances
+    de los que depende la respuesta. Requiere request.usuario; solo las
+    respuestas 200 llevan ETag, y ninguna sin cache compartida.
+    """
+    def decorador(handler):
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def envoltura_async(self, request, *args, **kwargs):
+                if not cache_compartida.compartida():
+                    return await handler(self, request, *args, **kwargs)
+                etag = _etag(request, await atokens(alcances(self, request, *args, **kwargs)))
+                if _coincide(request, etag):
+                    return _no_modificado(etag)
+                response = await handler(self, request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                return response
+            return envoltura_async
+
+        @functools.wraps(handler)
+        def envoltura(self, request, *args, **kwargs):
+            if not cache_compartida.compartida():
+                return handler(self, request, *args, **kwargs)
+            etag = _etag(request, tokens(alcances(self, request, *args, **kwargs)))
+            if _coincide(request, etag):
+                return _no_modificado(etag)
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,145 @@
+"""
+Paginación por llave (keyset) para listados grandes ordenados por fecha.
+
+Por defecto se comporta como PageNumberPagination (?page=N, con count).
+Con ?paginacion=cursor la primera página y los enlaces `next` usan un
+cursor opaco con la última llave (campo, id) vista: cada página es un
+WHERE (campo, id) < (llave) ORDER BY campo DESC, id DESC LIMIT n, sin
+COUNT ni OFFSET, así que la página N cuesta lo mismo que la primera.
+
+El total es opcional (?total=aproximado): en PostgreSQL es la estimación
+del planificador para la consulta filtrada (EXPLAIN), sin recorrer la
+tabla; en otros motores, un COUNT.
+
+completar() intercala filas de otra fuente con el mismo orden (el
+historial, las asistencias archivadas): el cursor sigue avanzando por
+ellas cuando la base de datos ya no tiene más.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError as ErrorDeValidacion
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginacionPorLlave(PageNumberPagination):
+    """Las subclases definen `campo`: el orden es (-campo, -id)."""
+    campo = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limite'
+    max_page_size = 500
+
+    @classmethod
+    def solicitada(cls, request):
+        """True si el cliente pidió la paginación por llave."""
+        params = request.query_params
+        return params.get('paginacion') == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.por_llave = self.solicitada(request)
+        if not self.por_llave:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limite = limite = self.get_page_size(request)
+        ordenado = queryset.order_by(f'-{self.campo}', '-id')
+        self.llave = None
+        if params.get(self.cursor_query_param):
+            self.llave = self._decodificar(queryset.model, params[self.cursor_query_param])
+            ordenado = ordenado.filter(self._despues_de(self.llave))
+        self.total = total_aproximado(queryset) if params.get('total') == 'aproximado' else None
+
+        pagina = list(ordenado[:limite + 1])
+        self.siguiente = self._codificar(self._llave_de(pagina[limite - 1])) if len(pagina) > limite else None
+        return pagina[:limite]
+
+    def completar(self, pagina, datos, buscar):
+        """
+        Intercala en la página filas de otra fuente con el mismo orden.
+        `datos` es `pagina` ya serializada. buscar(menor_que, mayor_que, limite)
+        retorna tuplas (valor, id, dato) de la otra fuente con llave entre
+        mayor_que y menor_que (exclusivo, None = sin límite), en orden
+        descendente. Si la base de datos tiene más filas, mayor_que es la
+        última llave de la página: lo anterior va en las páginas siguientes.
+        Retorna los datos de la página y ajusta el cursor siguiente.
+        """
+        mayor_que = self._llave_de(pagina[-1]) if self.siguiente else None
+        otras = buscar(self.llave, mayor_que, self.limite + 1)
+        if not otras:
+            return datos
+        filas = sorted(
+            [*((*self._llave_de(fila), dato) for fila, dato in zip(pagina, datos)), *otras],
+            key=lambda fila: fila[:2], reverse=True,
+        )
+        if self.siguiente or len(filas) > self.limite:
+            self.siguiente = self._codificar(filas[self.limite - 1][:2])
+        return [dato for _, _, dato in filas[:self.limite]]
+
+    def get_paginated_response(self, data):
+        if not self.por_llave:
+            return super().get_paginated_response(data)
+        respuesta = {'next': self.get_next_link(), 'results': data}
+        if self.total is not None:
+            respuesta['total_aproximado'] = self.total
+        return Response(respuesta)
+
+    def get_next_link(self):
+        if not self.por_llave:
+            return super().get_next_link()
+        if self.siguiente is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.siguiente)
+
+    # ──────────────────────────────────────────────
+    # CURSOR
+    # ──────────────────────────────────────────────
+
+    def _llave_de(self, fila):
+        # Instancia del modelo o fila de .values()
+        if isinstance(fila, dict):
+            return fila[self.campo], fila['id']
+        return getattr(fila, self.campo), fila.id
+
+    def _codificar(self, llave):
+        valor, id_ = llave
+        return base64.urlsafe_b64encode(json.dumps([valor.isoformat(), id_]).encode()).decode()
+
+    def _decodificar(self, modelo, cursor):
+        """Cursor → llave (valor, id); 400 si no es válido."""
+        try:
+            valor, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            valor = modelo._meta.get_field(self.campo).to_python(valor)
+            if valor is not None and isinstance(id_, int):
+                return valor, id_
+        except (ValueError, TypeError, ErrorDeValidacion):
+            pass
+        raise ValidationError({self.cursor_query_param: 'Cursor inválido.'})
+
+    def _despues_de(self, llave):
+        """Condición para las filas que siguen a la llave en el orden descendente."""
+        valor, id_ = llave
+        return Q(**{f'{self.campo}__lt': valor}) | Q(**{self.campo: valor, 'id__lt': id_})
+
+
+def total_aproximado(queryset):
+    """Filas estimadas por el planificador de PostgreSQL (COUNT exacto en otros motores)."""
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginacionAsistencias(PaginacionPorLlave):
+    campo = 'fecha_hora'
+
+
+class PaginacionIncidencias(PaginacionPorLlave):
+    campo = 'fecha'
@@ -0,0 +1,123 @@
+"""
+Reportes de asistencia por maestro, en paralelo.
+
+Un PDF por maestro (generar_reporte_asistencia con sus filas de
+ResumenDiario) para el período; entra cada maestro activo y cualquiera con
+días registrados en el período. Los maestros se reparten en particiones
+contiguas (varias por proceso, para equilibrar la carga) y cada partición se
+genera en un proceso del pool: ReportLab no suelta el GIL, así que los hilos
+no sirven aquí. Los procesos se crean con `spawn` (no heredan conexiones ni
+los hilos del servidor) y abren su propia conexión a la base de datos.
+
+El resultado es un ZIP con un PDF por maestro o un solo PDF con un marcador
+por maestro; la unión la hace pypdf en el proceso que llama, copiando las
+páginas ya generadas sin volver a dibujarlas.
+
+Lo usan el trabajo de reporte de tipo `por_maestro` (common/trabajos.py) y
+`manage.py reportes_por_maestro`.
+"""
+import math
+import multiprocessing
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from pathlib import Path
+
+import django
+from django.utils.text import slugify
+from pypdf import PdfReader, PdfWriter
+
+from apps.locations import resumen
+from apps.locations.models import ResumenDiario
+from apps.users.models import Usuario
+from common.reportes import CAMPOS_ASISTENCIA, FILAS_POR_CONSULTA, generar_reporte_asistencia
+
+SALIDAS = ('zip', 'pdf')
+# Particiones por proceso: más pequeñas reparten mejor los maestros con muchos días
+PARTICIONES_POR_PROCESO = 4
+
+
+def _resumenes(parametros):
+    """ResumenDiario del período."""
+    qs = ResumenDiario.objects.all()
+    if parametros['fecha_inicio']:
+        qs = qs.filter(fecha__gte=parametros['fecha_inicio'])
+    if parametros['fecha_fin']:
+        qs = qs.filter(fecha__lte=parametros['fecha_fin'])
+    return qs
+
+
+def maestros(parametros):
+    """(id, nombre) de los maestros del reporte, por nombre."""
+    if parametros['usuario']:
+        qs = Usuario.objects.filter(id=parametros['usuario'])
+    else:
+        qs = resumen.maestros_del_periodo(parametros['fecha_inicio'], parametros['fecha_fin'])
+    return list(qs.order_by('nombre', 'id').values_list('id', 'nombre'))
+
+
+def particionar(elementos, procesos):
+    """Parte la lista en bloques contiguos, PARTICIONES_POR_PROCESO por proceso."""
+    tamano = max(1, math.ceil(len(elementos) / (procesos * PARTICIONES_POR_PROCESO)))
+    return [elementos[i:i + tamano] for i in range(0, len(elementos), tamano)]
+
+
+def _inicializar():
+    # Con spawn el proceso arranca sin apps cargadas
+    django.setup()
+
+
+def _renderizar(particion, parametros, directorio):
+    """Genera el PDF de cada maestro de la partición en `directorio`. Retorna [(id, nombre, páginas)]."""
+    generados = []
+    for usuario_id, nombre in particion:
+        qs = _resumenes(parametros).filter(usuario_id=usuario_id)
+        with generar_reporte_asistencia(
+            qs.order_by('fecha').values(*CAMPOS_ASISTENCIA).iterator(chunk_size=FILAS_POR_CONSULTA),
+            resumen.totales_reporte(qs),
+            titulo=f'Reporte de Asistencia — {nombre}',
+            fecha_inicio=parametros['fecha_inicio'],
+            fecha_fin=parametros['fecha_fin'],
+        ) as pdf, open(Path(directorio) / f'{usuario_id}.pdf', 'w+b') as destino:
+            shutil.copyfileobj(pdf, destino)
+            generados.append((usuario_id, nombre, len(PdfReader(destino).pages)))
+    return generados
+
+
+def nombre_pdf(usuario_id, nombre):
+    return f'{slugify(nombre) or "maestro"}_{usuario_id}.pdf'
+
+
+def generar(parametros, destino, salida='zip', procesos=1):
+    """
+    Escribe en `destino` (archivo binario) el ZIP o el PDF unido de los
+    maestros del período, generando sus PDF en `procesos` procesos. Con
+    procesos=1 todo ocurre en este proceso (y en su transacción).
+    Retorna (maestros, páginas).
+    """
+    lista = maestros(parametros)
+    with tempfile.TemporaryDirectory() as directorio:
+        particiones = particionar(lista, procesos)
+        if procesos == 1 or len(particiones) <= 1:
+            resultados = [_renderizar(p, parametros, directorio) for p in particiones]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=procesos, mp_context=multiprocessing.get_context('spawn'), initializer=_inicializar,
+            ) as pool:
+                resultados = list(pool.map(_renderizar, particiones, repeat(parametros), repeat(directorio)))
+        # Las particiones son contiguas: el orden por nombre se conserva
+        generados = list(chain.from_iterable(resultados))
+
+        if salida == 'zip':
+            # ReportLab ya comprime las páginas
+            with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as zip_:
+                for usuario_id, nombre, _ in generados:
+                    zip_.write(Path(directorio) / f'{usuario_id}.pdf', nombre_pdf(usuario_id, nombre))
+        else:
+            unido = PdfWriter()
+            for usuario_id, nombre, _ in generados:
+                unido.append(Path(directorio) / f'{usuario_id}.pdf', outline_item=nombre)
+            unido.write(destino)
+    return len(generados), sum(paginas for _, _, paginas in generados)
@@ -2,23 +2,149 @@
 Generación de reportes PDF con ReportLab.
 """
 import io
+import tempfile
 from datetime import date
+from itertools import islice
+from django.utils import timezone
+from pypdf import PdfWriter
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from apps.locations.models import ResumenDiario
 
 
-def generar_reporte_asistencia(asistencias, titulo="Reporte de Asistencia", fecha_inicio=None, fecha_fin=None):
+PAGINA_ASISTENCIA = landscape(letter)
+# Filas que se traen de la base de datos por vuelta al recorrer el reporte
+FILAS_POR_CONSULTA = 2000
+# Páginas que ReportLab tiene en memoria a la vez (un bloque) en el reporte de asistencia
+PAGINAS_POR_BLOQUE = 50
+# Un bloque de páginas se queda en memoria hasta este tamaño; si no, va a disco
+BLOQUE_EN_MEMORIA = 4 * 1024 * 1024
+
+# Campos de .values() que usa generar_reporte_asistencia
+CAMPOS_ASISTENCIA = (
+    'usuario__nombre', 'fecha', 'entrada__fecha_hora', 'entrada__valido',
+    'salida__fecha_hora', 'salida__valido', 'minutos_retardo', 'minutos_salida_temprana', 'estado',
+)
+CABECERA_ASISTENCIA = ['#', 'Maestro', 'Fecha', 'Entrada', 'Salida', 'Retardo (min)', 'Salida temprana (min)', 'Estado']
+ESTILO_TABLA_ASISTENCIA = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
+])
+ESTADOS = dict(ResumenDiario.Estado.choices)
+
+
+def _hora(fecha_hora, valido):
+    if not fecha_hora:
+        return '-'
+    hora = timezone.localtime(fecha_hora).strftime('%H:%M')
+    return hora if valido else f"{hora} (inválida)"
+
+
+def _fila_asistencia(i, r):
+    return [
+        str(i),
+        r['usuario__nombre'],
+        r['fecha'].strftime('%d/%m/%Y'),
+        _hora(r['entrada__fecha_hora'], r['entrada__valido']),
+        _hora(r['salida__fecha_hora'], r['salida__valido']),
+        str(r['minutos_retardo'] or '-'),
+        str(r['minutos_salida_temprana'] or '-'),
+        ESTADOS.get(r['estado'], r['estado']),
+    ]
+
+
+def _marco(pagina):
+    """Área útil de la página, con los márgenes de SimpleDocTemplate (0.5 in arriba)."""
+    ancho, alto = pagina
+    return Frame(inch, inch, ancho - 2 * inch, alto - 1.5 * inch)
+
+
+def _area(pagina):
+    """Ancho y alto disponibles dentro de _marco(pagina) (descontando el relleno de 6 pt)."""
+    ancho, alto = pagina
+    return ancho - 2 * inch - 12, alto - 1.5 * inch - 12
+
+
+def _alto(flowables, ancho, alto):
+    return sum(f.wrap(ancho, alto)[1] + f.getSpaceBefore() + f.getSpaceAfter() for f in flowables)
+
+
+def _filas_por_pagina(encabezado, muestra):
     """
-    Genera un PDF con la tabla de asistencias.
-    Retorna un buffer BytesIO con el PDF.
+    Filas de la tabla que caben en la primera página (debajo de `encabezado`)
+    y en las siguientes. Las celdas son texto de una línea: todas las filas
+    miden lo mismo que `muestra`.
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=0.5 * inch)
-    elements = []
+    ancho, alto = _area(PAGINA_ASISTENCIA)
+    solo_cabecera = Table([CABECERA_ASISTENCIA], style=ESTILO_TABLA_ASISTENCIA).wrap(ancho, alto)[1]
+    fila = Table([CABECERA_ASISTENCIA, muestra], style=ESTILO_TABLA_ASISTENCIA).wrap(ancho, alto)[1] - solo_cabecera
+    siguientes = max(1, int((alto - solo_cabecera) // fila))
+    primera = max(1, int((alto - _alto(encabezado, ancho, alto) - solo_cabecera) // fila))
+    return primera, siguientes
+
+
+def generar_reporte_asistencia(resumenes, totales, titulo="Reporte de Asistencia", fecha_inicio=None, fecha_fin=None):
+    """
+    Genera un PDF con la asistencia por maestro y día (ResumenDiario).
+
+    `resumenes` es un iterable de filas con CAMPOS_ASISTENCIA (por ejemplo
+    `.values(...).iterator(chunk_size=FILAS_POR_CONSULTA)`) que se recorre
+    una sola vez; `totales`, los del período calculados en SQL
+    (resumen.totales_reporte). La tabla se dibuja página por página, así que
+    en memoria solo hay una página de filas a la vez. ReportLab guarda las
+    páginas dibujadas, con todos sus objetos, hasta save(): cada
+    PAGINAS_POR_BLOQUE páginas el bloque se cierra en su propio PDF temporal
+    y se agrega con PdfWriter.append, que solo guarda las páginas ya
+    codificadas hasta escribir el archivo final. Retorna el archivo temporal
+    con el PDF, posicionado al inicio.
+    """
+    unido = PdfWriter()
     styles = getSampleStyleSheet()
+    marco = _marco(PAGINA_ASISTENCIA)
+    parte = lienzo = None
+    paginas = 0
+
+    def abrir_bloque():
+        nonlocal parte, lienzo, paginas
+        parte = tempfile.SpooledTemporaryFile(max_size=BLOQUE_EN_MEMORIA)
+        lienzo = canvas.Canvas(parte, pagesize=PAGINA_ASISTENCIA)
+        paginas = 0
+
+    def cerrar_bloque():
+        nonlocal parte, lienzo
+        lienzo.save()
+        parte.seek(0)
+        unido.append(parte)
+        parte.close()
+        parte = lienzo = None
+
+    def nueva_pagina():
+        nonlocal marco, paginas
+        lienzo.showPage()
+        paginas += 1
+        if paginas == PAGINAS_POR_BLOQUE:
+            cerrar_bloque()
+            abrir_bloque()
+        marco = _marco(PAGINA_ASISTENCIA)
+
+    def colocar(*flowables):
+        for f in flowables:
+            if not marco.add(f, lienzo):
+                nueva_pagina()
+                marco.add(f, lienzo)
+
+    abrir_bloque()
 
     # Título
     titulo_style = ParagraphStyle(
@@ -27,9 +153,54 @@ def generar_reporte_asistencia(asistencias, titulo="Reporte de Asistencia", fech
         fontSize=16,
         spaceAfter=12,
     )
-    elements.append(Paragraph(titulo, titulo_style))
 
     # Subtítulo con fechas
+    if fecha_inicio and fecha_fin:
+        subtitulo = f"Período: {fecha_inicio} al {fecha_fin}"
+    else:
+        subtitulo = f"Generado el: {date.today().strftime('%d/%m/%Y')}"
+    encabezado = [Paragraph(titulo, titulo_style), Paragraph(subtitulo, styles['Normal']), Spacer(1, 0.3 * inch)]
+    colocar(*encabezado)
+
+    # Tabla de datos, una página a la vez
+    filas = (_fila_asistencia(i, r) for i, r in enumerate(resumenes, 1))
+    pagina = list(islice(filas, 1))
+    if not pagina:
+        colocar(Paragraph("No hay registros para el período seleccionado.", styles['Normal']))
+    else:
+        capacidad, siguientes = _filas_por_pagina(encabezado, pagina[0])
+        while pagina:
+            pagina.extend(islice(filas, capacidad - len(pagina)))
+            colocar(Table([CABECERA_ASISTENCIA] + pagina, style=ESTILO_TABLA_ASISTENCIA))
+            pagina, capacidad = list(islice(filas, 1)), siguientes
+            if pagina:
+                nueva_pagina()
+
+    # Resumen
+    resumen = (
+        f"Días registrados: {totales['dias']} | Con retardo: {totales['retardos']} "
+        f"({totales['minutos_retardo']} min) | Fuera de perímetro: {totales['fuera_de_perimetro']}"
+    )
+    colocar(Spacer(1, 0.3 * inch), Paragraph(resumen, styles['Normal']))
+
+    cerrar_bloque()
+    archivo = tempfile.TemporaryFile()
+    unido.write(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def generar_reporte_incidencias(incidencias, titulo="Reporte de Incidencias", fecha_inicio=None, fecha_fin=None):
+    """
+    Genera un PDF con la tabla de incidencias.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5 * inch)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    elements.append(Paragraph(titulo, styles['Title']))
+
     if fecha_inicio and fecha_fin:
         subtitulo = f"Período: {fecha_inicio} al {fecha_fin}"
     else:
@@ -37,26 +208,23 @@ def generar_reporte_asistencia(asistencias, titulo="Reporte de Asistencia", fech
     elements.append(Paragraph(subtitulo, styles['Normal']))
     elements.append(Spacer(1, 0.3 * inch))
 
-    # Tabla de datos
-    data = [['#', 'Maestro', 'Tipo', 'Fecha/Hora', 'Válido', 'Distancia (m)', 'Perímetro']]
+    data = [['#', 'Maestro', 'Tipo', 'Fecha', 'Descripción']]
 
-    for i, a in enumerate(asistencias, 1):
+    for i, inc in enumerate(incidencias, 1):
         data.append([
             str(i),
-            a.usuario.nombre,
-            a.get_tipo_display(),
-            a.fecha_hora.strftime('%d/%m/%Y %H:%M'),
-            'Sí' if a.valido else 'No',
-            f"{a.distancia_metros:.1f}",
-            a.perimetro.nombre,
+            inc.usuario.nombre,
+            inc.get_tipo_display(),
+            inc.fecha.strftime('%d/%m/%Y'),
+            inc.descripcion[:60] or '-',
         ])
 
     if len(data) == 1:
-        elements.append(Paragraph("No hay registros para el período seleccionado.", styles['Normal']))
+        elements.append(Paragraph("No hay incidencias para el período seleccionado.", styles['Normal']))
     else:
-        table = Table(data, repeatRows=1)
+        table = Table(data, repeatRows=1, colWidths=[30, 120, 80, 80, 200])
         table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#c0392b')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -68,25 +236,37 @@ def generar_reporte_asistencia(asistencias, titulo="Reporte de Asistencia", fech
         ]))
         elements.append(table)
 
-    # Resumen
-    elements.append(Spacer(1, 0.3 * inch))
-    total = len(asistencias)
-    validos = sum(1 for a in asistencias if a.valido)
-    invalidos = total - validos
-    resumen = f"Total registros: {total} | Válidos: {validos} | Inválidos: {invalidos}"
-    elements.append(Paragraph(resumen, styles['Normal']))
-
     doc.build(elements)
     buffer.seek(0)
     return buffer
 
 
-def generar_reporte_incidencias(incidencias, titulo="Reporte de Incidencias", fecha_inicio=None, fecha_fin=None):
+# (encabezado, campo de resumen.totales_por_maestro) de las columnas numéricas
+COLUMNAS_RESUMEN = [
+    ('Días', 'dias_presentes'),
+    ('Retardos', 'retardos'),
+    ('Min. retardo', 'minutos_retardo'),
+    ('Sal. temp.', 'salidas_tempranas'),
+    ('Min. salida', 'minutos_salida_temprana'),
+    ('Faltas', 'faltas'),
+    ('Justif.', 'justificaciones'),
+    ('Fuera perím.', 'fuera_de_perimetro'),
+    ('Inválidos', 'registros_invalidos'),
+    ('Horas', 'horas_trabajadas'),
+]
+
+
+def generar_reporte_resumen(totales, titulo="Resumen de Asistencia por Maestro", fecha_inicio=None, fecha_fin=None):
     """
-    Genera un PDF con la tabla de incidencias.
+    Genera un PDF con una fila por maestro (resumen.totales_por_maestro) y
+    una fila final con la suma de cada columna. El tamaño depende del número
+    de maestros, no de los registros del período.
     """
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5 * inch)
+    # Márgenes laterales de media pulgada: caben las doce columnas
+    doc = SimpleDocTemplate(
+        buffer, pagesize=landscape(letter), topMargin=0.5 * inch, leftMargin=0.5 * inch, rightMargin=0.5 * inch,
+    )
     elements = []
     styles = getSampleStyleSheet()
 
@@ -99,31 +279,31 @@ def generar_reporte_incidencias(incidencias, titulo="Reporte de Incidencias", fe
     elements.append(Paragraph(subtitulo, styles['Normal']))
     elements.append(Spacer(1, 0.3 * inch))
 
-    data = [['#', 'Maestro', 'Tipo', 'Fecha', 'Descripción']]
+    data = [['#', 'Maestro'] + [encabezado for encabezado, _ in COLUMNAS_RESUMEN]]
+    suma = [0] * len(COLUMNAS_RESUMEN)
 
-    for i, inc in enumerate(incidencias, 1):
-        data.append([
-            str(i),
-            inc.usuario.nombre,
-            inc.get_tipo_display(),
-            inc.fecha.strftime('%d/%m/%Y'),
-            inc.descripcion[:60] or '-',
-        ])
+    for i, fila in enumerate(totales, 1):
+        valores = [fila[campo] for _, campo in COLUMNAS_RESUMEN]
+        suma = [a + b for a, b in zip(suma, valores)]
+        data.append([str(i), fila['nombre']] + [str(v) for v in valores])
 
     if len(data) == 1:
-        elements.append(Paragraph("No hay incidencias para el período seleccionado.", styles['Normal']))
+        elements.append(Paragraph("No hay maestros para el período seleccionado.", styles['Normal']))
     else:
-        table = Table(data, repeatRows=1, colWidths=[30, 120, 80, 80, 200])
+        data.append(['', 'Total'] + [str(round(v, 2)) for v in suma])
+        table = Table(data, repeatRows=1, colWidths=[30, 150] + [52] * len(COLUMNAS_RESUMEN))
         table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#c0392b')),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 7),
             ('FONTSIZE', (0, 1), (-1, -1), 8),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
             ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.whitesmoke, colors.white]),
         ]))
         elements.append(table)
 
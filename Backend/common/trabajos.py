@@ -0,0 +1,315 @@
+"""
+Reportes PDF en segundo plano, con caché de artefactos en disco.
+
+POST /api/reportes/trabajos/ registra un TrabajoReporte y lo encola en el
+pool de hilos del proceso (REPORTES_TRABAJADORES); el cliente consulta su
+estado y descarga el PDF cuando está listo. Los GET síncronos de
+/api/reportes/ usan la misma caché. El tipo `por_maestro` (un reporte por
+maestro, en un ZIP o un PDF con marcadores) solo se pide así; lo genera
+common/por_maestro.py con REPORTES_PROCESOS procesos.
+
+Cada archivo se guarda en MEDIA_ROOT/reportes/<tipo>_<huella>.<pdf|zip>. La huella es
+el hash de los filtros y de las marcas de cambio (common/marcas.py) de los
+meses del período y de los maestros: una solicitud igual sobre datos sin
+cambios se sirve del archivo sin generar nada. Las marcas se leen antes de
+consultar los datos, así que el archivo de una huella nunca es más viejo
+que ella; cualquier escritura posterior avanza una marca y la siguiente
+solicitud genera un archivo nuevo.
+
+Recuperación: un trabajo se reclama con un UPDATE condicional antes de
+generarlo. Los pendientes de un proceso que murió, o los que quedaron en
+proceso más de TIMEOUT_S, los toma `manage.py procesar_reportes`, que
+también es el trabajador cuando REPORTES_TRABAJADORES = 0 y borra los
+archivos que no se han usado en días (--limpiar).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from apps.locations import resumen
+from apps.locations.models import Incidencia, ResumenDiario, TrabajoReporte
+from common import cache_compartida, marcas, por_maestro
+from common.reportes import (
+    CAMPOS_ASISTENCIA, FILAS_POR_CONSULTA, generar_reporte_asistencia, generar_reporte_incidencias,
+    generar_reporte_resumen,
+)
+
+logger = logging.getLogger(__name__)
+
+Tipo = TrabajoReporte.Tipo
+Estado = TrabajoReporte.Estado
+
+DIRECTORIO = 'reportes'
+TIPOS_CONTENIDO = {'.pdf': 'application/pdf', '.zip': 'application/zip'}
+# Un trabajo en proceso por más de esto se da por abandonado (proceso muerto)
+TIMEOUT_S = 15 * 60
+
+_pool = None
+_pool_pid = None
+_candado = threading.Lock()
+
+
+def filtros(query_params, tipo):
+    """Query params de un reporte, validados (400 si una fecha o el usuario no son válidos)."""
+    # Import local: serializers → registro → common.marcas
+    from apps.locations.serializers import SolicitudReporteSerializer
+    datos = {k: v for k, v in query_params.items() if v}
+    serializer = SolicitudReporteSerializer(data={**datos, 'tipo': tipo})
+    serializer.is_valid(raise_exception=True)
+    return parametros(serializer.validated_data)
+
+
+def parametros(datos):
+    """Filtros validados (SolicitudReporteSerializer) → dict JSON estable."""
+    resultado = {
+        'fecha_inicio': datos['fecha_inicio'] and datos['fecha_inicio'].isoformat(),
+        'fecha_fin': datos['fecha_fin'] and datos['fecha_fin'].isoformat(),
+        'usuario': datos['usuario'],
+    }
+    if datos['tipo'] == Tipo.POR_MAESTRO:
+        resultado['salida'] = datos['salida']
+    return resultado
+
+
+def _extension(parametros):
+    return parametros.get('salida', 'pdf')
+
+
+def nombre_descarga(tipo, parametros):
+    return f'reporte_{tipo}_{parametros["fecha_inicio"] or "completo"}.{_extension(parametros)}'
+
+
+def tipo_contenido(nombre):
+    return TIPOS_CONTENIDO[Path(nombre).suffix]
+
+
+# ──────────────────────────────────────────────
+# GENERAR
+# ──────────────────────────────────────────────
+
+def consulta(tipo, parametros):
+    """Filas del reporte, filtradas y en el orden del PDF."""
+    if tipo == Tipo.INCIDENCIAS:
+        qs = Incidencia.objects.select_related('usuario')
+    else:
+        qs = ResumenDiario.objects.all()
+    if parametros['usuario']:
+        qs = qs.filter(usuario_id=parametros['usuario'])
+    if parametros['fecha_inicio']:
+        qs = qs.filter(fecha__gte=parametros['fecha_inicio'])
+    if parametros['fecha_fin']:
+        qs = qs.filter(fecha__lte=parametros['fecha_fin'])
+    return qs.order_by('fecha') if tipo == Tipo.INCIDENCIAS else qs.order_by('fecha', 'usuario__nombre')
+
+
+def generar(tipo, parametros):
+    """Genera el archivo; retorna un archivo (o buffer) posicionado al inicio."""
+    if tipo == Tipo.POR_MAESTRO:
+        archivo = tempfile.TemporaryFile()
+        por_maestro.generar(parametros, archivo, parametros['salida'], settings.REPORTES_PROCESOS)
+        archivo.seek(0)
+        return archivo
+    if tipo == Tipo.RESUMEN:
+        return generar_reporte_resumen(
+            resumen.totales_por_maestro(parametros['fecha_inicio'], parametros['fecha_fin'], parametros['usuario']),
+            fecha_inicio=parametros['fecha_inicio'],
+            fecha_fin=parametros['fecha_fin'],
+        )
+    qs = consulta(tipo, parametros)
+    if tipo == Tipo.ASISTENCIA:
+        return generar_reporte_asistencia(
+            qs.values(*CAMPOS_ASISTENCIA).iterator(chunk_size=FILAS_POR_CONSULTA),
+            resumen.totales_reporte(qs),
+            fecha_inicio=parametros['fecha_inicio'],
+            fecha_fin=parametros['fecha_fin'],
+        )
+    return generar_reporte_incidencias(
+        qs.iterator(chunk_size=FILAS_POR_CONSULTA),
+        fecha_inicio=parametros['fecha_inicio'],
+        fecha_fin=parametros['fecha_fin'],
+    )
+
+
+# ──────────────────────────────────────────────
+# CACHÉ DE ARTEFACTOS
+# ──────────────────────────────────────────────
+
+def huella(tipo, parametros):
+    """
+    Hash de los filtros y de las marcas de los meses del período (una
+    lectura de la cache por mes, no por día: un reporte de varios años
+    lee unas decenas de marcas). Sin
+    fecha_inicio o fecha_fin, el período va de la primera a la última fecha
+    con datos (una consulta); esas fechas también entran en el hash. Sin
+    cache compartida las marcas no son confiables: una huella nueva en cada
+    llamada, así nunca se reutiliza un archivo.
+    """
+    if not cache_compartida.compartida():
+        return uuid.uuid4().hex
+    desde, hasta = parametros['fecha_inicio'], parametros['fecha_fin']
+    if desde is None or hasta is None:
+        extremos = consulta(tipo, parametros).aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+        desde = desde or (extremos['primera'] and extremos['primera'].isoformat())
+        hasta = hasta or (extremos['ultima'] and extremos['ultima'].isoformat())
+    alcances = [marcas.MAESTROS]
+    if desde and hasta:
+        mes, ultimo = date.fromisoformat(desde).replace(day=1), date.fromisoformat(hasta)
+        while mes <= ultimo:
+            alcances.append(marcas.mes(mes))
+            mes = (mes + timedelta(days=31)).replace(day=1)
+    partes = [tipo, json.dumps(parametros, sort_keys=True), str(desde), str(hasta), *marcas.tokens(alcances)]
+    return hashlib.sha256('\n'.join(partes).encode()).hexdigest()[:32]
+
+
+def _nombre(tipo, parametros, huella_actual):
+    return f'{DIRECTORIO}/{tipo}_{huella_actual}.{_extension(parametros)}'
+
+
+def ruta(nombre):
+    """Ruta en disco de un archivo de MEDIA_ROOT."""
+    return Path(settings.MEDIA_ROOT) / nombre
+
+
+def artefacto(tipo, parametros, huella_actual=None):
+    """
+    Nombre (relativo a MEDIA_ROOT) del archivo para estos filtros; lo genera
+    si no existe. Se escribe en un temporal y se renombra: un lector nunca ve
+    un archivo a medias.
+    """
+    huella_actual = huella_actual or huella(tipo, parametros)
+    nombre = _nombre(tipo, parametros, huella_actual)
+    destino = ruta(nombre)
+    if destino.exists():
+        # La limpieza borra por último uso
+        os.utime(destino)
+        return nombre
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(f'{destino.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        with generar(tipo, parametros) as generado, open(temporal, 'wb') as f:
+            shutil.copyfileobj(generado, f)
+        os.replace(temporal, destino)
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+    return nombre
+
+
+def limpiar(dias):
+    """Borra los archivos sin usar en `dias` días y los trabajos más viejos. Retorna cuántos archivos borró."""
+    directorio = ruta(DIRECTORIO)
+    limite = time.time() - dias * 24 * 3600
+    borrados = 0
+    if directorio.is_dir():
+        for archivo in directorio.iterdir():
+            if archivo.stat().st_mtime < limite:
+                archivo.unlink(missing_ok=True)
+                borrados += 1
+    TrabajoReporte.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=dias),
+    ).exclude(estado__in=[Estado.PENDIENTE, Estado.EN_PROCESO]).delete()
+    return borrados
+
+
+# ──────────────────────────────────────────────
+# TRABAJOS
+# ──────────────────────────────────────────────
+
+def solicitar(tipo, parametros, usuario):
+    """
+    Registra un trabajo. Si el archivo de la huella ya existe queda listo de
+    inmediato; si hay uno igual pendiente o en proceso, se retorna ese.
+    """
+    huella_actual = huella(tipo, parametros)
+    nombre = _nombre(tipo, parametros, huella_actual)
+    if ruta(nombre).exists():
+        os.utime(ruta(nombre))
+        return TrabajoReporte.objects.create(
+            tipo=tipo, parametros=parametros, huella=huella_actual, solicitado_por=usuario,
+            estado=Estado.LISTO, archivo=nombre, terminado_en=timezone.now(),
+        )
+    en_curso = TrabajoReporte.objects.filter(
+        huella=huella_actual, estado__in=[Estado.PENDIENTE, Estado.EN_PROCESO],
+    ).first()
+    if en_curso:
+        return en_curso
+    trabajo = TrabajoReporte.objects.create(
+        tipo=tipo, parametros=parametros, huella=huella_actual, solicitado_por=usuario,
+    )
+    transaction.on_commit(lambda: encolar(trabajo.id))
+    return trabajo
+
+
+def procesar(trabajo_id):
+    """Genera el trabajo si sigue pendiente. Retorna True si lo tomó este proceso."""
+    if not TrabajoReporte.objects.filter(id=trabajo_id, estado=Estado.PENDIENTE).update(
+        estado=Estado.EN_PROCESO, iniciado_en=timezone.now(),
+    ):
+        return False
+    trabajo = TrabajoReporte.objects.get(id=trabajo_id)
+    try:
+        nombre = artefacto(trabajo.tipo, trabajo.parametros, trabajo.huella)
+    except Exception as e:
+        logger.exception('No se pudo generar el reporte %s', trabajo_id)
+        TrabajoReporte.objects.filter(id=trabajo_id).update(
+            estado=Estado.ERROR, error=str(e), terminado_en=timezone.now(),
+        )
+        return True
+    TrabajoReporte.objects.filter(id=trabajo_id).update(
+        estado=Estado.LISTO, archivo=nombre, terminado_en=timezone.now(),
+    )
+    return True
+
+
+def procesar_pendientes():
+    """
+    Devuelve a pendiente los trabajos abandonados y procesa los pendientes
+    por orden de llegada. Retorna cuántos procesó.
+    """
+    TrabajoReporte.objects.filter(
+        estado=Estado.EN_PROCESO, iniciado_en__lt=timezone.now() - timedelta(seconds=TIMEOUT_S),
+    ).update(estado=Estado.PENDIENTE)
+    pendientes = TrabajoReporte.objects.filter(estado=Estado.PENDIENTE).order_by('created_at')
+    return sum(procesar(trabajo_id) for trabajo_id in pendientes.values_list('id', flat=True))
+
+
+def _ejecutar(trabajo_id):
+    try:
+        procesar(trabajo_id)
+    except Exception:
+        logger.exception('No se pudo procesar el trabajo de reporte %s', trabajo_id)
+    finally:
+        # Los hilos del pool no pasan por el ciclo de request
+        connections.close_all()
+
+
+def encolar(trabajo_id):
+    """
+    Manda el trabajo al pool de este proceso. Con REPORTES_TRABAJADORES = 0
+    no hay pool: lo toma `manage.py procesar_reportes --continuo`.
+    """
+    global _pool, _pool_pid
+    if not settings.REPORTES_TRABAJADORES:
+        return
+    with _candado:
+        # Tras un fork (gunicorn --preload) los hilos del padre no existen
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.REPORTES_TRABAJADORES, thread_name_prefix='reportes',
+            )
+            _pool_pid = os.getpid()
+        _pool.submit(_ejecutar, trabajo_id)
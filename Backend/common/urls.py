@@ -1,7 +1,15 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path('asistencia/', views.ReporteAsistenciaPDFView.as_view(), name='reporte-asistencia'),
     path('incidencias/', views.ReporteIncidenciasPDFView.as_view(), name='reporte-incidencias'),
+    path('resumen/', views.ResumenPorMaestroView.as_view(), name='reporte-resumen'),
+    path('resumen/pdf/', views.ReporteResumenPDFView.as_view(), name='reporte-resumen-pdf'),
+    path('trabajos/', views.TrabajosReporteView.as_view(), name='reporte-trabajos'),
+    path('trabajos/<uuid:pk>/', views.TrabajoReporteDetalleView.as_view(), name='reporte-trabajo'),
+    path('trabajos/<uuid:pk>/descarga/', views.TrabajoReporteDescargaView.as_view(), name='reporte-trabajo-descarga'),
+    re_path(
+        r'^exportar/(?P<tipo>asistencia|incidencias|resumen)/$', views.ExportarView.as_view(), name='reporte-exportar',
+    ),
 ]
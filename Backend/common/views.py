@@ -1,79 +1,159 @@
-from rest_framework.views import APIView
 from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from common import cache_compartida, exportar, trabajos
+from apps.locations import resumen
 from common.permissions import EsSupervisorOAdmin
-from common.reportes import generar_reporte_asistencia, generar_reporte_incidencias
-from apps.locations.models import Asistencia, Incidencia
+from apps.locations.models import TrabajoReporte
+from apps.locations.serializers import SolicitudReporteSerializer, TrabajoReporteSerializer
+
+
+def _descarga(tipo, parametros, nombre):
+    return FileResponse(
+        trabajos.ruta(nombre).open('rb'),
+        as_attachment=True,
+        filename=trabajos.nombre_descarga(tipo, parametros),
+        content_type=trabajos.tipo_contenido(nombre),
+    )
+
+
+def _reporte(request, tipo):
+    """PDF de un GET de /api/reportes/: el guardado para la huella actual, o lo genera."""
+    parametros = trabajos.filtros(request.query_params, tipo)
+    if not cache_compartida.compartida():
+        # Sin marcas confiables no se guarda nada: cada GET genera el suyo
+        nombre = trabajos.nombre_descarga(tipo, parametros)
+        return FileResponse(
+            trabajos.generar(tipo, parametros), as_attachment=True, filename=nombre,
+            content_type=trabajos.tipo_contenido(nombre),
+        )
+    return _descarga(tipo, parametros, trabajos.artefacto(tipo, parametros))
 
 
 class ReporteAsistenciaPDFView(APIView):
     """
     GET /api/reportes/asistencia/?fecha_inicio=2026-01-01&fecha_fin=2026-01-31&usuario=1
-    Descarga un PDF con el reporte de asistencias.
+    Descarga un PDF con el reporte de asistencias: una fila por maestro y
+    día, leída del resumen diario. Las filas se recorren por bloques y el
+    PDF se arma en un archivo temporal, sin cargar el rango completo.
+    Si el período no cambió desde la última vez se sirve el PDF guardado
+    (ver common/trabajos.py); para rangos grandes conviene POST /api/reportes/trabajos/.
     """
     permission_classes = [EsSupervisorOAdmin]
 
     def get(self, request):
-        qs = Asistencia.objects.select_related('usuario', 'perimetro').all()
+        return _reporte(request, TrabajoReporte.Tipo.ASISTENCIA)
 
-        fecha_inicio = request.query_params.get('fecha_inicio')
-        fecha_fin = request.query_params.get('fecha_fin')
-        usuario_id = request.query_params.get('usuario')
 
-        if usuario_id:
-            qs = qs.filter(usuario_id=usuario_id)
-        if fecha_inicio:
-            qs = qs.filter(fecha_hora__date__gte=fecha_inicio)
-        if fecha_fin:
-            qs = qs.filter(fecha_hora__date__lte=fecha_fin)
+class ReporteIncidenciasPDFView(APIView):
+    """
+    GET /api/reportes/incidencias/?fecha_inicio=2026-01-01&fecha_fin=2026-01-31&usuario=1
+    Descarga un PDF con el reporte de incidencias.
+    """
+    permission_classes = [EsSupervisorOAdmin]
 
-        qs = qs.order_by('fecha_hora')
+    def get(self, request):
+        return _reporte(request, TrabajoReporte.Tipo.INCIDENCIAS)
 
-        buffer = generar_reporte_asistencia(
-            list(qs),
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
-        )
 
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename=f'reporte_asistencia_{fecha_inicio or "completo"}.pdf',
-            content_type='application/pdf',
-        )
+class ResumenPorMaestroView(APIView):
+    """
+    GET /api/reportes/resumen/?fecha_inicio=2026-03-01&fecha_fin=2026-03-31&usuario=1
+    Totales del período por maestro (días presentes, retardos, salidas
+    tempranas, faltas, registros inválidos, horas trabajadas...), una fila
+    por maestro, calculados en una sola consulta agrupada
+    (resumen.totales_por_maestro). En PDF: /api/reportes/resumen/pdf/; en
+    CSV o XLSX: /api/reportes/exportar/resumen/.
+    """
+    permission_classes = [EsSupervisorOAdmin]
 
+    def get(self, request):
+        parametros = trabajos.filtros(request.query_params, TrabajoReporte.Tipo.RESUMEN)
+        return Response(list(resumen.totales_por_maestro(
+            parametros['fecha_inicio'], parametros['fecha_fin'], parametros['usuario'],
+        )))
 
-class ReporteIncidenciasPDFView(APIView):
+
+class ReporteResumenPDFView(APIView):
     """
-    GET /api/reportes/incidencias/?fecha_inicio=2026-01-01&fecha_fin=2026-01-31&usuario=1
-    Descarga un PDF con el reporte de incidencias.
+    GET /api/reportes/resumen/pdf/?fecha_inicio=2026-03-01&fecha_fin=2026-03-31
+    Descarga el resumen por maestro en PDF, con la fila de totales.
     """
     permission_classes = [EsSupervisorOAdmin]
 
     def get(self, request):
-        qs = Incidencia.objects.select_related('usuario').all()
-
-        fecha_inicio = request.query_params.get('fecha_inicio')
-        fecha_fin = request.query_params.get('fecha_fin')
-        usuario_id = request.query_params.get('usuario')
+        return _reporte(request, TrabajoReporte.Tipo.RESUMEN)
 
-        if usuario_id:
-            qs = qs.filter(usuario_id=usuario_id)
-        if fecha_inicio:
-            qs = qs.filter(fecha__gte=fecha_inicio)
-        if fecha_fin:
-            qs = qs.filter(fecha__lte=fecha_fin)
 
-        qs = qs.order_by('fecha')
+class TrabajosReporteView(APIView):
+    """
+    POST /api/reportes/trabajos/
+    {"tipo": "asistencia", "fecha_inicio": "2026-01-01", "fecha_fin": "2026-12-31", "usuario": null}
+    {"tipo": "por_maestro", "fecha_inicio": "2026-03-01", "fecha_fin": "2026-03-31", "salida": "zip"}
+    Encola la generación del PDF y responde 202 con el trabajo. Si el
+    período no cambió desde un reporte igual, el trabajo ya viene listo.
+    `por_maestro` genera un PDF por maestro en un ZIP (o, con "salida":
+    "pdf", un solo PDF con un marcador por maestro).
+    """
+    permission_classes = [EsSupervisorOAdmin]
 
-        buffer = generar_reporte_incidencias(
-            list(qs),
-            fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin,
+    def post(self, request):
+        serializer = SolicitudReporteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        trabajo = trabajos.solicitar(
+            serializer.validated_data['tipo'], trabajos.parametros(serializer.validated_data), request.usuario,
+        )
+        return Response(
+            TrabajoReporteSerializer(trabajo, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED,
         )
 
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename=f'reporte_incidencias_{fecha_inicio or "completo"}.pdf',
-            content_type='application/pdf',
+
+class TrabajoReporteDetalleView(APIView):
+    """GET /api/reportes/trabajos/<id>/ — estado del trabajo."""
+    permission_classes = [EsSupervisorOAdmin]
+
+    def get(self, request, pk):
+        trabajo = get_object_or_404(TrabajoReporte, pk=pk)
+        return Response(TrabajoReporteSerializer(trabajo, context={'request': request}).data)
+
+
+class TrabajoReporteDescargaView(APIView):
+    """GET /api/reportes/trabajos/<id>/descarga/ — el archivo, cuando el trabajo está listo."""
+    permission_classes = [EsSupervisorOAdmin]
+
+    def get(self, request, pk):
+        trabajo = get_object_or_404(TrabajoReporte, pk=pk)
+        if trabajo.estado != TrabajoReporte.Estado.LISTO:
+            return Response(
+                {'error': 'El reporte aún no está listo.', 'estado': trabajo.estado},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if not trabajos.ruta(trabajo.archivo.name).exists():
+            return Response(
+                {'error': 'El archivo del reporte ya no está disponible; solicítalo de nuevo.'},
+                status=status.HTTP_410_GONE,
+            )
+        return _descarga(trabajo.tipo, trabajo.parametros, trabajo.archivo.name)
+
+
+class ExportarView(APIView):
+    """
+    GET /api/reportes/exportar/asistencia/?formato=csv&fecha_inicio=2026-01-01&fecha_fin=2026-01-31&usuario=1
+    GET /api/reportes/exportar/incidencias/?formato=xlsx&...
+    GET /api/reportes/exportar/resumen/?formato=csv&... (una fila por maestro)
+    Datos crudos (una fila por asistencia o incidencia) en CSV o XLSX, con
+    los mismos filtros que los PDF. Se envían en streaming desde un cursor
+    del servidor, sin cargar el resultado (ver common/exportar.py).
+    """
+    permission_classes = [EsSupervisorOAdmin]
+
+    def get(self, request, tipo):
+        parametros = trabajos.filtros(request.query_params, tipo)
+        formato = exportar.leer_formato(request.query_params)
+        filas = exportar.consulta(tipo, parametros).iterator(chunk_size=exportar.FILAS_POR_CONSULTA)
+        return exportar.respuesta(
+            tipo, parametros, formato, exportar.en_streaming(exportar.escritor(tipo, formato), filas),
         )
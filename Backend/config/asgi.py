@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Bajo ASGI, registro, estado-hoy y redes-activas usan las vistas async
+os.environ.setdefault('ROOT_URLCONF', 'config.urls_asgi')
 
 application = get_asgi_application()
+
+# Después de cargar Django: el vaciador del buffer de asistencias arranca con
+# el servidor, no en cada comando de manage.py
+from apps.locations import escritura_diferida  # noqa: E402
+
+escritura_diferida.iniciar_con_servidor()
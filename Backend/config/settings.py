@@ -63,7 +63,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'config.urls'
+# config/asgi.py lo cambia a config.urls_asgi (vistas async)
+ROOT_URLCONF = env('ROOT_URLCONF', default='config.urls')
 
 TEMPLATES = [
     {
@@ -98,6 +99,18 @@ DATABASES = {
 }
 
 
+# Cache compartida entre workers (estado del día, índices en memoria).
+# En producción usar Redis o Memcached, p. ej. CACHE_URL=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# locmem es de cada proceso: con varios workers, lo que se invalida escribiendo
+# en la cache (índices, estado del día, horarios, ETag) quedaría viejo en los
+# demás, así que sin cache compartida se desactiva (ver common/cache_compartida.py).
+# True declara un solo proceso (runserver, uvicorn sin --workers) y lo permite.
+CACHE_UN_SOLO_PROCESO = env.bool('CACHE_UN_SOLO_PROCESO', default=False)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -162,4 +175,38 @@ SIMPLE_JWT = {
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Índices en memoria para el registro de asistencia (redes y perímetros).
+# Desactivar obliga a consultar la base de datos en cada registro.
+ASISTENCIA_INDICES_EN_MEMORIA = env.bool('ASISTENCIA_INDICES_EN_MEMORIA', default=True)
+
+# Escritura diferida de registros: se guardan en un buffer SQLite local (WAL)
+# y un hilo los inserta en la base de datos por lotes cada pocos cientos de ms.
+# La API responde 202 con un id_provisional. Desactivada por defecto.
+# Con ASISTENCIA_BUFFER_INTERVALO_MS=0 no se inicia el hilo y el buffer se vacía
+# con `manage.py vaciar_buffer_asistencias --continuo`.
+ASISTENCIA_ESCRITURA_DIFERIDA = env.bool('ASISTENCIA_ESCRITURA_DIFERIDA', default=False)
+ASISTENCIA_BUFFER_RUTA = env('ASISTENCIA_BUFFER_RUTA', default=str(BASE_DIR / 'buffer_asistencias.sqlite3'))
+ASISTENCIA_BUFFER_INTERVALO_MS = env.int('ASISTENCIA_BUFFER_INTERVALO_MS', default=250)
+
+# Hub del panel en vivo (SSE en /api/asistencia/panel/eventos/, solo ASGI).
+# HubLocal reparte dentro del proceso; con varios workers se necesita un
+# backend compartido con la misma interfaz (ver apps/locations/difusion.py).
+ASISTENCIA_DIFUSION_BACKEND = env(
+    'ASISTENCIA_DIFUSION_BACKEND', default='apps.locations.difusion.HubLocal',
+)
+
+# Reportes PDF en segundo plano (POST /api/reportes/trabajos/): hilos por
+# proceso que los generan. Los PDF quedan en MEDIA_ROOT/reportes/ por huella
+# de filtros y datos (ver common/trabajos.py). Con REPORTES_TRABAJADORES=0 no
+# hay hilos y los genera `manage.py procesar_reportes --continuo`.
+REPORTES_TRABAJADORES = env.int('REPORTES_TRABAJADORES', default=2)
+# Procesos con los que un trabajo `por_maestro` genera los PDF de cada
+# maestro (ver common/por_maestro.py); 1 = en el mismo hilo del trabajo.
+REPORTES_PROCESOS = env.int('REPORTES_PROCESOS', default=os.cpu_count() or 1)
+
+# Archivo frío de asistencias: meses viejos exportados a CSV comprimido por
+# `manage.py archivar_asistencias` (ver apps/locations/archivo.py). El
+# historial los lee de aquí cuando se piden rangos ya archivados.
+ASISTENCIA_ARCHIVO_DIR = env('ASISTENCIA_ARCHIVO_DIR', default=str(BASE_DIR / 'archivo_asistencias'))
@@ -0,0 +1,26 @@
+"""
+URLs para el servidor ASGI (config/asgi.py).
+
+Los endpoints de la hora pico, el panel en vivo (SSE) y la exportación
+CSV/XLSX se sirven con las vistas async de apps.locations.views_async; el
+resto de la API es la misma de config.urls.
+"""
+from django.urls import path, re_path
+
+from apps.locations.views_async import (
+    RegistrarAsistenciaAsyncView, EstadoAsistenciaHoyAsyncView, RedesActivasAsyncView,
+    PanelEventosAsyncView, ExportarAsyncView,
+)
+
+from .urls import urlpatterns as urlpatterns_wsgi
+
+urlpatterns = [
+    path('api/asistencia/registrar/', RegistrarAsistenciaAsyncView.as_view(), name='registrar-asistencia-async'),
+    path('api/asistencia/estado-hoy/', EstadoAsistenciaHoyAsyncView.as_view(), name='estado-asistencia-hoy-async'),
+    path('api/asistencia/redes-activas/', RedesActivasAsyncView.as_view(), name='redes-activas-async'),
+    path('api/asistencia/panel/eventos/', PanelEventosAsyncView.as_view(), name='panel-eventos'),
+    re_path(
+        r'^api/reportes/exportar/(?P<tipo>asistencia|incidencias|resumen)/$',
+        ExportarAsyncView.as_view(), name='reporte-exportar-async',
+    ),
+] + urlpatterns_wsgi
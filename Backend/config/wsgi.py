@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Después de cargar Django: el vaciador del buffer de asistencias arranca con
+# el servidor, no en cada comando de manage.py
+from apps.locations import escritura_diferida  # noqa: E402
+
+escritura_diferida.iniciar_con_servidor()